@@ -0,0 +1,173 @@
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from analysis.schema_index import schema_fingerprint
+
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+
+def singularize(word: str) -> str:
+    """Best-effort English singular of a lowercase word."""
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 2 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def pluralize(word: str) -> str:
+    """Best-effort English plural of a lowercase word."""
+    if len(word) > 1 and word.endswith("y") and word[-2] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("s", "x", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+def identifier_variants(name: str) -> Set[str]:
+    """Lowercase surface forms a query may use for a schema identifier.
+
+    Covers the raw name, underscores read as spaces, CamelCase split into
+    words, and singular/plural forms of the last word of each.
+
+    Args:
+        name: Table or column name as stored in the schema.
+
+    Returns:
+        Set[str]: Non-empty variants.
+    """
+    spaced = re.sub(r'\s+', ' ', _CAMEL_BOUNDARY.sub(' ', name).replace('_', ' ')).strip().lower()
+    base = {name.lower(), name.lower().replace('_', ' '), spaced}
+    variants = set(base)
+    for text in base:
+        head, _, last = text.rpartition(' ')
+        if not last.isalpha():
+            continue
+        prefix = f"{head} " if head else ""
+        variants.add(prefix + singularize(last))
+        variants.add(prefix + pluralize(singularize(last)))
+    return {variant for variant in variants if variant.strip()}
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping identifier variants to schema tables.
+
+    Every variant of every table and column name is compiled into one trie
+    with failure links. Each state carries a bitmask of the tables whose
+    variants end there, so a single left-to-right pass over the query yields
+    every table with a name or column occurring as a substring.
+    """
+
+    def __init__(self, schema_dict: Dict, previous: Optional["KeywordAutomaton"] = None,
+                 changed: Optional[Iterable[str]] = None):
+        """Compile the automaton for a schema.
+
+        Args:
+            schema_dict: Schema dictionary from SchemaManager.
+            previous: Automaton of an earlier schema version whose keyword
+                lists are reused for tables not listed in ``changed``.
+            changed: ``schema.table`` names whose keywords must be regenerated.
+        """
+        self.logger = logging.getLogger("keyword_automaton")
+        self.fingerprint = schema_fingerprint(schema_dict)
+        self.tables: List[str] = []
+        self.table_keywords: Dict[str, Tuple[str, ...]] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [0]
+        reusable = previous.table_keywords if previous is not None and changed is not None else {}
+        changed = set(changed or ())
+
+        for schema, tables in schema_dict.get("tables", {}).items():
+            for table in tables:
+                full_table = f"{schema}.{table}"
+                bit = 1 << len(self.tables)
+                self.tables.append(full_table)
+                keywords = reusable.get(full_table) if full_table not in changed else None
+                if keywords is None:
+                    names = [table, *schema_dict["columns"].get(schema, {}).get(table, {})]
+                    keywords = tuple(sorted({variant for name in names for variant in identifier_variants(name)}))
+                self.table_keywords[full_table] = keywords
+                for keyword in keywords:
+                    self._add(keyword, bit)
+        self._link()
+        self.logger.debug(f"Compiled keyword automaton with {len(self._goto)} states for {len(self.tables)} tables")
+
+    @classmethod
+    def for_schema(cls, schema_dict: Dict, previous: Optional["KeywordAutomaton"] = None,
+                   changed: Optional[Iterable[str]] = None) -> "KeywordAutomaton":
+        """Return the compiled automaton for this schema version, building it on first use.
+
+        When building, keyword lists of tables outside ``changed`` are taken
+        from ``previous``; only the trie itself is recompiled.
+        """
+        fingerprint = schema_fingerprint(schema_dict)
+        with _compiled_lock:
+            automaton = _compiled.get(fingerprint)
+            if automaton is not None:
+                _compiled.move_to_end(fingerprint)
+                return automaton
+        automaton = cls(schema_dict, previous, changed)
+        with _compiled_lock:
+            _compiled[fingerprint] = automaton
+            while len(_compiled) > _MAX_COMPILED:
+                _compiled.popitem(last=False)
+        return automaton
+
+    def _add(self, pattern: str, bit: int):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(0)
+            state = nxt
+        self._out[state] |= bit
+
+    def _link(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def match_mask(self, text: str) -> int:
+        """Bitmask over ``self.tables`` of tables matched anywhere in ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        mask = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            mask |= out[state]
+        return mask
+
+    def tables_for(self, mask: int) -> List[str]:
+        """Decode a table bitmask into table names, in schema order."""
+        tables = []
+        while mask:
+            low = mask & -mask
+            tables.append(self.tables[low.bit_length() - 1])
+            mask ^= low
+        return tables
+
+    def match(self, text: str) -> List[str]:
+        """Tables (schema.table) whose name or a column name occurs in ``text``."""
+        return self.tables_for(self.match_mask(text))
+
+
+_MAX_COMPILED = 4
+_compiled: "OrderedDict[str, KeywordAutomaton]" = OrderedDict()
+_compiled_lock = threading.Lock()
@@ -3,21 +3,23 @@ import os
 import json
 from typing import Dict, List
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from analysis.schema_index import SchemaIndex
 
 class NameMatchManager:
     """Manages name matching and synonym persistence for table identification."""
 
-    def __init__(self, db_name: str, embedder: SentenceTransformer):
+    def __init__(self, db_name: str, embedder: SentenceTransformer, schema_index: SchemaIndex = None):
         """Initialize with database name and shared SentenceTransformer.
 
         Args:
             db_name (str): Name of the database.
             embedder (SentenceTransformer): Shared SentenceTransformer instance.
+            schema_index (SchemaIndex): Shared schema embedding index, if already built.
         """
         self.logger = logging.getLogger("name_match_manager")
         self.db_name = db_name
         self.embedder = embedder
+        self.schema_index = schema_index
         self.synonyms = {}
         self.matches_path = os.path.join("models", f"{self.db_name}_synonyms.json")
         self._load_synonyms()
@@ -53,7 +55,7 @@ class NameMatchManager:
 
         try:
             query_lower = query.lower()
-            query_embedding = self.embedder.encode([query_lower], convert_to_tensor=True)[0]
+            query_embedding = self.embedder.encode([query_lower])[0]
             matches = set()
 
             # Check synonyms
@@ -62,23 +64,9 @@ class NameMatchManager:
                     matches.update(tables)
 
             # Semantic matching with table and column names
-            table_texts = []
-            table_names = []
-            for schema in schema_dict["tables"]:
-                for table in schema_dict["tables"][schema]:
-                    table_name = f"{schema}.{table}"
-                    table_texts.append(f"{schema}.{table}")
-                    table_names.append(table_name)
-                    for col_name in schema_dict["columns"][schema][table]:
-                        table_texts.append(col_name)
-                        table_names.append(table_name)
-
-            if table_texts:
-                table_embeddings = self.embedder.encode(table_texts, convert_to_tensor=True)
-                similarities = cosine_similarity([query_embedding.cpu().numpy()], table_embeddings.cpu().numpy())[0]
-                for idx, score in enumerate(similarities):
-                    if score > 0.7:  # Threshold for relevance
-                        matches.add(table_names[idx])
+            self.schema_index = SchemaIndex.for_schema(schema_dict, self.embedder, self.schema_index)
+            if len(self.schema_index):
+                matches.update(self.schema_index.tables_above(query_embedding, 0.7))  # Threshold for relevance
 
             matches = list(matches)
             self.logger.debug(f"Name matches: {matches}")
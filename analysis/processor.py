@@ -1,5 +1,5 @@
 import os
-import spacy
+from nlp import spacy_registry
 from spacy.matcher import Matcher
 from typing import Dict
 import logging
@@ -29,7 +29,9 @@ class NLPPipeline:
                 print(f"Error loading logging config: {e}")
         
         self.logger = logging.getLogger("nlp_pipeline")
-        self.nlp = spacy.load("en_core_web_trf")
+        self.nlp = spacy_registry.get_nlp("en_core_web_trf")
+        if self.nlp is None:
+            raise OSError("spacy model en_core_web_trf is not available")
         self.matcher = Matcher(self.nlp.vocab)
         self.pattern_manager = pattern_manager
         self._load_patterns()
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def schema_fingerprint(schema_dict: Dict) -> str:
+    """Compute a stable hash of the table and column names in a schema.
+
+    Args:
+        schema_dict: Schema dictionary from SchemaManager.
+
+    Returns:
+        str: Hex digest identifying this schema version.
+    """
+    outline = {
+        schema: {
+            table: list(schema_dict["columns"].get(schema, {}).get(table, {}))
+            for table in tables
+        }
+        for schema, tables in schema_dict.get("tables", {}).items()
+    }
+    return hashlib.sha1(json.dumps(outline, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SchemaIndex:
+    """Normalized embedding matrix over schema tables and columns.
+
+    Each table owns a contiguous block of rows: the ``schema.table`` text,
+    then ``schema.table.column`` texts, then bare column names. Two views
+    select rows from those blocks:
+
+    - ``qualified``: table text plus qualified column texts (table scoring).
+    - ``names``: table text plus bare column names (name matching and the
+      relevance gate).
+
+    A query is scored with one matrix-vector product; per-table results are
+    segmented maxima over the selected view.
+    """
+
+    VIEWS = ("qualified", "names")
+
+    def __init__(self, schema_dict: Dict, embedder, previous: Optional["SchemaIndex"] = None,
+                 changed: Optional[Iterable[str]] = None):
+        """Build the index by encoding every distinct schema text once.
+
+        Args:
+            schema_dict: Schema dictionary from SchemaManager.
+            embedder: Encoder exposing ``encode(texts)``.
+            previous: Index of an earlier version of the schema whose row
+                blocks are reused for tables not listed in ``changed``.
+            changed: ``schema.table`` names whose blocks must be re-encoded.
+        """
+        self.logger = logging.getLogger("schema_index")
+        self.source = schema_dict
+        self.fingerprint = schema_fingerprint(schema_dict)
+        self.tables: List[str] = []
+        self.table_ids: Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.row_tables = np.zeros(0, dtype=np.int64)
+        self.view_rows: Dict[str, np.ndarray] = {}
+        self.view_segments: Dict[str, np.ndarray] = {}
+        self._shm: Optional[shared_memory.SharedMemory] = None
+
+        reusable = {}
+        if previous is not None and changed is not None and previous.matrix.size:
+            changed = set(changed)
+            starts = previous.block_starts()
+            ends = np.append(starts[1:], len(previous.row_tables))
+            reusable = {
+                table: (starts[table_id], ends[table_id])
+                for table, table_id in previous.table_ids.items() if table not in changed
+            }
+
+        texts = []
+        row_tables = []
+        blocks = []  # (first row, previous rows or None) per table
+        rows = {view: [] for view in self.VIEWS}
+        segments = {view: [] for view in self.VIEWS}
+        for schema in schema_dict["tables"]:
+            for table in schema_dict["tables"][schema]:
+                table_id = len(self.tables)
+                table_name = f"{schema}.{table}"
+                self.tables.append(table_name)
+                self.table_ids[table_name] = table_id
+                blocks.append((len(texts), reusable.get(table_name)))
+                columns = list(schema_dict["columns"].get(schema, {}).get(table, {}))
+                for view in self.VIEWS:
+                    segments[view].append(len(rows[view]))
+                    rows[view].append(len(texts))
+                texts.append(table_name)
+                row_tables.append(table_id)
+                for col_name in columns:
+                    rows["qualified"].append(len(texts))
+                    texts.append(f"{table_name}.{col_name}")
+                    row_tables.append(table_id)
+                for col_name in columns:
+                    rows["names"].append(len(texts))
+                    texts.append(col_name)
+                    row_tables.append(table_id)
+
+        if texts and reusable:
+            self.matrix = self._patched_matrix(texts, blocks, previous, embedder)
+        elif texts:
+            unique_texts = list(dict.fromkeys(texts))
+            positions = {text: i for i, text in enumerate(unique_texts)}
+            embeddings = self.normalize(np.asarray(embedder.encode(unique_texts), dtype=np.float32))
+            self.matrix = np.ascontiguousarray(embeddings[[positions[text] for text in texts]])
+        self.row_tables = np.asarray(row_tables, dtype=np.int64)
+        for view in self.VIEWS:
+            self.view_rows[view] = np.asarray(rows[view], dtype=np.int64)
+            self.view_segments[view] = np.asarray(segments[view], dtype=np.int64)
+        self.logger.debug(f"Built schema index with {len(texts)} rows for {len(self.tables)} tables")
+
+    @staticmethod
+    def _patched_matrix(texts: List[str], blocks: List[Tuple[int, Optional[Tuple[int, int]]]],
+                        previous: "SchemaIndex", embedder) -> np.ndarray:
+        """Assemble the matrix from reused blocks of ``previous`` and newly encoded blocks."""
+        bounds = [start for start, _ in blocks[1:]] + [len(texts)]
+        fresh_rows = [
+            row for (start, reused), end in zip(blocks, bounds) if reused is None
+            for row in range(start, end)
+        ]
+        matrix = np.empty((len(texts), previous.matrix.shape[1]), dtype=np.float32)
+        for (start, reused), end in zip(blocks, bounds):
+            if reused is not None:
+                matrix[start:end] = previous.matrix[reused[0]:reused[1]]
+        if fresh_rows:
+            unique_texts = list(dict.fromkeys(texts[row] for row in fresh_rows))
+            positions = {text: i for i, text in enumerate(unique_texts)}
+            embeddings = SchemaIndex.normalize(np.asarray(embedder.encode(unique_texts), dtype=np.float32))
+            matrix[fresh_rows] = embeddings[[positions[texts[row]] for row in fresh_rows]]
+        return matrix
+
+    def block_starts(self) -> np.ndarray:
+        """First matrix row of each table's block, indexed by table id."""
+        if not len(self.row_tables):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.r_[True, np.diff(self.row_tables) != 0])
+
+    @classmethod
+    def for_schema(cls, schema_dict: Dict, embedder, previous: Optional["SchemaIndex"] = None,
+                   changed: Optional[Iterable[str]] = None) -> "SchemaIndex":
+        """Return ``previous`` if it indexes the same schema version, else build a new index.
+
+        With ``changed``, the schema was patched in place: a new index is built
+        that re-encodes only those tables and copies the other rows from ``previous``.
+        """
+        if previous is not None and changed is not None:
+            index = cls(schema_dict, embedder, previous, changed)
+            previous.logger.debug(f"Patched schema index for {len(set(changed))} changed tables")
+            return index
+        if previous is not None and previous.source is schema_dict:
+            return previous
+        if previous is not None and previous.fingerprint == schema_fingerprint(schema_dict):
+            previous.logger.debug("Reusing schema index for unchanged schema")
+            previous.source = schema_dict
+            return previous
+        return cls(schema_dict, embedder)
+
+    def share_memory(self) -> Optional[shared_memory.SharedMemory]:
+        """Move the embedding matrix into a read-only shared memory block.
+
+        Processes forked afterwards map the same pages instead of holding
+        private copies.
+
+        Returns:
+            SharedMemory holding the matrix, or None if the index is empty.
+        """
+        if self._shm is not None or not self.matrix.size:
+            return self._shm
+        shm = shared_memory.SharedMemory(create=True, size=self.matrix.nbytes)
+        shared = np.ndarray(self.matrix.shape, dtype=self.matrix.dtype, buffer=shm.buf)
+        shared[:] = self.matrix
+        shared.setflags(write=False)
+        self.matrix = shared
+        self._shm = shm
+        self.logger.debug(f"Moved schema matrix ({self.matrix.nbytes} bytes) to shared memory {shm.name}")
+        return shm
+
+    def release_shared_memory(self):
+        """Copy the matrix back to private memory and free the shared block."""
+        if self._shm is None:
+            return
+        self.matrix = np.array(self.matrix)
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale vectors (1-D or row-wise 2-D) to unit length, leaving zero vectors alone."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def row_scores(self, query_vec: np.ndarray, view: str = "qualified") -> np.ndarray:
+        """Cosine similarity of the query (or each row of a query matrix) against every row of a view."""
+        scores = self.normalize(query_vec) @ self.matrix.T
+        return scores[..., self.view_rows[view]]
+
+    def table_scores(self, query_vec: np.ndarray, view: str = "qualified") -> np.ndarray:
+        """Best row similarity per table, aligned with ``self.tables`` along the last axis."""
+        if not self.tables:
+            return np.zeros(np.shape(query_vec)[:-1] + (0,), dtype=np.float32)
+        return np.maximum.reduceat(self.row_scores(query_vec, view), self.view_segments[view], axis=-1)
+
+    def max_similarity(self, query_vec: np.ndarray, view: str = "names") -> float:
+        """Highest similarity between the query and any schema text in a view."""
+        if not len(self):
+            return 0.0
+        return float(self.row_scores(query_vec, view).max())
+
+    def max_similarity_many(self, query_matrix: np.ndarray, view: str = "names") -> np.ndarray:
+        """``max_similarity`` for each row of a query matrix, from one matrix product."""
+        if not len(self):
+            return np.zeros(len(query_matrix), dtype=np.float32)
+        return self.row_scores(query_matrix, view).max(axis=1)
+
+    def _best_tables(self, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.tables[i], float(scores[i])) for i in candidates]
+
+    def topk(self, query_vec: np.ndarray, k: int, weights: Optional[np.ndarray] = None,
+             view: str = "qualified") -> List[Tuple[str, float]]:
+        """Return the k best tables for a query.
+
+        Args:
+            query_vec: Query embedding.
+            k: Number of tables to return.
+            weights: Optional per-table multipliers aligned with ``self.tables``.
+            view: Row view to score.
+
+        Returns:
+            List of (table, score) pairs, best first.
+        """
+        scores = self.table_scores(query_vec, view)
+        if weights is not None:
+            scores = scores * weights
+        return self._best_tables(scores, k)
+
+    def topk_many(self, query_matrix: np.ndarray, k: int, weights: Optional[np.ndarray] = None,
+                  view: str = "qualified") -> List[List[Tuple[str, float]]]:
+        """``topk`` for each row of a query matrix, scoring all rows in one matrix product."""
+        scores = self.table_scores(query_matrix, view)
+        if weights is not None:
+            scores = scores * weights
+        return [self._best_tables(row, k) for row in scores]
+
+    def tables_above(self, query_vec: np.ndarray, threshold: float, view: str = "names") -> List[str]:
+        """Tables having at least one row in the view scoring above ``threshold``."""
+        if not self.tables:
+            return []
+        hits = np.flatnonzero(self.table_scores(query_vec, view) > threshold)
+        return [self.tables[i] for i in hits]
@@ -1,18 +1,21 @@
 import logging
-import pandas as pd
 import os
 import numpy as np
 import json
-import csv
-import spacy
-from typing import List, Tuple, Dict
+from nlp import spacy_registry
+from typing import List, Optional, Tuple, Dict
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from analysis.schema_index import SchemaIndex
+from analysis.keyword_automaton import KeywordAutomaton
+from analysis.training_index import TrainingIndex
+from analysis import tracing
+from nlp.query_context import QueryContext
 
 class TableIdentifier:
     """Identifies relevant tables from natural language queries using NLP and feedback."""
 
-    def __init__(self, schema_dict: Dict, feedback_manager, pattern_manager, name_match_manager, db_name: str, embedder: SentenceTransformer):
+    def __init__(self, schema_dict: Dict, feedback_manager, pattern_manager, name_match_manager, db_name: str, embedder: SentenceTransformer,
+                 schema_index: SchemaIndex = None):
         """Initialize with schema, feedback, pattern, name match managers, and shared embedder.
 
         Args:
@@ -22,6 +25,7 @@ class TableIdentifier:
             name_match_manager: NameMatchManager instance.
             db_name: Name of the database.
             embedder: Shared SentenceTransformer instance.
+            schema_index: Shared SchemaIndex; built from ``schema_dict`` if omitted.
         """
         self.logger = logging.getLogger("table_identifier")
         self.schema_dict = schema_dict
@@ -31,31 +35,33 @@ class TableIdentifier:
         self.db_name = db_name
         self.embedder = embedder
         self.weights = {}
-        self.table_embeddings = {}
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except Exception as e:
-            self.logger.error(f"Failed to load spacy model: {e}")
-            self.nlp = None
+        self.schema_index = schema_index
+        self.weight_vector = np.zeros(0, dtype=np.float32)
+        self.nlp = spacy_registry.lazy("en_core_web_sm")
+        self.keyword_automaton = KeywordAutomaton.for_schema(schema_dict)
 
-        # Load training data
-        try:
-            csv_path = os.path.join("app-config", "training_data.csv")
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path, quoting=csv.QUOTE_ALL, on_bad_lines='warn')
-                self.training_data = df.values.tolist()
-                self.logger.debug(f"Loaded {len(self.training_data)} training records from {csv_path}")
-            else:
-                self.logger.warning(f"Training CSV not found at {csv_path}")
-                self.training_data = []
-        except Exception as e:
-            self.logger.error(f"Error loading CSV: {e}")
-            self.training_data = []
+        self.training_csv = os.path.join("app-config", "training_data.csv")
+        self._training_index = None
+        self._training_loaded = False
 
         self._initialize_weights()
         self._cache_table_embeddings()
         self.logger.debug("Initialized TableIdentifier")
 
+    @property
+    def training_index(self) -> Optional[TrainingIndex]:
+        """Index of the training CSV, loaded on first use and shared across reloads."""
+        if not self._training_loaded:
+            try:
+                self._training_index = TrainingIndex.for_file(self.training_csv)
+                if self._training_index is None:
+                    self.logger.warning(f"Training CSV not found at {self.training_csv}")
+            except Exception as e:
+                self.logger.error(f"Error loading CSV: {e}")
+                self._training_index = None
+            self._training_loaded = True
+        return self._training_index
+
     def _initialize_weights(self):
         """Initialize weights for tables based on schema."""
         for schema in self.schema_dict["tables"]:
@@ -64,107 +70,185 @@ class TableIdentifier:
         self.logger.debug(f"Initialized weights for {len(self.weights)} tables")
 
     def _cache_table_embeddings(self):
-        """Cache embeddings for table and column metadata to optimize performance."""
+        """Obtain the schema embedding index used for semantic table scoring."""
         if not self.embedder:
             self.logger.warning("No embedder available, skipping table embedding caching")
             return
 
         try:
-            table_texts = []
-            table_names = []
-            for schema in self.schema_dict["tables"]:
-                for table in self.schema_dict["tables"][schema]:
-                    table_name = f"{schema}.{table}"
-                    table_texts.append(f"{schema}.{table}")
-                    table_names.append(table_name)
-                    for col_name in self.schema_dict["columns"][schema][table]:
-                        table_texts.append(f"{schema}.{table}.{col_name}")
-                        table_names.append(table_name)
-
-            if table_texts:
-                embeddings = self.embedder.encode(table_texts, convert_to_tensor=True)
-                for table_name, embedding in zip(table_names, embeddings):
-                    if table_name not in self.table_embeddings:
-                        self.table_embeddings[table_name] = [embedding]
-                    else:
-                        self.table_embeddings[table_name].append(embedding)
-                self.logger.debug(f"Cached embeddings for {len(table_names)} table/column metadata entries")
+            self.schema_index = SchemaIndex.for_schema(self.schema_dict, self.embedder, self.schema_index)
+            self._sync_weight_vector()
+            self.logger.debug(f"Using schema index with {len(self.schema_index)} table/column metadata entries")
         except Exception as e:
             self.logger.error(f"Error caching table embeddings: {e}")
-            self.table_embeddings = {}
+            self.schema_index = None
+
+    def refresh_tables(self, changed: List[str], schema_index: SchemaIndex = None):
+        """Apply a partial schema refresh after ``schema_dict`` was patched in place.
+
+        Only the changed tables' weights, keyword lists and embeddings are
+        recomputed; learned weights of modified tables are kept.
+
+        Args:
+            changed: Added, modified or dropped tables (schema.table).
+            schema_index: Already patched shared index; patched here if omitted.
+        """
+        for full_table in changed:
+            schema, table = full_table.split('.', 1)
+            if table in self.schema_dict["tables"].get(schema, []):
+                self.weights.setdefault(full_table, 1.0)
+            else:
+                self.weights.pop(full_table, None)
+        self.keyword_automaton = KeywordAutomaton.for_schema(self.schema_dict, self.keyword_automaton, changed)
+        if schema_index is not None:
+            self.schema_index = schema_index
+        elif self.embedder and self.schema_index is not None:
+            self.schema_index = SchemaIndex.for_schema(self.schema_dict, self.embedder, self.schema_index, changed)
+        self._sync_weight_vector()
+        self.logger.debug(f"Refreshed {len(changed)} tables")
 
-    def identify_tables(self, query: str) -> Tuple[List[str], float]:
+    def _sync_weight_vector(self):
+        """Refresh the weight array aligned with the schema index tables."""
+        tables = self.schema_index.tables if self.schema_index else []
+        self.weight_vector = np.fromiter(
+            (self.weights.get(table, 1.0) for table in tables),
+            dtype=np.float32,
+            count=len(tables)
+        )
+
+    def identify_tables(self, query: str, context: QueryContext = None) -> Tuple[List[str], float]:
         """Identify tables relevant to the query.
 
         Combines feedback, pattern matching, semantic embeddings, and keyword matching.
 
         Args:
             query: Natural language query.
+            context: Per-request context holding memoized embeddings.
 
         Returns:
             Tuple: List of table names (schema.table) and confidence score.
         """
         self.logger.debug(f"Identifying tables for query: {query}")
+        if context is None:
+            context = QueryContext(query)
+        with tracing.span("identify_tables"):
+            try:
+                # Step 1: Check feedback for similar queries
+                with tracing.span("identify.feedback"):
+                    feedback = self.feedback_manager.get_similar_feedback(query, threshold=0.8, context=context)
+                result = self._identify_from(query, context, feedback)
+            except Exception as e:
+                self.logger.error(f"Error identifying tables: {e}")
+                result = [], 0.0
+        self._record_result(result)
+        return result
+
+    def identify_tables_many(self, queries: List[str], contexts: List[QueryContext] = None) -> List[Tuple[List[str], float]]:
+        """Identify tables for several queries, batching the similarity stages.
+
+        Feedback lookup and schema scoring run as one matrix product each over
+        all queries; the remaining steps run per query exactly as in
+        ``identify_tables``.
+
+        Args:
+            queries: Natural language queries.
+            contexts: Per-request contexts aligned with ``queries``.
+
+        Returns:
+            List of (tables, confidence) tuples aligned with ``queries``.
+        """
+        if contexts is None:
+            contexts = [QueryContext(query) for query in queries]
+        if not queries:
+            return []
         try:
-            # Step 1: Check feedback for similar queries
-            feedback = self.feedback_manager.get_similar_feedback(query, threshold=0.8)
-            if feedback:
-                self.logger.debug(f"Found similar feedback: {feedback['tables']}")
-                return feedback['tables'], 0.9
-
-            # Step 2: Pattern matching
-            pattern_matches = self.pattern_manager.match_pattern(query)
-            if pattern_matches:
-                self.logger.debug(f"Pattern matched tables: {pattern_matches}")
-                return pattern_matches, 0.8
-
-            # Step 3: Semantic matching with embeddings
-            if self.embedder and self.table_embeddings:
-                query_embedding = self.embedder.encode([query], convert_to_tensor=True)[0]
-                table_scores = {}
-                for table, embeddings in self.table_embeddings.items():
-                    for emb in embeddings:
-                        score = cosine_similarity([query_embedding.cpu().numpy()], [emb.cpu().numpy()])[0][0]
-                        weighted_score = score * self.weights.get(table, 1.0)
-                        if table not in table_scores or weighted_score > table_scores[table]:
-                            table_scores[table] = weighted_score
-
-                sorted_scores = sorted(table_scores.items(), key=lambda x: x[1], reverse=True)
-                top_tables = [table for table, score in sorted_scores[:3] if score > 0.5]
-                confidence = max(score for table, score in sorted_scores[:3]) if sorted_scores else 0.0
-                if top_tables:
-                    self.logger.debug(f"Embedding-based tables: {top_tables}, confidence: {confidence}")
-                    return top_tables, confidence
-
-            # Step 4: Keyword matching (fallback)
-            if self.nlp:
-                doc = self.nlp(query.lower())
-                keyword_matches = set()
-                for schema in self.schema_dict["tables"]:
-                    for table in self.schema_dict["tables"][schema]:
-                        table_name = table.lower()
-                        full_table = f"{schema}.{table}"
-                        if table_name in query.lower() or table_name.replace('_', ' ') in query.lower():
-                            keyword_matches.add(full_table)
-                        for col_name in self.schema_dict["columns"][schema][table]:
-                            col_lower = col_name.lower()
-                            if col_lower in query.lower() or col_lower.replace('_', ' ') in query.lower():
-                                keyword_matches.add(full_table)
-                if keyword_matches:
-                    self.logger.debug(f"Keyword matched tables: {keyword_matches}")
-                    return list(keyword_matches), 0.7
-
-            # Step 5: Fallback to training data
-            for training_query, *tables in self.training_data:
-                if query.lower() in training_query.lower():
-                    self.logger.debug(f"Training data matched tables: {tables}")
-                    return tables, 0.6
-
-            self.logger.warning(f"No tables identified for query: {query}")
-            return [], 0.0
+            with tracing.span("identify.feedback_batch", size=len(queries)):
+                feedback = self.feedback_manager.get_similar_feedback_many(queries, threshold=0.8, contexts=contexts)
+            top_scores = [None] * len(queries)
+            if self.embedder and self.schema_index is not None and len(self.schema_index):
+                with tracing.span("identify.embedding_batch", size=len(queries)):
+                    query_matrix = np.stack([context.encode(self.embedder, query) for query, context in zip(queries, contexts)])
+                    top_scores = self.schema_index.topk_many(query_matrix, 3, weights=self.weight_vector)
         except Exception as e:
-            self.logger.error(f"Error identifying tables: {e}")
-            return [], 0.0
+            self.logger.error(f"Error scoring query batch, identifying queries individually: {e}")
+            return [self.identify_tables(query, context) for query, context in zip(queries, contexts)]
+
+        results = []
+        for query, context, match, scores in zip(queries, contexts, feedback, top_scores):
+            try:
+                result = self._identify_from(query, context, match, scores)
+            except Exception as e:
+                self.logger.error(f"Error identifying tables: {e}")
+                result = [], 0.0
+            self._record_result(result)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _record_result(result: Tuple[List[str], float]):
+        """Count whether the cascade answered, with the confidence it returned."""
+        tables, confidence = result
+        tracing.record_outcome("identify_tables", bool(tables), confidence if tables else None)
+
+    def _identify_from(self, query: str, context: QueryContext, feedback: Dict,
+                       top_scores: List[Tuple[str, float]] = None) -> Tuple[List[str], float]:
+        """Run the identification cascade given the feedback lookup result.
+
+        Args:
+            query: Natural language query.
+            context: Per-request context holding memoized embeddings.
+            feedback: Result of the feedback lookup for ``query``.
+            top_scores: Precomputed schema top-k for step 3; scored here if omitted.
+
+        Returns:
+            Tuple: List of table names (schema.table) and confidence score.
+        """
+        tracing.record_outcome("identify.feedback", bool(feedback), 0.9 if feedback else None)
+        if feedback:
+            self.logger.debug(f"Found similar feedback: {feedback['tables']}")
+            return feedback['tables'], 0.9
+
+        # Step 2: Pattern matching
+        with tracing.span("identify.pattern"):
+            pattern_matches = self.pattern_manager.match_pattern(query, context)
+        tracing.record_outcome("identify.pattern", bool(pattern_matches), 0.8 if pattern_matches else None)
+        if pattern_matches:
+            self.logger.debug(f"Pattern matched tables: {pattern_matches}")
+            return pattern_matches, 0.8
+
+        # Step 3: Semantic matching with embeddings
+        if self.embedder and self.schema_index is not None and len(self.schema_index):
+            with tracing.span("identify.embedding"):
+                if top_scores is None:
+                    query_embedding = context.encode(self.embedder, query)
+                    top_scores = self.schema_index.topk(query_embedding, 3, weights=self.weight_vector)
+                top_tables = [table for table, score in top_scores if score > 0.5]
+                confidence = max(score for table, score in top_scores) if top_scores else 0.0
+            tracing.record_outcome("identify.embedding", bool(top_tables), confidence)
+            if top_tables:
+                self.logger.debug(f"Embedding-based tables: {top_tables}, confidence: {confidence}")
+                return top_tables, confidence
+
+        # Step 4: Keyword matching (fallback)
+        if self.nlp:
+            with tracing.span("identify.keyword"):
+                keyword_matches = self.keyword_automaton.match(query)
+            tracing.record_outcome("identify.keyword", bool(keyword_matches), 0.7 if keyword_matches else None)
+            if keyword_matches:
+                self.logger.debug(f"Keyword matched tables: {keyword_matches}")
+                return keyword_matches, 0.7
+
+        # Step 5: Fallback to training data
+        with tracing.span("identify.training"):
+            index = self.training_index
+            training_match = index.match(query) if index is not None else None
+        tracing.record_outcome("identify.training", training_match is not None, 0.6 if training_match is not None else None)
+        if training_match is not None:
+            self.logger.debug(f"Training data matched tables: {training_match}")
+            return training_match, 0.6
+
+        self.logger.warning(f"No tables identified for query: {query}")
+        return [], 0.0
 
     def save_name_matches(self):
         """Save name matching data to disk."""
@@ -213,5 +297,6 @@ class TableIdentifier:
                 if table not in tables:
                     self.weights[table] *= 0.95
                     self.logger.debug(f"Decreased weight for {table} to {self.weights[table]}")
+            self._sync_weight_vector()
         except Exception as e:
             self.logger.error(f"Error updating weights: {e}")
\ No newline at end of file
@@ -0,0 +1,238 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+class LatencyHistogram:
+    """HDR-style latency histogram with bounded relative error.
+
+    Values are recorded in microseconds. Below 256us every value has its own
+    bucket; above that each power of two is split into 128 linear sub-buckets,
+    so any recorded value is reproduced within 1%, and memory grows only with
+    the number of distinct buckets touched.
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    @classmethod
+    def _bucket(cls, value_us: int) -> int:
+        shift = value_us.bit_length() - cls.SUB_BUCKET_BITS
+        if shift <= 0:
+            return value_us
+        return (value_us >> shift) << shift
+
+    def record(self, seconds: float):
+        """Add one latency sample given in seconds."""
+        value_us = max(int(seconds * 1_000_000), 0)
+        bucket = self._bucket(value_us)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile(self, q: float) -> float:
+        """Latency in milliseconds below which ``q`` percent of samples fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket, self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and percentiles in milliseconds."""
+        return {
+            "count": self.count,
+            "mean_ms": (self.total_us / self.count / 1000.0) if self.count else 0.0,
+            "min_ms": (self.min_us or 0) / 1000.0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_us / 1000.0
+        }
+
+
+class StageStats:
+    """Latency, hit/miss counts and confidence distribution for one stage."""
+
+    CONFIDENCE_BINS = 10
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.hits = 0
+        self.misses = 0
+        self.confidence = [0] * self.CONFIDENCE_BINS
+
+    def record_outcome(self, hit: bool, confidence: Optional[float] = None):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if confidence is not None:
+            index = min(max(int(confidence * self.CONFIDENCE_BINS), 0), self.CONFIDENCE_BINS - 1)
+            self.confidence[index] += 1
+
+    def summary(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "latency": self.latency.summary(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "confidence": {
+                f"{i / self.CONFIDENCE_BINS:.1f}-{(i + 1) / self.CONFIDENCE_BINS:.1f}": count
+                for i, count in enumerate(self.confidence) if count
+            }
+        }
+
+
+class Tracer:
+    """Collects span latencies, stage outcomes and an optional Chrome trace.
+
+    Spans are cheap enough to leave on: each records one histogram sample
+    under a lock and, while trace recording is enabled, appends one complete
+    ("X") event to a bounded buffer that can be dumped for chrome://tracing
+    or Perfetto.
+    """
+
+    def __init__(self, max_events: int = 100000):
+        """Initialize empty statistics.
+
+        Args:
+            max_events: Trace events kept; older events are dropped first.
+        """
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+        self._events = deque(maxlen=max_events)
+        self._origin = time.perf_counter()
+        self.recording = False
+
+    def _stage(self, name: str) -> StageStats:
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages.setdefault(name, StageStats())
+        return stats
+
+    def start_recording(self):
+        """Start keeping Chrome trace events."""
+        self.recording = True
+
+    def stop_recording(self):
+        """Stop keeping Chrome trace events; statistics are still collected."""
+        self.recording = False
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time the enclosed block under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._stage(name).latency.record(end - start)
+                if self.recording:
+                    self._events.append({
+                        "name": name,
+                        "ph": "X",
+                        "ts": (start - self._origin) * 1_000_000,
+                        "dur": (end - start) * 1_000_000,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": args
+                    })
+
+    def record_outcome(self, name: str, hit: bool, confidence: Optional[float] = None):
+        """Count a hit or miss for a stage, with the confidence it answered with."""
+        with self._lock:
+            self._stage(name).record_outcome(hit, confidence)
+
+    def traced(self, name: str, outcome: Callable = bool):
+        """Decorator spanning a function and counting ``outcome(result)`` as a hit or miss."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    result = fn(*args, **kwargs)
+                self.record_outcome(name, outcome(result))
+                return result
+            return wrapper
+        return decorator
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-span latency summary, hit/miss counts and confidence histogram."""
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._stages.items())}
+
+    def dump_chrome_trace(self, path: str) -> int:
+        """Write recorded events as Chrome trace JSON.
+
+        Args:
+            path: Output file.
+
+        Returns:
+            int: Number of events written.
+        """
+        with self._lock:
+            events = list(self._events)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def reset(self):
+        """Drop all statistics and events."""
+        with self._lock:
+            self._stages.clear()
+            self._events.clear()
+            self._origin = time.perf_counter()
+
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return _tracer
+
+def span(name: str, **args):
+    """Span on the process-wide tracer."""
+    return _tracer.span(name, **args)
+
+def record_outcome(name: str, hit: bool, confidence: Optional[float] = None):
+    """Record a stage outcome on the process-wide tracer."""
+    _tracer.record_outcome(name, hit, confidence)
+
+def traced(name: str, outcome: Callable = bool):
+    """Decorator using the process-wide tracer."""
+    return _tracer.traced(name, outcome)
+
+def format_stats(stats: Dict[str, Dict]) -> List[str]:
+    """Render ``Tracer.stats()`` as text lines for the CLI."""
+    lines = [f"{'span':<28}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'hits':>8}{'misses':>8}"]
+    for name, summary in stats.items():
+        latency = summary["latency"]
+        lines.append(
+            f"{name:<28}{latency['count']:>8}{latency['p50_ms']:>10.2f}{latency['p90_ms']:>10.2f}"
+            f"{latency['p99_ms']:>10.2f}{summary['hits']:>8}{summary['misses']:>8}"
+        )
+        if summary["confidence"]:
+            buckets = ", ".join(f"{band}: {count}" for band, count in summary["confidence"].items())
+            lines.append(f"{'':<4}confidence {buckets}")
+    return lines
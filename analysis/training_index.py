@@ -0,0 +1,172 @@
+import csv
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+_SEPARATOR = "\x00"
+_GRAM = 3
+# Postings intersected before verifying candidates; the rarest few already
+# leave only a handful of rows, further intersections cost more than they save
+_MAX_INTERSECTIONS = 4
+
+
+class TrainingIndex:
+    """Substring index over the training queries of ``training_data.csv``.
+
+    The lowercased queries are stored back to back in one string, separated
+    by NUL, with the start offset of each row. Every character trigram of
+    that text is packed into one integer (three 21-bit code points) and the
+    index keeps, for each distinct trigram, the sorted rows containing it:
+
+        grams     sorted unique trigram keys
+        offsets   grams[i] occurs in rows postings[offsets[i]:offsets[i + 1]]
+        postings  row numbers, ascending within each trigram
+
+    A query of three or more characters can only occur in rows holding all
+    of its trigrams, so a lookup intersects the rarest postings and verifies
+    the few remaining rows with ``str.find``. Shorter queries are found with
+    one scan of the joined text. Either way the answer is the first row in
+    file order whose query contains the lowercased query.
+    """
+
+    def __init__(self, queries: List[str], tables: List[List]):
+        """Build the index.
+
+        Args:
+            queries: Training queries in file order.
+            tables: Table columns of each row, aligned with ``queries``.
+        """
+        self.tables = tables
+        lowered = [query.lower().replace(_SEPARATOR, " ") for query in queries]
+        lengths = np.fromiter((len(query) for query in lowered), dtype=np.int64, count=len(lowered))
+        self.starts = np.zeros(len(lowered), dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=self.starts[1:])
+        self.text = _SEPARATOR.join(lowered)
+        self.grams, self.offsets, self.postings = self._build(self.text, self.starts)
+
+    @staticmethod
+    def _build(text: str, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Trigram keys, posting offsets and postings of the joined text."""
+        chars = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.uint64)
+        if len(chars) < _GRAM:
+            return np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        keys = _pack(chars[:-2], chars[1:-1], chars[2:])
+        # Trigrams spanning a separator belong to no row
+        separator = chars == 0
+        valid = ~(separator[:-2] | separator[1:-1] | separator[2:])
+        positions = np.flatnonzero(valid)
+        keys = keys[positions]
+        rows = (np.searchsorted(starts, positions, side="right") - 1).astype(np.int32)
+        # Positions ascend, so a stable sort leaves each trigram's rows ascending
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys, postings = keys[keep], rows[keep]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        offsets = np.append(np.flatnonzero(first), len(keys))
+        return keys[first], offsets, postings
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def match(self, query: str) -> Optional[List]:
+        """Tables of the first training row whose query contains ``query`` (case-insensitive).
+
+        Returns:
+            Optional[List]: The row's table columns, or None if no row matches.
+        """
+        needle = query.lower()
+        if not len(self.tables) or _SEPARATOR in needle:
+            return None
+        if len(needle) < _GRAM:
+            position = self.text.find(needle)
+            if position < 0:
+                return None
+            return self.tables[int(np.searchsorted(self.starts, position, side="right")) - 1]
+
+        for row in self._candidates(needle):
+            end = self.starts[row + 1] - 1 if row + 1 < len(self.starts) else len(self.text)
+            if self.text.find(needle, self.starts[row], end) >= 0:
+                return self.tables[row]
+        return None
+
+    def _candidates(self, needle: str) -> np.ndarray:
+        """Rows holding every trigram of ``needle``, ascending."""
+        chars = np.frombuffer(needle.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.uint64)
+        keys = np.unique(_pack(chars[:-2], chars[1:-1], chars[2:]))
+        slots = np.searchsorted(self.grams, keys)
+        if np.any(slots >= len(self.grams)) or np.any(self.grams[np.minimum(slots, len(self.grams) - 1)] != keys):
+            return np.zeros(0, dtype=np.int32)
+        sizes = self.offsets[slots + 1] - self.offsets[slots]
+        rows = None
+        for slot in slots[np.argsort(sizes)][:_MAX_INTERSECTIONS]:
+            posting = self.postings[self.offsets[slot]:self.offsets[slot + 1]]
+            rows = posting if rows is None else np.intersect1d(rows, posting, assume_unique=True)
+            if not len(rows):
+                break
+        return rows
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "TrainingIndex":
+        """Parse a training CSV (query column first, table columns after) and index it.
+
+        Rows whose query is not text are skipped.
+
+        Raises:
+            Exception: Whatever pandas raises for an unreadable file.
+        """
+        df = pd.read_csv(csv_path, quoting=csv.QUOTE_ALL, on_bad_lines='warn')
+        queries, tables = [], []
+        for training_query, *row_tables in df.values.tolist():
+            if isinstance(training_query, str):
+                queries.append(training_query)
+                tables.append(row_tables)
+        return cls(queries, tables)
+
+    @classmethod
+    def for_file(cls, csv_path: str) -> Optional["TrainingIndex"]:
+        """Return the index of ``csv_path``, parsing the file only when it changed.
+
+        Indexes are shared by every caller in the process and keyed by the
+        file's path, size and modification time.
+
+        Returns:
+            Optional[TrainingIndex]: None if the file does not exist.
+        """
+        try:
+            stat = os.stat(csv_path)
+        except FileNotFoundError:
+            return None
+        key = (os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns)
+        with _loaded_lock:
+            index = _loaded.get(key)
+            if index is not None:
+                _loaded.move_to_end(key)
+                return index
+        index = cls.from_csv(csv_path)
+        logging.getLogger("table_identifier").debug(
+            f"Indexed {len(index)} training records from {csv_path} ({len(index.grams)} trigrams)"
+        )
+        with _loaded_lock:
+            for stale in [k for k in _loaded if k[0] == key[0]]:
+                del _loaded[stale]
+            _loaded[key] = index
+            while len(_loaded) > _MAX_LOADED:
+                _loaded.popitem(last=False)
+        return index
+
+
+def _pack(first: np.ndarray, second: np.ndarray, third: np.ndarray) -> np.ndarray:
+    """One uint64 key per trigram of 21-bit code points."""
+    return (first << np.uint64(42)) | (second << np.uint64(21)) | third
+
+
+_MAX_LOADED = 2
+_loaded: "OrderedDict[Tuple[str, int, int], TrainingIndex]" = OrderedDict()
+_loaded_lock = threading.Lock()
@@ -0,0 +1 @@
+# benchmarks: Offline latency benchmarks for the table identification pipeline
@@ -0,0 +1,136 @@
+# benchmarks/fixtures.py: Offline stand-ins and workload generation for the benchmark suite
+
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import numpy as np
+import spacy
+from typing import Dict, List, Tuple
+from nlp import spacy_registry
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMAS = ("BikeStores", "adventureworks")
+
+# Verbs tagged by the blank pipeline so preprocessing sees a meaningful structure
+QUERY_VERBS = ["show", "list", "get", "find", "count", "give", "display", "return", "fetch", "sum"]
+
+class HashEmbedder:
+    """Deterministic SentenceTransformer stand-in built from hashed word features.
+
+    Each lowercase word (underscores and dots split) and each word bigram is
+    hashed into a signed bucket, so texts sharing words get high cosine
+    similarity, exactly as they would with a real model, without downloads.
+    """
+
+    def __init__(self, dim: int = 384):
+        """Initialize with the embedding dimension.
+
+        Args:
+            dim: Output vector dimension.
+        """
+        self.dim = dim
+        self.model_name = f"hash-embedder-{dim}"
+        self.calls = 0
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_tensor: bool = False, **kwargs) -> np.ndarray:
+        """Embed sentences as normalized float32 rows."""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        self.calls += 1
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for feature in self._features(sentence):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 32) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def blank_pipeline():
+    """Blank English spaCy pipeline with a rule that tags common query verbs."""
+    nlp = spacy.blank("en")
+    ruler = nlp.add_pipe("attribute_ruler")
+    ruler.add(patterns=[[{"LOWER": {"IN": QUERY_VERBS}}]], attrs={"POS": "VERB"})
+    return nlp
+
+
+def install_offline_models(embedder: HashEmbedder):
+    """Route spaCy and SentenceTransformer lookups to the offline stand-ins."""
+    from feedback.feedback_manager import FeedbackManager
+    spacy_registry.register_model("en_core_web_sm", blank_pipeline())
+    FeedbackManager._embedder = embedder
+
+
+def load_schema(db_name: str) -> Dict:
+    """Load a cached schema shipped with the repository."""
+    with open(os.path.join(REPO_ROOT, "schema_cache", db_name, "schema.json")) as f:
+        return json.load(f)
+
+
+def _words(identifier: str) -> str:
+    spaced = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', identifier).replace('_', ' ')
+    return re.sub(r'\s+', ' ', spaced).strip().lower()
+
+
+def synthetic_queries(schema_dict: Dict, count: int, seed: int) -> List[Tuple[str, List[str]]]:
+    """Generate labeled queries mentioning a table and some of its columns.
+
+    Args:
+        schema_dict: Schema dictionary.
+        count: Number of queries.
+        seed: Random seed.
+
+    Returns:
+        List of (query, [schema.table]) pairs.
+    """
+    rng = random.Random(seed)
+    tables = [(schema, table) for schema in schema_dict["tables"] for table in schema_dict["tables"][schema]]
+    templates = [
+        "{verb} {table} by {col}",
+        "{verb} all {table} with {col} and {col2}",
+        "{verb} the {col} of each {table}",
+        "{verb} {table} {col} per {col2}",
+        "{verb} total {col} for {table}",
+    ]
+    queries = []
+    for _ in range(count):
+        schema, table = rng.choice(tables)
+        columns = list(schema_dict["columns"][schema][table]) or [table]
+        query = rng.choice(templates).format(
+            verb=rng.choice(QUERY_VERBS),
+            table=_words(table),
+            col=_words(rng.choice(columns)),
+            col2=_words(rng.choice(columns))
+        )
+        queries.append((query, [f"{schema}.{table}"]))
+    return queries
+
+
+def paraphrase(query: str, rng: random.Random) -> str:
+    """Drop or repeat one non-leading word to get a near-duplicate query."""
+    words = query.split()
+    if len(words) < 3:
+        return query
+    index = rng.randrange(1, len(words))
+    if rng.random() < 0.5:
+        del words[index]
+    else:
+        words.insert(index, words[index])
+    return " ".join(words)
+
+
+def prepare_workdir(workdir: str):
+    """Create the relative directories and config files the managers expect."""
+    for directory in ("logs", "feedback_cache", "models", "app-config"):
+        os.makedirs(os.path.join(workdir, directory), exist_ok=True)
+    patterns = os.path.join(REPO_ROOT, "app-config", "global_patterns.json")
+    if os.path.exists(patterns):
+        shutil.copy(patterns, os.path.join(workdir, "app-config", "global_patterns.json"))
@@ -1,10 +1,13 @@
 import logging
-import spacy
+from nlp import spacy_registry
 import os
 import shutil
 import json
 from filelock import Timeout
 from typing import List
+from nlp.query_context import QueryContext
+from analysis import tracing
+from feedback.feedback_archive import ARCHIVE_EXTENSION
 
 class DatabaseAnalyzerCLI:
     """Command-line interface for interacting with the DatabaseAnalyzer."""
@@ -17,11 +20,7 @@ class DatabaseAnalyzerCLI:
         """
         self.logger = logging.getLogger("interface")
         self.analyzer = analyzer
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except Exception as e:
-            self.logger.error(f"Failed to load spacy model: {e}")
-            self.nlp = None
+        self.nlp = spacy_registry.lazy("en_core_web_sm")
         self.example_queries = [
             "Show me all stores with store names",
             "List all products with prices",
@@ -42,7 +41,8 @@ class DatabaseAnalyzerCLI:
             print("2. Query Mode")
             print("3. Reload Configurations")
             print("4. Manage Feedback")
-            print("5. Exit")
+            print("5. Statistics")
+            print("6. Exit")
 
             choice = input("Select option: ").strip()
 
@@ -57,6 +57,8 @@ class DatabaseAnalyzerCLI:
             elif choice == "4":
                 self._manage_feedback()
             elif choice == "5":
+                self._show_statistics()
+            elif choice == "6":
                 self.logger.info("Exiting application")
                 print("Exiting...")
                 break
@@ -107,13 +109,14 @@ class DatabaseAnalyzerCLI:
                     return
             print("Invalid selection")
 
-    def _validate_query(self, query: str) -> bool:
+    def _validate_query(self, query: str, context: QueryContext = None) -> bool:
         """Validate if a query is meaningful and relevant to the database schema.
 
         Uses spacy for semantic validation and analyzer for schema relevance.
 
         Args:
             query: The query to validate.
+            context: Per-request context reused when the query is processed.
 
         Returns:
             bool: True if the query is valid, False otherwise.
@@ -132,21 +135,20 @@ class DatabaseAnalyzerCLI:
             return False
 
         # Semantic validation with spacy
-        if self.nlp:
-            doc = self.nlp(query.lower())
-            has_noun_chunk = any(chunk for chunk in doc.noun_chunks)
-            has_verb = any(token.pos_ == "VERB" for token in doc)
-            if not (has_noun_chunk or has_verb):
+        if context is None:
+            context = QueryContext(query)
+        parsed = context.parse(query) if self.nlp else None
+        if parsed is not None:
+            if not parsed.is_meaningful():
                 self.logger.warning(f"Query lacks meaningful structure: {query}")
                 return False
             # Check if query is likely English
-            english_tokens = sum(1 for token in doc if token.is_alpha and token.lang_ == "en")
-            if english_tokens < len([token for token in doc if token.is_alpha]) * 0.5:
+            if not parsed.is_likely_english():
                 self.logger.warning(f"Query may not be in English: {query}")
                 return False
 
         # Check relevance to schema using analyzer
-        if not self.analyzer._is_relevant_query(query):
+        if not self.analyzer._is_relevant_query(query, context):
             self.logger.warning(f"Query not relevant to schema: {query}")
             return False
 
@@ -188,7 +190,8 @@ class DatabaseAnalyzerCLI:
                 self.logger.debug("Exiting query mode")
                 return
 
-            if not self._validate_query(query):
+            context = QueryContext(query)
+            if not self._validate_query(query, context):
                 self.logger.warning(f"Invalid query: {query}")
                 print("Please enter a meaningful query in English.")
                 self._display_example_queries()
@@ -197,7 +200,7 @@ class DatabaseAnalyzerCLI:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    results, confidence = self.analyzer.process_query(query)
+                    results, confidence = self.analyzer.process_query(query, context)
                     if results is None:
                         self.logger.error("Unable to process query")
                         print("Unable to process query. Please try again or reconnect.")
@@ -346,32 +349,84 @@ class DatabaseAnalyzerCLI:
         else:
             print("Invalid choice")
 
+    def _show_statistics(self):
+        """Show per-stage latency and hit statistics and manage trace recording."""
+        stats = self.analyzer.get_stats()
+        print("\nPipeline Statistics:")
+        if stats["spans"]:
+            for line in tracing.format_stats(stats["spans"]):
+                print(line)
+        else:
+            print("No queries processed yet")
+        for name in ("embedding_cache", "query_parser"):
+            if name in stats:
+                print(f"{name}: {stats[name]['hits']} hits, {stats[name]['misses']} misses")
+        pool = stats.get("connection_pool")
+        if pool:
+            print(f"connection_pool: {pool['open']}/{pool['max_size']} open, {pool['in_use']} in use, "
+                  f"{pool['checkouts']} checkouts, {pool['waits']} waits, {pool['timeouts']} timeouts, "
+                  f"{pool['connect_failures']} connect failures, {pool['recycled']} recycled")
+
+        tracer = tracing.get_tracer()
+        print("\n1. " + ("Stop trace recording" if tracer.recording else "Start trace recording"))
+        print("2. Export Chrome trace")
+        print("3. Reset statistics")
+        print("4. Back")
+        choice = input("Select option: ").strip()
+
+        if choice == "1":
+            if tracer.recording:
+                tracer.stop_recording()
+                print("Trace recording stopped")
+            else:
+                tracer.start_recording()
+                print("Trace recording started")
+        elif choice == "2":
+            path = input("Enter trace file path [default: logs/trace.json]: ").strip() or os.path.join("logs", "trace.json")
+            try:
+                count = self.analyzer.dump_trace(path)
+                print(f"Wrote {count} trace events to {path}")
+            except Exception as e:
+                self.logger.error(f"Error writing trace: {e}")
+                print(f"Error writing trace: {e}")
+        elif choice == "3":
+            tracer.reset()
+            print("Statistics reset")
+        elif choice != "4":
+            print("Invalid choice")
+
     def _export_feedback(self):
-        """Export feedback data to a specified directory."""
-        export_dir = input("Enter export directory path [default: feedback_cache/export]: ").strip()
-        if not export_dir:
-            export_dir = os.path.join("feedback_cache", "export")
+        """Export feedback data to an archive file or, in the legacy layout, a directory."""
+        legacy = input("Use the legacy one-file-per-entry layout? (y/N): ").strip().lower() == 'y'
+        default = os.path.join("feedback_cache", "export")
+        if not legacy:
+            default = os.path.join(default, f"feedback{ARCHIVE_EXTENSION}")
+        export_path = input(f"Enter export path [default: {default}]: ").strip() or default
 
         try:
-            self.analyzer.feedback_manager.export_feedback(export_dir)
-            self.logger.info(f"Feedback exported to {export_dir}")
-            print(f"Feedback exported to {export_dir}")
+            count = self.analyzer.feedback_manager.export_feedback(export_path, legacy=legacy)
+            self.logger.info(f"Feedback exported to {export_path}")
+            print(f"Exported {count} feedback entries to {export_path}")
         except Exception as e:
             self.logger.error(f"Error exporting feedback: {e}")
             print(f"Error exporting feedback: {e}")
 
     def _import_feedback(self):
-        """Import feedback data from a specified directory."""
-        import_dir = input("Enter import directory path: ").strip()
+        """Import feedback data from an archive file or a directory of feedback files."""
+        import_dir = input("Enter import archive or directory path: ").strip()
         if not import_dir or not os.path.exists(import_dir):
-            self.logger.error("Invalid or non-existent import directory")
-            print("Invalid or non-existent directory")
+            self.logger.error("Invalid or non-existent import path")
+            print("Invalid or non-existent path")
             return
 
         try:
-            self.analyzer.feedback_manager.import_feedback(import_dir)
+            def progress(done: int, total: int):
+                print(f"\rImported {done}/{total}", end="", flush=True)
+
+            count = self.analyzer.feedback_manager.import_feedback(import_dir, progress=progress)
+            print()
             self.logger.info(f"Feedback imported from {import_dir}")
-            print(f"Feedback imported from {import_dir}")
+            print(f"Imported {count} feedback entries from {import_dir}")
         except Exception as e:
             self.logger.error(f"Error importing feedback: {e}")
             print(f"Error importing feedback: {e}")
\ No newline at end of file
@@ -1,8 +1,10 @@
 import json
 import os
 import re
-import spacy
-from typing import Dict, List
+from nlp import spacy_registry
+from typing import Dict, Iterable, List, Optional, Set
+from nlp.query_context import QueryContext
+from analysis.keyword_automaton import KeywordAutomaton
 import logging
 import logging.config
 
@@ -13,6 +15,20 @@ class PatternManager:
     against schema metadata using NLP techniques.
     """
 
+    # Column classes used for entity-based matching
+    TEMPORAL_TYPES = ['date', 'datetime', 'timestamp']
+    NUMERIC_TYPES = ['int', 'integer', 'numeric', 'decimal', 'float']
+    MONETARY_TYPES = ['money', 'smallmoney']
+    GEOGRAPHIC_NAMES = ['city', 'country', 'state']
+    ENTITY_CLASSES = {
+        "DATE": "temporal",
+        "TIME": "temporal",
+        "GPE": "geographic",  # Geographic entities (e.g., India, USA)
+        "LOC": "geographic",
+        "CARDINAL": "numeric",
+        "MONEY": "monetary"
+    }
+
     def __init__(self, schema_dict: Dict):
         """Initialize with a schema dictionary.
 
@@ -32,11 +48,10 @@ class PatternManager:
         self.logger = logging.getLogger("patterns")
         self.schema_dict = schema_dict
         self.pattern_weights = self._load_patterns()
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except Exception as e:
-            self.logger.error(f"Failed to load spacy model: {e}")
-            self.nlp = None
+        self.keyword_automaton = KeywordAutomaton.for_schema(schema_dict)
+        self.table_classes: Dict[str, Set[str]] = {}
+        self.class_masks = self._build_class_masks()
+        self.nlp = spacy_registry.lazy("en_core_web_sm")
         self.logger.debug(f"Initialized PatternManager with {len(self.pattern_weights)} patterns")
 
     def _load_patterns(self) -> Dict[str, Dict[str, float]]:
@@ -66,7 +81,72 @@ class PatternManager:
             }
         return normalized
 
-    def match_pattern(self, query: str) -> List[str]:
+    def _column_classes(self, schema: str, table: str) -> Set[str]:
+        """Semantic column classes present in one table."""
+        classes = set()
+        for col_name, col_info in self.schema_dict['columns'].get(schema, {}).get(table, {}).items():
+            col_type = col_info['type'].lower()
+            col_lower = col_name.lower()
+            if col_type in self.TEMPORAL_TYPES:
+                classes.add("temporal")
+            if any(name in col_lower for name in self.GEOGRAPHIC_NAMES):
+                classes.add("geographic")
+            if col_type in self.NUMERIC_TYPES:
+                classes.add("numeric")
+            if col_type in self.MONETARY_TYPES:
+                classes.add("monetary")
+            if col_info.get('is_primary_key') or col_info.get('is_foreign_key'):
+                classes.add("identifier")
+        return classes
+
+    def _build_class_masks(self, changed: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Precompute, per semantic column class, a bitset of tables having such a column.
+
+        Bits follow the table order of ``self.keyword_automaton``. Column
+        classes are kept per table, so after a partial schema refresh only
+        the ``changed`` tables are re-examined.
+
+        Args:
+            changed (Optional[Iterable[str]]): Tables (schema.table) to re-examine.
+
+        Returns:
+            Dict[str, int]: Table bitset per class (temporal, geographic, numeric,
+            monetary, identifier).
+        """
+        for full_table in changed or ():
+            self.table_classes.pop(full_table, None)
+        masks = {"temporal": 0, "geographic": 0, "numeric": 0, "monetary": 0, "identifier": 0}
+        for bit_index, full_table in enumerate(self.keyword_automaton.tables):
+            classes = self.table_classes.get(full_table)
+            if classes is None:
+                classes = self.table_classes[full_table] = self._column_classes(*full_table.split('.', 1))
+            bit = 1 << bit_index
+            for column_class in classes:
+                masks[column_class] |= bit
+        self.logger.debug(f"Built column class bitsets for {len(self.keyword_automaton.tables)} tables")
+        return masks
+
+    def refresh_tables(self, changed: List[str]):
+        """Update keyword matching and column classes after ``schema_dict`` was patched in place.
+
+        Args:
+            changed (List[str]): Added, modified or dropped tables (schema.table).
+        """
+        self.keyword_automaton = KeywordAutomaton.for_schema(self.schema_dict, self.keyword_automaton, changed)
+        self.class_masks = self._build_class_masks(changed)
+
+    def tables_in_class(self, column_class: str) -> List[str]:
+        """Tables (schema.table) having at least one column of a semantic class.
+
+        Args:
+            column_class (str): One of temporal, geographic, numeric, monetary, identifier.
+
+        Returns:
+            List[str]: Table names in schema order.
+        """
+        return self.keyword_automaton.tables_for(self.class_masks.get(column_class, 0))
+
+    def match_pattern(self, query: str, context: QueryContext = None) -> List[str]:
         """Match query against patterns and schema metadata.
 
         Uses spacy for tokenization and entity recognition to match query terms
@@ -74,6 +154,7 @@ class PatternManager:
 
         Args:
             query (str): The query text.
+            context (QueryContext): Per-request context providing the shared parse.
 
         Returns:
             List[str]: Matching table names (schema.table).
@@ -85,49 +166,20 @@ class PatternManager:
 
         try:
             query_lower = query.lower()
-            doc = self.nlp(query_lower)
+            if context is None:
+                context = QueryContext(query)
+            parsed = context.parse(query_lower)
             matches = set()
 
             # Keyword matching against table and column names
-            for schema in self.schema_dict['tables']:
-                for table in self.schema_dict['tables'][schema]:
-                    table_name = table.lower()
-                    full_table = f"{schema}.{table}"
-                    # Match table name
-                    if table_name in query_lower or table_name.replace('_', ' ') in query_lower:
-                        matches.add(full_table)
-                    # Match column names
-                    for col_name in self.schema_dict['columns'][schema][table]:
-                        col_lower = col_name.lower()
-                        if col_lower in query_lower or col_lower.replace('_', ' ') in query_lower:
-                            matches.add(full_table)
-
-            # Pattern matching for entities (dates, locations, numbers)
-            for token in doc:
-                if token.ent_type_ == "DATE":
-                    # Match tables with date columns
-                    for schema in self.schema_dict['tables']:
-                        for table in self.schema_dict['tables'][schema]:
-                            for col_name, col_info in self.schema_dict['columns'][schema][table].items():
-                                if col_info['type'].lower() in ['date', 'datetime', 'timestamp']:
-                                    matches.add(f"{schema}.{table}")
-                                    break
-                if token.ent_type_ == "GPE":  # Geographic entities (e.g., India, USA)
-                    # Match tables likely to contain location data
-                    for schema in self.schema_dict['tables']:
-                        for table in self.schema_dict['tables'][schema]:
-                            for col_name in self.schema_dict['columns'][schema][table]:
-                                if 'city' in col_name.lower() or 'country' in col_name.lower() or 'state' in col_name.lower():
-                                    matches.add(f"{schema}.{table}")
-                                    break
-                if token.ent_type_ == "CARDINAL":  # Numbers
-                    # Match tables with numeric columns
-                    for schema in self.schema_dict['tables']:
-                        for table in self.schema_dict['tables'][schema]:
-                            for col_name, col_info in self.schema_dict['columns'][schema][table].items():
-                                if col_info['type'].lower() in ['int', 'integer', 'numeric', 'decimal', 'float']:
-                                    matches.add(f"{schema}.{table}")
-                                    break
+            mask = self.keyword_automaton.match_mask(query_lower)
+
+            # Pattern matching for entities (dates, locations, numbers, amounts)
+            for label in parsed.entity_types():
+                column_class = self.ENTITY_CLASSES.get(label)
+                if column_class:
+                    mask |= self.class_masks[column_class]
+            matches.update(self.keyword_automaton.tables_for(mask))
 
             # Check pattern weights from global_patterns.json
             norm_query = re.sub(r'\s+', ' ', query_lower.strip())
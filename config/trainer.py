@@ -94,8 +94,9 @@ class Trainer:
         pattern_manager.logger.debug("Updated patterns from training data")
 
         # Update feedback
-        for _, row in self.training_data.iterrows():
-            desc = row["Description"]
-            table = f"{row['Schema']}.{row['Table_Name']}"
-            feedback_manager.store_feedback(desc, [table], self.schema_dict)
+        feedback_manager.store_feedback_many(
+            [(row["Description"], [f"{row['Schema']}.{row['Table_Name']}"])
+             for _, row in self.training_data.iterrows()],
+            self.schema_dict
+        )
         self.logger.debug("Updated configs from training data")
\ No newline at end of file
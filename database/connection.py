@@ -1,17 +1,27 @@
 import pyodbc
+from contextlib import contextmanager
 from typing import Dict, Optional
 import logging
 import logging.config
 import os
+from database.pool import ConnectionPool, PooledConnection
+
+# One connection held by the caller of a schema build plus one per catalog
+# section extracted concurrently (schema.catalog_extractor.SECTIONS)
+DEFAULT_POOL_SIZE = 6
 
 class DatabaseConnection:
-    """Manages database connections using pyodbc.
+    """Manages a pool of database connections using pyodbc.
 
-    Provides methods to connect, close, and manage database cursors.
+    Provides methods to connect, close, and lease pooled connections and cursors.
     """
 
-    def __init__(self):
-        """Initialize the connection manager."""
+    def __init__(self, driver=None):
+        """Initialize the connection manager.
+
+        Args:
+            driver: DB-API module used to connect; pyodbc if None.
+        """
         # Ensure logs directory exists
         os.makedirs("logs", exist_ok=True)
         logging_config_path = "app-config/logging_config.ini"
@@ -22,42 +32,111 @@ class DatabaseConnection:
                 print(f"Error loading logging config: {e}")
         
         self.logger = logging.getLogger("connection")
-        self.connection = None
+        self.driver = driver if driver is not None else pyodbc
+        self.pool: Optional[ConnectionPool] = None
         self.current_config = None
         self.logger.debug("Initialized DatabaseConnection")
 
     def connect(self, config: Dict) -> bool:
         """Connect to a database using the provided configuration.
 
+        Creates the connection pool and opens its first connection to check
+        the configuration. Optional keys ``pool_size`` (``DEFAULT_POOL_SIZE``), ``pool_max_idle`` and
+        ``pool_max_lifetime`` (seconds) tune the pool.
+
         Args:
             config (Dict): Configuration dictionary with server, database, username, password, and driver.
 
         Returns:
             bool: True if connection is successful, False otherwise.
         """
+        self.close()
+        conn_str = self._connection_string(config)
+        pool = ConnectionPool(
+            lambda: self.driver.connect(conn_str),
+            max_size=int(config.get("pool_size", DEFAULT_POOL_SIZE)),
+            max_idle=float(config.get("pool_max_idle", 300)),
+            max_lifetime=float(config.get("pool_max_lifetime", 3600))
+        )
         try:
-            conn_str = (
-                f"DRIVER={{{config['driver']}}};"
-                f"SERVER={config['server']};"
-                f"DATABASE={config['database']};"
-                f"UID={config['username']};"
-                f"PWD={config['password']}"
-            )
-            self.connection = pyodbc.connect(conn_str)
+            pool.acquire().close()
+            self.pool = pool
             self.current_config = config
             self.logger.info(f"Connected to database: {config['database']}")
             return True
         except Exception as e:
+            pool.close()
             self.logger.error(f"Connection failed: {str(e)}")
             print(f"Connection failed: {str(e)}")
             return False
 
+    @staticmethod
+    def _connection_string(config: Dict) -> str:
+        return (
+            f"DRIVER={{{config['driver']}}};"
+            f"SERVER={config['server']};"
+            f"DATABASE={config['database']};"
+            f"UID={config['username']};"
+            f"PWD={config['password']}"
+        )
+
+    def _require_pool(self) -> ConnectionPool:
+        if self.pool is None:
+            raise RuntimeError("Not connected to a database")
+        return self.pool
+
+    def connection(self, timeout: Optional[float] = None):
+        """Lease a pooled connection for a ``with`` block.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for a free connection.
+
+        Returns:
+            Context manager yielding a PooledConnection.
+
+        Raises:
+            RuntimeError: If not connected.
+        """
+        return self._require_pool().connection(timeout)
+
+    def available_connections(self) -> int:
+        """Connections the pool can lease right now without waiting.
+
+        Raises:
+            RuntimeError: If not connected.
+        """
+        return self._require_pool().available()
+
+    def new_connection(self) -> PooledConnection:
+        """Lease a pooled connection; the caller returns it with ``close()``.
+
+        Used for work that runs on other threads, such as concurrent catalog
+        extraction.
+
+        Returns:
+            PooledConnection: Leased connection.
+
+        Raises:
+            RuntimeError: If not connected.
+        """
+        return self._require_pool().acquire()
+
+    @contextmanager
+    def cursor(self):
+        """Cursor on a leased connection, returned to the pool after the block."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
     def close(self):
-        """Close the database connection."""
-        if self.connection:
-            self.logger.info("Closing database connection")
-            self.connection.close()
-            self.connection = None
+        """Close the connection pool."""
+        if self.pool:
+            self.logger.info(f"Closing database connections: {self.pool.metrics()}")
+            self.pool.close()
+            self.pool = None
             self.current_config = None
 
     def is_connected(self) -> bool:
@@ -66,12 +145,8 @@ class DatabaseConnection:
         Returns:
             bool: True if connected, False otherwise.
         """
-        return self.connection is not None
+        return self.pool is not None and not self.pool.closed
 
-    def get_cursor(self) -> Optional[pyodbc.Cursor]:
-        """Get a cursor for the database connection.
-
-        Returns:
-            Optional[pyodbc.Cursor]: Cursor object if connected, None otherwise.
-        """
-        return self.connection.cursor() if self.connection else None
\ No newline at end of file
+    def metrics(self) -> Dict:
+        """Connection pool metrics, empty when not connected."""
+        return self.pool.metrics() if self.pool else {}
@@ -0,0 +1,334 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional
+
+class PoolTimeout(TimeoutError):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class PoolClosed(RuntimeError):
+    """Raised when acquiring from a closed pool."""
+
+
+class PooledConnection:
+    """A connection leased from a ConnectionPool.
+
+    Behaves like the underlying DB-API connection; ``close()`` returns it to
+    the pool instead of closing it, so code written for plain connections
+    (including ``with connection:`` blocks, which commit on success) works
+    unchanged.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw, created: float):
+        self._pool = pool
+        self._raw = raw
+        self._created = created
+        self._last_used = created
+        self._leased = False
+
+    @property
+    def raw(self):
+        """The underlying driver connection."""
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        """Return the connection to its pool."""
+        if self._leased:
+            self._pool.release(self)
+
+    def discard(self):
+        """Return the connection to its pool as broken, so it is closed."""
+        if self._leased:
+            self._pool.release(self, broken=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Commit on success like pyodbc and sqlite3 connections do; release()
+        # rolls back whatever is left
+        if exc_type is None:
+            try:
+                self._raw.commit()
+            except Exception:
+                self.discard()
+                raise
+            self.close()
+        elif self._pool.probe(self):
+            self.close()
+        else:
+            self.discard()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections.
+
+    Connections are created lazily, up to ``max_size``, by ``connect``; the
+    pool knows nothing about the driver, so any DB-API module (or a fake)
+    can be pooled. Idle connections are reused most-recently-used first and
+    closed once idle longer than ``max_idle`` or older than ``max_lifetime``.
+    A connection idle longer than ``probe_after`` is checked with
+    ``probe_sql`` before it is handed out. Failed connects are retried with
+    exponential backoff and jitter.
+    """
+
+    def __init__(self, connect: Callable[[], object], max_size: int = 4, max_idle: float = 300.0,
+                 max_lifetime: float = 3600.0, probe_after: float = 30.0, probe_sql: str = "SELECT 1",
+                 acquire_timeout: float = 30.0, connect_attempts: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Initialize an empty pool.
+
+        Args:
+            connect: Factory opening a new driver connection.
+            max_size: Maximum open connections, leased or idle.
+            max_idle: Seconds an idle connection is kept.
+            max_lifetime: Seconds after which a connection is recycled.
+            probe_after: Idle seconds after which a connection is probed before reuse.
+            probe_sql: Cheap statement used as the liveness probe.
+            acquire_timeout: Default seconds to wait for a free connection.
+            connect_attempts: Connect attempts before giving up.
+            backoff_base: Delay in seconds before the first retry; doubled each attempt.
+            backoff_max: Cap on a single retry delay.
+            clock: Monotonic time source.
+            sleep: Sleep function used between retries.
+        """
+        self.logger = logging.getLogger("connection")
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.probe_after = probe_after
+        self.probe_sql = probe_sql
+        self.acquire_timeout = acquire_timeout
+        self.connect_attempts = max(1, connect_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._idle: Deque[PooledConnection] = deque()
+        self._open = 0
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "recycled": 0,
+            "connect_failures": 0,
+            "probe_failures": 0,
+            "broken": 0
+        }
+
+    def _expired(self, conn: PooledConnection, now: float) -> bool:
+        return (now - conn._created > self.max_lifetime) or (now - conn._last_used > self.max_idle)
+
+    def _close_raw(self, conn: PooledConnection):
+        try:
+            conn._raw.close()
+        except Exception as e:
+            self.logger.debug(f"Error closing pooled connection: {e}")
+
+    def _drop(self, conn: PooledConnection, reason: str):
+        """Close a connection outside the lock and free its slot."""
+        self._close_raw(conn)
+        with self._cond:
+            self._open -= 1
+            self._metrics["closed"] += 1
+            if reason != "closed":
+                self._metrics[reason] += 1
+            self._cond.notify()
+
+    def probe(self, conn: PooledConnection) -> bool:
+        """Run the liveness probe on a connection.
+
+        Returns:
+            bool: True if the connection answered.
+        """
+        try:
+            cursor = conn._raw.cursor()
+            try:
+                cursor.execute(self.probe_sql)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            self.logger.debug(f"Connection probe failed: {e}")
+            return False
+
+    def _create(self) -> PooledConnection:
+        """Open a connection, retrying with exponential backoff."""
+        last_error = None
+        for attempt in range(self.connect_attempts):
+            if attempt:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                self._sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                raw = self._connect()
+                with self._cond:
+                    self._metrics["created"] += 1
+                return PooledConnection(self, raw, self._clock())
+            except Exception as e:
+                last_error = e
+                with self._cond:
+                    self._metrics["connect_failures"] += 1
+                self.logger.warning(f"Connect attempt {attempt + 1}/{self.connect_attempts} failed: {e}")
+        raise last_error
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Lease a connection, waiting for one to be released if the pool is full.
+
+        Args:
+            timeout: Seconds to wait; ``acquire_timeout`` if None.
+
+        Returns:
+            PooledConnection: Leased connection; ``close()`` returns it.
+
+        Raises:
+            PoolTimeout: If none became available in time.
+            PoolClosed: If the pool was closed.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = self._clock() + timeout
+        waited = False
+        wait_start = None
+        while True:
+            candidate = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolClosed("Connection pool is closed")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeout(f"No connection available within {timeout:.1f}s")
+                    if not waited:
+                        waited = True
+                        wait_start = self._clock()
+                        self._metrics["waits"] += 1
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                conn = candidate
+                now = self._clock()
+                if self._expired(conn, now):
+                    self._drop(conn, "recycled")
+                    continue
+                if now - conn._last_used > self.probe_after and not self.probe(conn):
+                    self._drop(conn, "probe_failures")
+                    continue
+
+            with self._cond:
+                self._metrics["checkouts"] += 1
+                if waited:
+                    self._metrics["wait_seconds"] += self._clock() - wait_start
+            conn._leased = True
+            return conn
+
+    def release(self, conn: PooledConnection, broken: bool = False):
+        """Return a leased connection.
+
+        Args:
+            conn: Connection from ``acquire``.
+            broken: Close it instead of keeping it, e.g. after a network error.
+        """
+        if not conn._leased:
+            return
+        conn._leased = False
+        if not broken:
+            try:
+                conn._raw.rollback()
+            except Exception:
+                broken = True
+        now = self._clock()
+        if broken or self._closed or now - conn._created > self.max_lifetime:
+            self._drop(conn, "broken" if broken else "recycled")
+            return
+        conn._last_used = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Lease a connection for the enclosed block.
+
+        If the block raises and the connection no longer answers the probe,
+        it is discarded rather than returned to the pool.
+        """
+        conn = self.acquire(timeout)
+        with conn:
+            yield conn
+
+    def prune(self) -> int:
+        """Close idle connections past their idle time or lifetime.
+
+        Returns:
+            int: Number of connections closed.
+        """
+        now = self._clock()
+        with self._cond:
+            expired = [conn for conn in self._idle if self._expired(conn, now)]
+            for conn in expired:
+                self._idle.remove(conn)
+        for conn in expired:
+            self._drop(conn, "recycled")
+        return len(expired)
+
+    def close(self):
+        """Close idle connections; leased ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._drop(conn, "closed")
+
+    def available(self) -> int:
+        """Connections that can be leased right now without waiting (idle or not yet opened)."""
+        with self._cond:
+            return self.max_size - self._open + len(self._idle)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def metrics(self) -> Dict:
+        """Pool size and counters for checkouts, waits, failures and recycling."""
+        with self._cond:
+            metrics = dict(self._metrics)
+            metrics.update({
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle)
+            })
+        return metrics
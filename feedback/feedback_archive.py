@@ -0,0 +1,158 @@
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Single-file feedback export:
+#
+#   header   magic, format version, embedding dimension, row count, then a
+#            length-prefixed JSON object naming the embedding model
+#   chunks   row count and length of a JSON list of {query, tables,
+#            timestamp} records, the records, then a row-major little-endian
+#            float32 block of row count x dimension embeddings
+#   end      a chunk header with a row count of zero
+#
+# Both directions stream chunk by chunk; the row count in the header is
+# filled in when the writer is closed.
+
+MAGIC = b"TIFB"
+FORMAT_VERSION = 1
+ARCHIVE_EXTENSION = ".tifb"
+
+_HEADER = struct.Struct("<4sHHIQ")
+_LENGTH = struct.Struct("<I")
+_CHUNK = struct.Struct("<II")
+
+
+class FeedbackArchiveWriter:
+    """Writes feedback rows and their embeddings to a single archive file.
+
+    Rows are buffered and written ``chunk_size`` at a time to a temporary
+    file that replaces ``path`` when the writer is closed without error.
+    """
+
+    def __init__(self, path: str, model: Optional[str], dim: int, chunk_size: int = 4096):
+        """Start an archive.
+
+        Args:
+            path: Archive file to create.
+            model: Name of the model that produced the embeddings.
+            dim: Embedding dimension.
+            chunk_size: Rows per chunk.
+        """
+        self.path = path
+        self.model = model
+        self.dim = dim
+        self.chunk_size = max(1, chunk_size)
+        self.count = 0
+        self._records: List[Dict] = []
+        self._embeddings: List[bytes] = []
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix=".feedback-", suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, dim, 0))
+        meta = json.dumps({"model": model}).encode("utf-8")
+        self._file.write(_LENGTH.pack(len(meta)) + meta)
+
+    def write(self, query: str, tables: List[str], timestamp: str, embedding):
+        """Add one row; ``embedding`` is a float32 vector or its raw bytes."""
+        if not isinstance(embedding, (bytes, bytearray, memoryview)):
+            embedding = np.asarray(embedding, dtype="<f4").tobytes()
+        if len(embedding) != 4 * self.dim:
+            raise ValueError(f"Embedding has {len(embedding) // 4} values, archive dimension is {self.dim}")
+        self._records.append({"query": query, "tables": tables, "timestamp": timestamp})
+        self._embeddings.append(bytes(embedding))
+        if len(self._records) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._records:
+            return
+        records = json.dumps(self._records).encode("utf-8")
+        self._file.write(_CHUNK.pack(len(self._records), len(records)))
+        self._file.write(records)
+        self._file.write(b"".join(self._embeddings))
+        self.count += len(self._records)
+        self._records, self._embeddings = [], []
+
+    def close(self):
+        """Finish the archive and move it into place."""
+        self._flush()
+        self._file.write(_CHUNK.pack(0, 0))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, self.dim, self.count))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the partially written archive."""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class FeedbackArchiveReader:
+    """Streams the chunks of a feedback archive."""
+
+    def __init__(self, path: str):
+        """Open an archive and read its header.
+
+        Raises:
+            ValueError: If the file is not a feedback archive of this format version.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            magic, version, _, self.dim, self.count = _HEADER.unpack(self._file.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a feedback archive")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} has archive version {version}, expected {FORMAT_VERSION}")
+            (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+            meta = json.loads(self._file.read(length).decode("utf-8"))
+        except (struct.error, ValueError):
+            self._file.close()
+            raise
+        self.model: Optional[str] = meta.get("model")
+
+    def chunks(self) -> Iterator[Tuple[List[Dict], np.ndarray]]:
+        """Yield (records, embeddings) per chunk; embeddings is a float32 matrix."""
+        while True:
+            rows, length = _CHUNK.unpack(self._file.read(_CHUNK.size))
+            if rows == 0:
+                return
+            records = json.loads(self._file.read(length).decode("utf-8"))
+            block = self._file.read(rows * self.dim * 4)
+            if len(records) != rows or len(block) != rows * self.dim * 4:
+                raise ValueError(f"{self.path} is truncated")
+            yield records, np.frombuffer(block, dtype="<f4").reshape(rows, self.dim).astype(np.float32, copy=False)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def is_feedback_archive(path: str) -> bool:
+    """True if ``path`` is a file starting with the archive magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
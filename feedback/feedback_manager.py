@@ -1,88 +1,272 @@
+import bisect
+import itertools
 import logging
 import os
-import sqlite3
 import json
+import threading
 import numpy as np
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, List, Dict, Optional, Tuple
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from nlp.embedding_cache import CachedEmbedder
+from nlp.query_context import QueryContext
+from feedback.feedback_archive import FeedbackArchiveReader, FeedbackArchiveWriter, is_feedback_archive
+from feedback.feedback_matrix import FeedbackMatrix
+from feedback.feedback_store import FeedbackStore
+from feedback.vector_index import SimilaritySearch, VectorIndex
 
 class FeedbackManager:
     """Manages feedback storage and retrieval using SQLite for thread-safe operations."""
     
     _embedder = None  # Class-level SentenceTransformer to avoid redundant loading
     
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, index_backend: str = "brute", quantization: Optional[str] = None):
         """Initialize with database name and logging.
 
         Args:
             db_name: Name of the database.
+            index_backend: Vector index used for similarity lookups ("brute" or "hnsw").
+            quantization: "int8" or "float16" to scan quantized embeddings and
+                rescore candidates exactly; None searches float32 rows only.
         """
         self.logger = logging.getLogger("feedback_manager")
         self.db_name = db_name
         self.feedback_dir = os.path.join("feedback_cache", db_name)
         os.makedirs(self.feedback_dir, exist_ok=True)
         self.db_path = os.path.join(self.feedback_dir, "feedback.db")
+        self.index_backend = index_backend
+        self.quantization = quantization
+        self.index_path = os.path.join(self.feedback_dir, f"feedback_index_{index_backend}.npz")
+        # The matrix itself for the brute-force backend, else a VectorIndex
+        self.index: Optional[SimilaritySearch] = None
+        self.matrix: Optional[FeedbackMatrix] = None
         
         if FeedbackManager._embedder is None:
             try:
-                FeedbackManager._embedder = SentenceTransformer('all-distilroberta-v1')
+                FeedbackManager._embedder = CachedEmbedder(
+                    SentenceTransformer('all-distilroberta-v1'), 'all-distilroberta-v1'
+                )
                 self.logger.debug("Loaded SentenceTransformer for feedback")
             except Exception as e:
                 self.logger.error(f"Error loading SentenceTransformer: {e}")
                 FeedbackManager._embedder = None
         self.embedder = FeedbackManager._embedder
         
-        self.feedback_cache = []
+        # Feedback metadata as parallel lists aligned with the matrix rows;
+        # tables stay JSON until a row is returned
+        self.feedback_ids: List[int] = []
+        self.feedback_queries: List[str] = []
+        self.feedback_tables: List[str] = []
+        self.feedback_timestamps: List[str] = []
+        self.last_id = 0
+        self._index_dirty = False
+        # Serializes inserts with their cache appends so ids arrive in order
+        self._write_lock = threading.Lock()
+        self.store = None
         self._init_db()
         self._load_feedback_cache()
         self.logger.debug(f"Initialized FeedbackManager for {db_name}")
 
     def _init_db(self):
-        """Initialize SQLite database for feedback storage."""
+        """Open the SQLite feedback store and the embedding matrix beside it."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS feedback (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        query TEXT NOT NULL,
-                        tables TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        embedding BLOB NOT NULL
-                    )
-                """)
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS query_counts (
-                        query TEXT PRIMARY KEY,
-                        count INTEGER NOT NULL
-                    )
-                """)
-                conn.commit()
+            self.store = FeedbackStore(self.db_path)
+            self.matrix = FeedbackMatrix(self.feedback_dir, quantization=self.quantization,
+                                         source=self.store.identity())
             self.logger.debug(f"Initialized SQLite database at {self.db_path}")
         except Exception as e:
             self.logger.error(f"Error initializing SQLite database: {e}")
 
     def _load_feedback_cache(self):
-        """Load feedback data from SQLite database."""
+        """Load feedback metadata from SQLite and map the embedding matrix.
+
+        Only the text columns are read from feedback.db. Embeddings live in
+        the memory-mapped matrix, which is extended with rows it lacks or
+        rebuilt if it disagrees with the database (other ids, or built from
+        another feedback.db), so a warm start decodes no embeddings at all.
+        """
         try:
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, query, tables, timestamp, embedding FROM feedback")
-                self.feedback_cache = [
-                    {
-                        "id": row[0],
-                        "query": row[1],
-                        "tables": json.loads(row[2]),
-                        "timestamp": row[3],
-                        "embedding": np.frombuffer(row[4], dtype=np.float32)
-                    }
-                    for row in cursor.fetchall()
-                ]
-            self.logger.debug(f"Loaded {len(self.feedback_cache)} feedback entries")
+            rows = list(self.store.iter_metadata())
+            ids, queries, tables, timestamps = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+            self.matrix.source = self.store.identity()
+            self.matrix.refresh()
+            if self.matrix.dim is not None and self.matrix.stored_source() != self.matrix.source:
+                self.logger.warning("Feedback embedding matrix was built from another feedback.db, rebuilding")
+                self.matrix.clear()
+            if not self._sync_matrix(ids) or (not ids and len(self.matrix)):
+                self.logger.warning("Feedback embedding matrix out of sync with database, rebuilding")
+                self.matrix.clear()
+                self._sync_matrix(ids)
+            self.feedback_ids, self.feedback_queries = ids, queries
+            self.feedback_tables, self.feedback_timestamps = tables, timestamps
+            self.last_id = max([self.store.last_sequence()] + ids[-1:])
+            self.logger.debug(f"Loaded {len(ids)} feedback entries")
         except Exception as e:
             self.logger.error(f"Error loading feedback cache: {e}")
-            self.feedback_cache = []
+            self.feedback_ids, self.feedback_queries = [], []
+            self.feedback_tables, self.feedback_timestamps = [], []
+        self._sync_index()
+
+    def _sync_matrix(self, ids: List[int], start: int = 0) -> bool:
+        """Extend the matrix so that its rows from ``start`` on hold ``ids``.
+
+        Missing rows are streamed from the embeddings stored in SQLite.
+
+        Args:
+            ids: Feedback ids in SQLite order, for rows ``start`` onwards.
+            start: Matrix row of ``ids[0]``.
+
+        Returns:
+            bool: False if rows already in the matrix hold other ids.
+        """
+        matrix = self.matrix
+        matrix.refresh()
+        mapped = matrix.row_ids[start:min(matrix.count, start + len(ids))]
+        if matrix.count < start or not np.array_equal(mapped, ids[:len(mapped)]):
+            return False
+        if matrix.count >= start + len(ids):
+            return True
+        after = int(matrix.row_ids[matrix.count - 1]) if matrix.count else 0
+        batch_ids, batch_vectors = [], []
+        for row in self.store.iter_feedback(after):
+            if row[0] > ids[-1]:
+                break
+            batch_ids.append(row[0])
+            batch_vectors.append(np.frombuffer(row[4], dtype=np.float32))
+            if len(batch_ids) >= self.store.fetch_size:
+                matrix.add(batch_ids, np.stack(batch_vectors))
+                batch_ids, batch_vectors = [], []
+        if batch_ids:
+            matrix.add(batch_ids, np.stack(batch_vectors))
+        self.logger.debug(f"Appended embeddings up to feedback id {ids[-1]} to the matrix")
+        return matrix.row(ids[-1]) == start + len(ids) - 1
+
+    def load_new_feedback(self) -> int:
+        """Pick up rows another process inserted since ``last_id``.
+
+        Returns:
+            int: Number of rows added.
+        """
+        try:
+            rows = list(self.store.iter_metadata(self.last_id))
+            if rows:
+                self._append_rows(*(list(column) for column in zip(*rows)))
+            return len(rows)
+        except Exception as e:
+            self.logger.error(f"Error loading new feedback: {e}")
+            return 0
+
+    def reload_feedback_cache(self):
+        """Re-read all feedback from SQLite, discarding in-memory state."""
+        self._load_feedback_cache()
+
+    def _append_rows(self, ids: List[int], queries: List[str], tables: List[str], timestamps: List[str],
+                     embeddings: Optional[np.ndarray] = None):
+        """Add newly inserted rows to the metadata lists, the matrix and the vector index.
+
+        Ids are assigned by SQLite AUTOINCREMENT, so a new batch must continue
+        directly from the last known id. A gap means another writer touched
+        feedback.db, and an embedding of the wrong size means the matrix is
+        inconsistent; either way everything is reloaded from disk instead.
+
+        Args:
+            ids: Feedback ids.
+            queries: Query strings.
+            tables: JSON-encoded table lists.
+            timestamps: Timestamps.
+            embeddings: Embeddings of the rows, or None to take them from
+                the matrix or SQLite (rows written by another process).
+        """
+        if not ids:
+            return
+        start = len(self.feedback_ids)
+        expected = list(range(self.last_id + 1, self.last_id + 1 + len(ids)))
+        try:
+            if ids != expected:
+                raise ValueError("feedback ids are not consecutive")
+            if embeddings is not None:
+                self.matrix.add(ids, embeddings)
+            if not self._sync_matrix(ids, start):
+                raise ValueError("embedding matrix rows do not match")
+        except ValueError as e:
+            self.logger.warning(f"Feedback cache out of sync with database ({e}), reloading")
+            self.reload_feedback_cache()
+            return
+        self.feedback_ids.extend(ids)
+        self.feedback_queries.extend(queries)
+        self.feedback_tables.extend(tables)
+        self.feedback_timestamps.extend(timestamps)
+        self.last_id = ids[-1]
+        try:
+            if self.index is not self.matrix:
+                self.index.add(ids, self.matrix.matrix()[start:start + len(ids)])
+                self._index_dirty = True
+        except Exception as e:
+            self.logger.error(f"Error updating feedback index: {e}")
+            self.index = None
+            self._sync_index()
+
+    def _sync_index(self):
+        """Bring the vector index in line with the feedback rows.
+
+        The brute-force backend searches the mapped matrix directly. Other
+        backends are loaded from disk on first use; only rows added or
+        removed since the index was last saved are applied, so startup does
+        not rebuild it. If that fails, the matrix is searched instead.
+        """
+        if self.index_backend == "brute" and self.matrix is not None:
+            self.index = self.matrix
+            return
+        rows = self.matrix.matrix() if self.matrix is not None else None
+        try:
+            if self.index is None or self.index is self.matrix:
+                self.index = VectorIndex.open(self.index_path, self.index_backend)
+            source = self.matrix.source if self.matrix is not None else None
+            if self.index.source != source:
+                if len(self.index):
+                    self.logger.warning("Feedback vector index was built from another feedback.db, rebuilding")
+                self.index = VectorIndex.create(self.index_backend)
+                self.index.source = source
+                self._index_dirty = True
+            indexed = set(self.index.ids())
+            stale = indexed.difference(self.feedback_ids)
+            missing = [row for row, id_ in enumerate(self.feedback_ids) if id_ not in indexed]
+            if stale:
+                self.index.remove(stale)
+            if missing:
+                self.index.add([self.feedback_ids[row] for row in missing], rows[missing])
+            if stale or missing:
+                self.logger.debug(f"Synced {self.index_backend} index: +{len(missing)} -{len(stale)}")
+                self._index_dirty = True
+                self.save_index()
+        except Exception as e:
+            # The mapped matrix always holds every loaded row, so searching it
+            # keeps lookups exact until the index can be rebuilt
+            self.logger.error(f"Error syncing {self.index_backend} feedback index, searching the matrix instead: {e}")
+            self.index = self.matrix
+            self._index_dirty = False
+
+    def save_index(self):
+        """Persist the vector index next to feedback.db if it changed since the last save."""
+        if self.index is None or not self._index_dirty:
+            return
+        try:
+            self.index.save(self.index_path)
+            self._index_dirty = False
+            self.logger.debug(f"Saved {self.index_backend} index to {self.index_path}")
+        except Exception as e:
+            self.logger.error(f"Error saving feedback index: {e}")
+
+    def _valid_tables(self, tables: List[str], schema_dict: Dict) -> List[str]:
+        valid_tables = []
+        for table in tables:
+            schema, table_name = table.split('.', 1)
+            if schema in schema_dict["tables"] and table_name in schema_dict["tables"][schema]:
+                valid_tables.append(table)
+            else:
+                self.logger.warning(f"Invalid table {table} in feedback")
+        return valid_tables
 
     def store_feedback(self, query: str, tables: List[str], schema_dict: Dict):
         """Store feedback for a query-table mapping.
@@ -92,79 +276,123 @@ class FeedbackManager:
             tables: List of table names.
             schema_dict: Schema dictionary for validation.
         """
+        self.store_feedback_many([(query, tables)], schema_dict)
+
+    def store_feedback_many(self, items: List[Tuple[str, List[str]]], schema_dict: Dict) -> int:
+        """Store several query-table mappings with one encode and one transaction.
+
+        Args:
+            items: (query, tables) pairs.
+            schema_dict: Schema dictionary for validation.
+
+        Returns:
+            int: Number of feedback rows stored.
+        """
         try:
-            if not tables or not query:
-                self.logger.warning("Empty query or tables, skipping feedback storage")
-                return
-            
-            valid_tables = []
-            for table in tables:
-                schema, table_name = table.split('.', 1)
-                if schema in schema_dict["tables"] and table_name in schema_dict["tables"][schema]:
-                    valid_tables.append(table)
-                else:
-                    self.logger.warning(f"Invalid table {table} in feedback")
-            
-            if not valid_tables:
-                self.logger.warning("No valid tables in feedback")
-                return
-            
-            embedding = self.embedder.encode([query])[0] if self.embedder else np.zeros(768, dtype=np.float32)
-            
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO feedback (query, tables, timestamp, embedding) VALUES (?, ?, datetime('now'), ?)",
-                    (query, json.dumps(valid_tables), embedding.tobytes())
-                )
-                cursor.execute(
-                    "INSERT OR REPLACE INTO query_counts (query, count) VALUES (?, COALESCE((SELECT count + 1 FROM query_counts WHERE query = ?), 1))",
-                    (query, query)
+            valid_items = []
+            for query, tables in items:
+                if not tables or not query:
+                    self.logger.warning("Empty query or tables, skipping feedback storage")
+                    continue
+                valid_tables = self._valid_tables(tables, schema_dict)
+                if not valid_tables:
+                    self.logger.warning("No valid tables in feedback")
+                    continue
+                valid_items.append((query, valid_tables))
+            if not valid_items:
+                return 0
+
+            queries = [query for query, _ in valid_items]
+            if self.embedder:
+                embeddings = np.asarray(self.embedder.encode(queries), dtype=np.float32)
+            else:
+                embeddings = np.zeros((len(queries), 768), dtype=np.float32)
+            timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+            with self._write_lock:
+                ids = self.store.add_feedback([
+                    (query, json.dumps(valid_tables), timestamp, embedding.tobytes())
+                    for (query, valid_tables), embedding in zip(valid_items, embeddings)
+                ])
+                self._append_rows(
+                    ids, queries, [json.dumps(valid_tables) for _, valid_tables in valid_items],
+                    [timestamp] * len(ids), embeddings
                 )
-                conn.commit()
-            
-            self._load_feedback_cache()
-            self.logger.debug(f"Stored feedback for query: {query}, tables: {valid_tables}")
+            for query, valid_tables in valid_items:
+                self.logger.debug(f"Stored feedback for query: {query}, tables: {valid_tables}")
+            return len(ids)
         except Exception as e:
             self.logger.error(f"Error storing feedback: {e}")
+            return 0
 
-    def get_similar_feedback(self, query: str, threshold: float = 0.8) -> Optional[Dict]:
+    def get_similar_feedback(self, query: str, threshold: float = 0.8, context: QueryContext = None) -> Optional[Dict]:
         """Retrieve feedback for similar queries.
 
         Args:
             query: The query string.
             threshold: Similarity threshold for matching.
+            context: Per-request context holding memoized embeddings.
 
         Returns:
             Dict: Feedback data if similar query found, None otherwise.
         """
         try:
-            if not self.feedback_cache or not self.embedder:
+            if not self.feedback_ids or not self.embedder or self.index is None:
                 self.logger.debug("No feedback cache or embedder available")
                 return None
             
-            query_embedding = self.embedder.encode([query])[0]
-            similarities = [
-                (entry, cosine_similarity([query_embedding], [entry["embedding"]])[0][0])
-                for entry in self.feedback_cache
-            ]
-            
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            if similarities and similarities[0][1] >= threshold:
-                entry = similarities[0][0]
-                self.logger.debug(f"Found similar feedback for query: {query}, similarity: {similarities[0][1]}")
-                return {
-                    "query": entry["query"],
-                    "tables": entry["tables"],
-                    "timestamp": entry["timestamp"]
-                }
-            
-            self.logger.debug(f"No similar feedback found for query: {query}")
-            return None
+            if context is not None:
+                query_embedding = context.encode(self.embedder, query)
+            else:
+                query_embedding = self.embedder.encode([query])[0]
+            best = self.index.search(query_embedding, k=1)
+            return self._feedback_match(query, best, threshold)
         except Exception as e:
             self.logger.error(f"Error in get_similar_feedback: {e}")
             return None
 
+    def get_similar_feedback_many(self, queries: List[str], threshold: float = 0.8,
+                                  contexts: List[QueryContext] = None) -> List[Optional[Dict]]:
+        """Retrieve feedback for several queries with one batched similarity search.
+
+        Args:
+            queries: Query strings.
+            threshold: Similarity threshold for matching.
+            contexts: Per-request contexts aligned with ``queries``.
+
+        Returns:
+            List of feedback dicts (or None), aligned with ``queries``.
+        """
+        try:
+            if not queries or not self.feedback_ids or not self.embedder or self.index is None:
+                self.logger.debug("No feedback cache or embedder available")
+                return [None] * len(queries)
+
+            if contexts is not None:
+                query_matrix = np.stack([context.encode(self.embedder, query)
+                                         for query, context in zip(queries, contexts)])
+            else:
+                query_matrix = np.asarray(self.embedder.encode(queries), dtype=np.float32)
+            results = self.index.search_many(query_matrix, k=1)
+            return [self._feedback_match(query, best, threshold) for query, best in zip(queries, results)]
+        except Exception as e:
+            self.logger.error(f"Error in get_similar_feedback_many: {e}")
+            return [None] * len(queries)
+
+    def _feedback_match(self, query: str, best: List[Tuple[int, float]], threshold: float) -> Optional[Dict]:
+        """Turn the nearest index hit into a feedback dict if it clears the threshold."""
+        row = self.matrix.row(best[0][0]) if best and best[0][1] >= threshold else None
+        if row is not None and row < len(self.feedback_ids):
+            self.logger.debug(f"Found similar feedback for query: {query}, similarity: {best[0][1]}")
+            return {
+                "query": self.feedback_queries[row],
+                "tables": json.loads(self.feedback_tables[row]),
+                "timestamp": self.feedback_timestamps[row]
+            }
+
+        self.logger.debug(f"No similar feedback found for query: {query}")
+        return None
+
     def get_top_queries(self, limit: int = 5) -> List[tuple]:
         """Get the most frequent queries.
 
@@ -175,13 +403,7 @@ class FeedbackManager:
             List of (query, count) tuples.
         """
         try:
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT query, count FROM query_counts ORDER BY count DESC LIMIT ?",
-                    (limit,)
-                )
-                top_queries = cursor.fetchall()
+            top_queries = self.store.top_queries(limit)
             self.logger.debug(f"Retrieved {len(top_queries)} top queries")
             return top_queries
         except Exception as e:
@@ -191,84 +413,245 @@ class FeedbackManager:
     def clear_feedback(self):
         """Clear all feedback data."""
         try:
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM feedback")
-                cursor.execute("DELETE FROM query_counts")
-                conn.commit()
-            self.feedback_cache = []
+            self.store.clear()
+            self.matrix.clear()
+            self.feedback_ids, self.feedback_queries = [], []
+            self.feedback_tables, self.feedback_timestamps = [], []
+            if self.index is not None and self.index is not self.matrix:
+                self.index.clear()
+                self._index_dirty = True
+                self.save_index()
             self.logger.info("Cleared all feedback")
         except Exception as e:
             self.logger.error(f"Error clearing feedback: {e}")
 
-    def export_feedback(self, export_dir: str):
-        """Export feedback data to a directory.
+    def close(self):
+        """Persist the index and close the SQLite connections."""
+        self.save_index()
+        if self.store is not None:
+            self.store.close()
+
+    @property
+    def model_name(self) -> Optional[str]:
+        """Name of the model behind stored embeddings, if known."""
+        return getattr(self.embedder, "model_name", None)
+
+    def export_feedback(self, export_path: str, legacy: bool = False) -> int:
+        """Export feedback data.
+
+        Writes a single archive holding every row and its embedding (see
+        ``feedback.feedback_archive``), streamed from SQLite chunk by chunk.
+        With ``legacy`` set, writes one ``feedback_<id>_meta.json`` file per
+        row into the ``export_path`` directory instead, without embeddings.
 
         Args:
-            export_dir: Directory to export feedback files.
+            export_path: Archive file, or directory for the legacy layout.
+            legacy: Use the per-file layout.
+
+        Returns:
+            int: Number of rows exported.
         """
         try:
-            os.makedirs(export_dir, exist_ok=True)
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, query, tables, timestamp FROM feedback")
-                copied = False
-                for row in cursor.fetchall():
-                    id_, query, tables, timestamp = row
-                    meta = {
-                        "query": query,
-                        "tables": json.loads(tables),
-                        "timestamp": timestamp
-                    }
-                    meta_file = os.path.join(export_dir, f"feedback_{id_}_meta.json")
-                    with open(meta_file, 'w') as f:
-                        json.dump(meta, f, indent=2)
-                    copied = True
-                if copied:
-                    self.logger.info(f"Exported feedback to {export_dir}")
-                else:
-                    self.logger.info("No feedback to export")
+            if legacy:
+                count = self._export_files(export_path)
+            else:
+                count = self._export_archive(export_path)
+            if count:
+                self.logger.info(f"Exported {count} feedback entries to {export_path}")
+            else:
+                self.logger.info("No feedback to export")
+            return count
         except Exception as e:
             self.logger.error(f"Error exporting feedback: {e}")
+            return 0
+
+    def _export_files(self, export_dir: str) -> int:
+        os.makedirs(export_dir, exist_ok=True)
+        count = 0
+        for id_, query, tables, timestamp, _ in self.store.iter_feedback():
+            meta = {
+                "query": query,
+                "tables": json.loads(tables),
+                "timestamp": timestamp
+            }
+            meta_file = os.path.join(export_dir, f"feedback_{id_}_meta.json")
+            with open(meta_file, 'w') as f:
+                json.dump(meta, f, indent=2)
+            count += 1
+        return count
 
-    def import_feedback(self, import_dir: str):
-        """Import feedback data from a directory.
+    def _export_archive(self, path: str) -> int:
+        rows = self.store.iter_feedback()
+        first = next(rows, None)
+        if first is None:
+            return 0
+        with FeedbackArchiveWriter(path, self.model_name, len(first[4]) // 4) as writer:
+            for _, query, tables, timestamp, embedding in itertools.chain([first], rows):
+                writer.write(query, json.loads(tables), timestamp, embedding)
+        return writer.count
+
+    def _read_meta(self, import_dir: str, fname: str) -> Optional[Dict]:
+        """Parse one ``*_meta.json`` file, or return None if it is unusable."""
+        try:
+            with open(os.path.join(import_dir, fname)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Skipping unreadable feedback file {fname}: {e}")
+            return None
+        if 'query' not in meta or 'tables' not in meta or 'timestamp' not in meta:
+            self.logger.warning(f"Skipping invalid feedback file: {fname}")
+            return None
+        return meta
+
+    def _read_metas(self, import_dir: str, fnames: List[str]) -> List[Dict]:
+        """Parse a slice of feedback files, dropping unusable ones."""
+        metas = (self._read_meta(import_dir, fname) for fname in fnames)
+        return [meta for meta in metas if meta is not None]
+
+    def _import_batch(self, metas: List[Dict], known: Dict[str, np.ndarray], source: str,
+                      position: str, imported: int, embeddings: Optional[np.ndarray] = None) -> int:
+        """Encode and write one batch of parsed feedback, checkpointing in the same transaction.
 
         Args:
-            import_dir: Directory containing feedback files.
+            metas: Parsed feedback records.
+            known: Query -> embedding for stored and already imported queries; updated.
+            source: Import source the checkpoint is recorded under.
+            position: Position of the batch's last record in the source.
+            imported: Rows imported before this batch.
+            embeddings: Embeddings aligned with ``metas`` to store as they are.
+
+        Returns:
+            int: Rows written.
+        """
+        if embeddings is None:
+            queries = list(dict.fromkeys(meta['query'] for meta in metas if meta['query'] not in known))
+            if queries:
+                if self.embedder:
+                    vectors = np.asarray(self.embedder.encode(queries), dtype=np.float32)
+                else:
+                    vectors = np.zeros((len(queries), 768), dtype=np.float32)
+                known.update(zip(queries, vectors))
+            embeddings = [known[meta['query']] for meta in metas]
+        else:
+            embeddings = list(embeddings)
+
+        with self._write_lock:
+            with self.store.transaction() as cursor:
+                ids = self.store.insert_feedback(cursor, [
+                    (meta['query'], json.dumps(meta['tables']), meta['timestamp'], embedding.tobytes())
+                    for meta, embedding in zip(metas, embeddings)
+                ])
+                self.store.bump_query_counts(cursor, (meta['query'] for meta in metas))
+                self.store.save_checkpoint(cursor, source, position, imported + len(ids))
+            self._append_rows(
+                ids, [meta['query'] for meta in metas], [json.dumps(meta['tables']) for meta in metas],
+                [meta['timestamp'] for meta in metas], np.stack(embeddings) if ids else None
+            )
+        return len(ids)
+
+    def import_feedback(self, import_path: str, progress: Optional[Callable[[int, int], None]] = None,
+                        batch_size: int = 2048, workers: int = 8, resume: bool = True) -> int:
+        """Import feedback from an archive written by ``export_feedback`` or a directory of files.
+
+        An archive is streamed chunk by chunk. Its embeddings are stored as
+        they are when they come from the model this manager uses; otherwise
+        its queries are re-encoded like those of a directory import.
+
+        A directory's files are read and parsed by a thread pool one batch
+        ahead of the batch being written. Each batch's distinct queries are
+        looked up among stored embeddings and the rest encoded in one call.
+        Every batch is written with ``executemany`` in one transaction that
+        also records a checkpoint, so an interrupted import continues after
+        the last committed batch when run again.
+
+        Args:
+            import_path: Archive file, or directory containing feedback files.
+            progress: Called with (rows or files processed, total) after each batch.
+            batch_size: Files per batch and transaction; archives use their own chunks.
+            workers: Threads reading and parsing files.
+            resume: Continue from the checkpoint of an interrupted import of this source.
+
+        Returns:
+            int: Number of feedback rows imported, including resumed progress.
         """
         try:
-            if not os.path.exists(import_dir):
-                self.logger.error(f"Import directory {import_dir} does not exist")
-                return
-            
-            with sqlite3.connect(self.db_path, timeout=3.0) as conn:
-                cursor = conn.cursor()
-                copied = False
-                for fname in os.listdir(import_dir):
-                    if fname.endswith("_meta.json"):
-                        with open(os.path.join(import_dir, fname)) as f:
-                            meta = json.load(f)
-                        if 'query' not in meta or 'tables' not in meta or 'timestamp' not in meta:
-                            self.logger.warning(f"Skipping invalid feedback file: {fname}")
-                            continue
-                        
-                        embedding = self.embedder.encode([meta['query']])[0] if self.embedder else np.zeros(768, dtype=np.float32)
-                        cursor.execute(
-                            "INSERT INTO feedback (query, tables, timestamp, embedding) VALUES (?, ?, ?, ?)",
-                            (meta['query'], json.dumps(meta['tables']), meta['timestamp'], embedding.tobytes())
-                        )
-                        cursor.execute(
-                            "INSERT OR REPLACE INTO query_counts (query, count) VALUES (?, COALESCE((SELECT count + 1 FROM query_counts WHERE query = ?), 1))",
-                            (meta['query'], meta['query'])
-                        )
-                        copied = True
-                conn.commit()
-            
-            if copied:
-                self._load_feedback_cache()
-                self.logger.info(f"Imported feedback from {import_dir}")
+            if not os.path.exists(import_path):
+                self.logger.error(f"Import path {import_path} does not exist")
+                return 0
+            if os.path.isdir(import_path):
+                imported = self._import_directory(import_path, progress, batch_size, workers, resume)
+            elif is_feedback_archive(import_path):
+                imported = self._import_archive(import_path, progress, resume)
+            else:
+                self.logger.error(f"{import_path} is neither a feedback archive nor a directory")
+                return 0
+            if imported:
+                self.save_index()
+                self.logger.info(f"Imported {imported} feedback entries from {import_path}")
             else:
-                self.logger.info("No valid feedback files to import")
+                self.logger.info("No valid feedback to import")
+            return imported
         except Exception as e:
-            self.logger.error(f"Error importing feedback: {e}")
\ No newline at end of file
+            self.logger.error(f"Error importing feedback: {e}")
+            return 0
+
+    def _import_archive(self, path: str, progress: Optional[Callable[[int, int], None]], resume: bool) -> int:
+        source = os.path.abspath(path)
+        done = imported = 0
+        checkpoint = self.store.checkpoint(source) if resume else None
+        if checkpoint:
+            done, imported = int(checkpoint[0]), checkpoint[1]
+            self.logger.info(f"Resuming import from {path} after row {done}")
+        known = dict(zip(self.feedback_queries, self.matrix.matrix()))
+        with FeedbackArchiveReader(path) as reader:
+            reuse = reader.model is not None and reader.model == self.model_name
+            if not reuse:
+                self.logger.info(f"Archive embeddings come from {reader.model!r}, re-encoding queries")
+            position = 0
+            for records, embeddings in reader.chunks():
+                start, position = position, position + len(records)
+                if position <= done:
+                    continue
+                skip = max(0, done - start)
+                imported += self._import_batch(
+                    records[skip:], known, source, str(position), imported,
+                    embeddings[skip:] if reuse else None
+                )
+                done = position
+                if progress:
+                    progress(done, reader.count)
+        self.store.clear_checkpoint(source)
+        return imported
+
+    def _import_directory(self, import_dir: str, progress: Optional[Callable[[int, int], None]],
+                          batch_size: int, workers: int, resume: bool) -> int:
+        source = os.path.abspath(import_dir)
+        names = sorted(fname for fname in os.listdir(import_dir) if fname.endswith("_meta.json"))
+        done, imported = 0, 0
+        checkpoint = self.store.checkpoint(source) if resume else None
+        if checkpoint:
+            position, imported = checkpoint
+            done = bisect.bisect_right(names, position)
+            self.logger.info(f"Resuming import from {import_dir} after {position} ({imported} rows imported)")
+        batches = [names[start:start + batch_size] for start in range(done, len(names), max(1, batch_size))]
+        known = dict(zip(self.feedback_queries, self.matrix.matrix()))
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            def read(batch):
+                # One task per slice: per-file futures cost more than the parsing
+                step = -(-len(batch) // max(1, workers))
+                return [executor.submit(self._read_metas, import_dir, batch[i:i + step])
+                        for i in range(0, len(batch), step)]
+
+            pending = read(batches[0]) if batches else []
+            for i, batch in enumerate(batches):
+                reads = pending
+                pending = read(batches[i + 1]) if i + 1 < len(batches) else []
+                metas = [meta for future in reads for meta in future.result()]
+                imported += self._import_batch(metas, known, source, batch[-1], imported)
+                done += len(batch)
+                if progress:
+                    progress(done, len(names))
+
+        self.store.clear_checkpoint(source)
+        return imported
@@ -0,0 +1,341 @@
+import logging
+import os
+import struct
+import numpy as np
+from filelock import FileLock
+from typing import Iterable, List, Optional, Tuple
+
+from feedback.vector_index import _normalize
+from nlp.quantization import QUANTIZATIONS, approximate_scores, candidate_rows, code_dtype, quantize
+
+class FeedbackMatrix:
+    """Append-only, memory-mapped matrix of normalized feedback embeddings.
+
+    Two ``.npy`` files in the feedback directory hold the float32 vectors and
+    the int64 feedback ids, row-aligned and in increasing id order. Their
+    headers are padded to a fixed size, so the row count in the header can
+    be rewritten in place; the files are grown ahead of the count, like the
+    embedding cache's vector file. Opening maps both files without reading
+    any rows, processes opening the same directory share the pages, and
+    similarity search is a matrix-vector product over the mapped rows.
+
+    With ``quantization``, two more files hold int8 or float16 codes of the
+    rows and their scales (see ``nlp.quantization``). Searches then scan the
+    codes and read float32 rows only to rescore the candidates, which gives
+    the same results as the exact search. Codes missing for existing rows are
+    computed when the matrix is opened.
+
+    Appends are serialized across processes by a file lock; rows another
+    process already appended are skipped. A small ``_source`` file records
+    the identity of the feedback database the rows were copied from.
+
+    Rows are only ever removed all at once by ``clear``, so the matrix is not
+    a ``VectorIndex``; it provides the ``SimilaritySearch`` lookups.
+    """
+
+    backend = "mapped"
+    HEADER_SIZE = 128
+    QUANTIZE_ROWS = 65536
+    TIE_TOLERANCE = 1e-6
+
+    def __init__(self, directory: str, name: str = "feedback_embeddings", quantization: Optional[str] = None,
+                 source: Optional[str] = None):
+        """Map the matrix in ``directory``, if it exists.
+
+        Args:
+            directory: Feedback directory (``feedback_cache/<db>``).
+            name: Base name of the sidecar files.
+            quantization: "int8" or "float16" to also keep and search quantized codes.
+            source: Identity of the feedback database, recorded when the files are created.
+        """
+        self.logger = logging.getLogger("feedback")
+        if quantization is not None:
+            code_dtype(quantization)
+        self.quantization = quantization
+        self.vectors_path = os.path.join(directory, f"{name}.npy")
+        self.ids_path = os.path.join(directory, f"{name}_ids.npy")
+        self.directory = directory
+        self.name = name
+        self.codes_path, self.scales_path = self._code_paths(quantization) if quantization else (None, None)
+        self.source_path = os.path.join(directory, f"{name}_source")
+        self.source = source
+        self.dim: Optional[int] = None
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self._lock: Optional[FileLock] = None
+        self._lock_pid: Optional[int] = None
+        self.count = 0
+        self.capacity = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self._inodes: Tuple[int, ...] = ()
+        self.refresh()
+
+    def _code_paths(self, mode: str) -> Tuple[str, str]:
+        """Paths of the codes and scales files of a quantization mode."""
+        base = os.path.join(self.directory, f"{self.name}_{mode}")
+        return f"{base}.npy", f"{base}_scales.npy"
+
+    @property
+    def lock(self) -> FileLock:
+        """The append lock, recreated in a forked process."""
+        if self._lock_pid != os.getpid():
+            self._lock = FileLock(self.lock_path)
+            self._lock_pid = os.getpid()
+        return self._lock
+
+    def _columns(self, dim: int) -> List[Tuple[str, str, np.dtype, Tuple[int, ...]]]:
+        """(attribute, path, dtype, row shape) of each row-aligned file."""
+        columns = [
+            ("vectors", self.vectors_path, np.dtype(np.float32), (dim,)),
+            ("row_ids", self.ids_path, np.dtype(np.int64), ()),
+        ]
+        if self.quantization:
+            columns += [
+                ("codes", self.codes_path, code_dtype(self.quantization), (dim,)),
+                ("scales", self.scales_path, np.dtype(np.float32), (2,)),
+            ]
+        return columns
+
+    def _write_header(self, path: str, dtype, shape: Tuple[int, ...]):
+        header = repr({
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": shape
+        }).encode("latin1")
+        length = self.HEADER_SIZE - 10
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", length) + header.ljust(length - 1) + b"\n")
+
+    def _read_shape(self, path: str) -> Tuple[int, ...]:
+        with open(path, "rb") as f:
+            np.lib.format.read_magic(f)
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+            if f.tell() != self.HEADER_SIZE:
+                raise ValueError(f"{path} was not written by FeedbackMatrix")
+        return shape
+
+    def _file_rows(self, path: str, dtype: np.dtype, shape: Tuple[int, ...]) -> int:
+        """Rows the file at ``path`` has room for."""
+        return (os.path.getsize(path) - self.HEADER_SIZE) // (dtype.itemsize * int(np.prod(shape)))
+
+    def _inodes_of(self, dim: int) -> Tuple[int, ...]:
+        return tuple(os.stat(path).st_ino for _, path, _, _ in self._columns(dim))
+
+    def _map(self, capacity: int):
+        self.vectors = self.codes = self.scales = None
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.capacity = capacity
+        self._inodes = ()
+        if capacity:
+            for attr, path, dtype, shape in self._columns(self.dim):
+                setattr(self, attr, np.memmap(path, dtype=dtype, mode="r+", offset=self.HEADER_SIZE,
+                                              shape=(capacity,) + shape))
+            self._inodes = self._inodes_of(self.dim)
+
+    def refresh(self):
+        """Pick up rows appended, and files recreated, by other processes since the files were mapped."""
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.ids_path)):
+            self.dim = None
+            self.count = 0
+            self._map(0)
+            return
+        vector_shape = self._read_shape(self.vectors_path)
+        count = min(vector_shape[0], self._read_shape(self.ids_path)[0])
+        dim = vector_shape[1]
+        if self.quantization and self._coded_rows(dim) < count:
+            self._quantize_rows(dim)
+        capacity = min(self._file_rows(path, dtype, shape) for _, path, dtype, shape in self._columns(dim))
+        # Another process's clear() replaces the files; a mapping of the old
+        # (unlinked) files would keep serving their rows
+        if dim != self.dim or capacity != self.capacity or self._inodes_of(dim) != self._inodes:
+            self.dim = dim
+            self._map(capacity)
+        self.count = min(count, capacity)
+
+    def _coded_rows(self, dim: int) -> int:
+        """Rows with quantized codes on disk; -1 if the code files are missing or stale."""
+        try:
+            codes_shape = self._read_shape(self.codes_path)
+            scales_shape = self._read_shape(self.scales_path)
+        except (OSError, ValueError):
+            return -1
+        if codes_shape[1:] != (dim,):
+            return -1
+        return min(codes_shape[0], scales_shape[0])
+
+    def _quantize_rows(self, dim: int):
+        """Compute codes for rows that have none, e.g. when quantization is first enabled."""
+        with self.lock:
+            count = min(self._read_shape(self.vectors_path)[0], self._read_shape(self.ids_path)[0])
+            coded = self._coded_rows(dim)
+            if coded >= count:
+                return
+            codes_column, scales_column = self._columns(dim)[2:]
+            capacity = self._file_rows(self.vectors_path, np.dtype(np.float32), (dim,))
+            for _, path, dtype, shape in (codes_column, scales_column):
+                if coded < 0:
+                    self._write_header(path, dtype, (0,) + shape)
+                with open(path, "r+b") as f:
+                    f.truncate(self.HEADER_SIZE + capacity * dtype.itemsize * int(np.prod(shape)))
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                offset=self.HEADER_SIZE, shape=(count, dim))
+            codes = np.memmap(self.codes_path, dtype=codes_column[2], mode="r+",
+                              offset=self.HEADER_SIZE, shape=(capacity, dim))
+            scales = np.memmap(self.scales_path, dtype=np.float32, mode="r+",
+                               offset=self.HEADER_SIZE, shape=(capacity, 2))
+            coded = max(coded, 0)
+            for start in range(coded, count, self.QUANTIZE_ROWS):
+                end = min(count, start + self.QUANTIZE_ROWS)
+                codes[start:end], scales[start:end] = quantize(vectors[start:end], self.quantization)
+            codes.flush()
+            scales.flush()
+            del vectors, codes, scales
+            self._write_header(self.scales_path, np.float32, (count, 2))
+            self._write_header(self.codes_path, codes_column[2], (count, dim))
+            self.logger.info(f"Quantized {count - coded} feedback embeddings to {self.quantization}")
+
+    def _create(self, dim: int):
+        self.clear()
+        self.dim = dim
+        if self.source is not None:
+            with open(self.source_path, "w") as f:
+                f.write(self.source)
+        for _, path, dtype, shape in self._columns(dim):
+            self._write_header(path, dtype, (0,) + shape)
+
+    def stored_source(self) -> Optional[str]:
+        """Database identity recorded when the files were created, or None."""
+        try:
+            with open(self.source_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _reserve(self, rows: int):
+        """Grow every file so that it holds at least ``rows`` rows."""
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, 2 * self.capacity, 1024)
+        for attr, _, _, _ in self._columns(self.dim):
+            if isinstance(getattr(self, attr), np.memmap):
+                getattr(self, attr).flush()
+        self._map(0)
+        for _, path, dtype, shape in self._columns(self.dim):
+            with open(path, "r+b") as f:
+                f.truncate(self.HEADER_SIZE + capacity * dtype.itemsize * int(np.prod(shape)))
+        self._map(capacity)
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        """Append rows for ids beyond the last stored id.
+
+        Raises:
+            ValueError: If the ids are not increasing or the dimension differs.
+        """
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = _normalize(vectors)
+        if len(ids) > 1 and np.any(np.diff(ids) <= 0):
+            raise ValueError("Feedback ids must be appended in increasing order")
+        with self.lock:
+            self.refresh()
+            if self.count:
+                fresh = ids > self.row_ids[self.count - 1]
+                ids, vectors = ids[fresh], vectors[fresh]
+                if not len(ids):
+                    return
+            if self.dim is None or (self.count == 0 and self.dim != vectors.shape[1]):
+                self._create(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {self.dim}")
+            start, end = self.count, self.count + len(ids)
+            self._reserve(end)
+            self.vectors[start:end] = vectors
+            self.row_ids[start:end] = ids
+            if self.quantization:
+                self.codes[start:end], self.scales[start:end] = quantize(vectors, self.quantization)
+            columns = self._columns(self.dim)
+            for attr, _, _, _ in columns:
+                getattr(self, attr).flush()
+            # Data first, then the counts (vectors last), so readers never see unwritten rows
+            for _, path, dtype, shape in reversed(columns):
+                self._write_header(path, dtype, (end,) + shape)
+            self.count = end
+
+    def clear(self):
+        """Delete every row and the sidecar files."""
+        with self.lock:
+            self._map(0)
+            paths = [self.vectors_path, self.ids_path, self.source_path]
+            for mode in QUANTIZATIONS:
+                paths += self._code_paths(mode)
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.dim = None
+            self.count = 0
+
+    def row(self, id_: int) -> Optional[int]:
+        """Row holding a feedback id, or None."""
+        ids = self.row_ids[:self.count]
+        row = int(np.searchsorted(ids, id_))
+        return row if row < self.count and ids[row] == id_ else None
+
+    def matrix(self) -> np.ndarray:
+        """The mapped rows, without copying."""
+        if self.vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self.vectors[:self.count]
+
+    def _best_rows(self, scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best (id, score) pairs from scores of ``rows`` (default: all rows, in order).
+
+        A single best row is the earliest one scoring within ``TIE_TOLERANCE``
+        of the maximum, so exact and rescored searches settle ties alike.
+        """
+        k = min(k, len(scores))
+        if k == 1:
+            best = np.flatnonzero(scores >= scores.max() - self.TIE_TOLERANCE)[:1]
+        else:
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+        positions = best if rows is None else rows[best]
+        return [(int(self.row_ids[p]), float(scores[i])) for p, i in zip(positions, best)]
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        """Return up to k (id, cosine similarity) pairs, best first."""
+        if self.count == 0:
+            return []
+        if self.quantization:
+            return self.search_many(query, k)[0]
+        return self._best_rows(self.matrix() @ _normalize(query)[0], k)
+
+    def search_many(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        """Run ``search`` for each row of a query matrix."""
+        queries = _normalize(queries)
+        if self.count == 0:
+            return [[] for _ in range(len(queries))]
+        if not self.quantization:
+            scores = queries @ self.matrix().T
+            return [self._best_rows(row, k) for row in scores]
+        approx, bounds = approximate_scores(queries, self.codes[:self.count], self.scales[:self.count])
+        results = []
+        for query, row_scores in zip(queries, approx):
+            rows = candidate_rows(row_scores, bounds + self.TIE_TOLERANCE, k)
+            results.append(self._best_rows(self.vectors[rows] @ query, k, rows))
+        return results
+
+    def ids(self) -> List[int]:
+        """Feedback ids of the stored rows, ascending."""
+        return self.row_ids[:self.count].tolist()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def save(self, path: Optional[str] = None):
+        """Flush mapped pages; rows are persisted as they are appended."""
+        if self.vectors is not None:
+            for attr, _, _, _ in self._columns(self.dim):
+                getattr(self, attr).flush()
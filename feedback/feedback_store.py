@@ -0,0 +1,246 @@
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        query TEXT NOT NULL,
+        tables TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        embedding BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS query_counts (
+        query TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_query_counts_count ON query_counts (count DESC)",
+    """
+    CREATE TABLE IF NOT EXISTS store_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        position TEXT NOT NULL,
+        imported INTEGER NOT NULL
+    )
+    """,
+)
+
+# WAL lets readers (other threads, pre-fork workers) proceed while one writer
+# appends; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only risks the last commits on power loss
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+INSERT_FEEDBACK = "INSERT INTO feedback (query, tables, timestamp, embedding) VALUES (?, ?, ?, ?)"
+UPSERT_QUERY_COUNT = (
+    "INSERT INTO query_counts (query, count) VALUES (?, ?) "
+    "ON CONFLICT (query) DO UPDATE SET count = count + excluded.count"
+)
+SELECT_FEEDBACK = "SELECT id, query, tables, timestamp, embedding FROM feedback WHERE id > ? ORDER BY id"
+SELECT_METADATA = "SELECT id, query, tables, timestamp FROM feedback WHERE id > ? ORDER BY id"
+
+
+class FeedbackStore:
+    """SQLite storage for feedback rows and query counts.
+
+    Each thread (and each forked process) keeps one open connection,
+    configured once with WAL journaling and cache pragmas; statements are
+    reused from the connection's statement cache. Writes go through
+    ``executemany`` inside explicit transactions, so a batch of feedback
+    costs one commit rather than one per row.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 3.0, fetch_size: int = 5000):
+        """Open (and create if needed) the feedback database.
+
+        Args:
+            db_path: Path of feedback.db.
+            timeout: Seconds to wait for a lock held by another connection.
+            fetch_size: Rows fetched per round trip when streaming feedback.
+        """
+        self.logger = logging.getLogger("feedback_manager")
+        self.db_path = db_path
+        self.timeout = timeout
+        self.fetch_size = fetch_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Tuple[int, sqlite3.Connection]] = []
+        conn = self.connection()
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    def _open(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append((os.getpid(), conn))
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use.
+
+        A process forked after the connection was opened gets its own, since
+        SQLite connections must not cross a fork.
+        """
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = self._open()
+            self._local.pid = pid
+        return self._local.conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Run the enclosed writes in one immediate transaction.
+
+        ``BEGIN IMMEDIATE`` takes the write lock up front, so AUTOINCREMENT
+        ids assigned inside the block are consecutive.
+        """
+        conn = self.connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def insert_feedback(cursor: sqlite3.Cursor, rows: Sequence[Tuple[str, str, str, bytes]]) -> List[int]:
+        """Insert (query, tables_json, timestamp, embedding) rows inside ``transaction()``.
+
+        Returns:
+            List[int]: Ids assigned to the rows, in order.
+        """
+        if not rows:
+            return []
+        cursor.executemany(INSERT_FEEDBACK, rows)
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    @staticmethod
+    def bump_query_counts(cursor: sqlite3.Cursor, queries: Iterable[str]):
+        """Add one to the count of each query (repeats add more) inside ``transaction()``."""
+        counts = Counter(queries)
+        if counts:
+            cursor.executemany(UPSERT_QUERY_COUNT, counts.items())
+
+    def add_feedback(self, rows: Sequence[Tuple[str, str, str, bytes]]) -> List[int]:
+        """Insert feedback rows and count their queries in one transaction.
+
+        Returns:
+            List[int]: Ids assigned to the rows, in order.
+        """
+        with self.transaction() as cursor:
+            ids = self.insert_feedback(cursor, rows)
+            self.bump_query_counts(cursor, (row[0] for row in rows))
+        return ids
+
+    def checkpoint(self, source: str) -> Optional[Tuple[str, int]]:
+        """(position, rows imported) recorded for an unfinished import of ``source``."""
+        return self.connection().execute(
+            "SELECT position, imported FROM import_checkpoints WHERE source = ?", (source,)
+        ).fetchone()
+
+    @staticmethod
+    def save_checkpoint(cursor: sqlite3.Cursor, source: str, position: str, imported: int):
+        """Record import progress inside the ``transaction()`` that wrote the rows."""
+        cursor.execute(
+            "INSERT INTO import_checkpoints (source, position, imported) VALUES (?, ?, ?) "
+            "ON CONFLICT (source) DO UPDATE SET position = excluded.position, imported = excluded.imported",
+            (source, position, imported)
+        )
+
+    def clear_checkpoint(self, source: str):
+        """Forget the progress of a finished import."""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+
+    def iter_feedback(self, after_id: int = 0) -> Iterator[Tuple]:
+        """Stream (id, query, tables, timestamp, embedding) rows with id > ``after_id``."""
+        return self._iter(SELECT_FEEDBACK, after_id)
+
+    def iter_metadata(self, after_id: int = 0) -> Iterator[Tuple]:
+        """Stream (id, query, tables, timestamp) rows with id > ``after_id``, skipping embeddings."""
+        return self._iter(SELECT_METADATA, after_id)
+
+    def _iter(self, sql: str, after_id: int) -> Iterator[Tuple]:
+        cursor = self.connection().execute(sql, (after_id,))
+        try:
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def identity(self) -> str:
+        """Random token created with this database.
+
+        Ids restart at 1 in a replacement feedback.db; the token does not
+        carry over, so files derived from the rows (embedding matrix, vector
+        index) record it to tell which database they were built from.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('identity', ?)",
+                           (uuid.uuid4().hex,))
+            return cursor.execute("SELECT value FROM store_meta WHERE key = 'identity'").fetchone()[0]
+
+    def last_sequence(self) -> int:
+        """Highest id AUTOINCREMENT has handed out, including deleted rows."""
+        row = self.connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'feedback'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def top_queries(self, limit: int) -> List[Tuple[str, int]]:
+        """Most frequent queries, served from the count index."""
+        return self.connection().execute(
+            "SELECT query, count FROM query_counts ORDER BY count DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    def clear(self):
+        """Delete all feedback rows and query counts."""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM feedback")
+            cursor.execute("DELETE FROM query_counts")
+
+    def close(self):
+        """Close the connections this process opened."""
+        pid = os.getpid()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for owner, conn in connections:
+            if owner != pid:
+                continue
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                self.logger.debug(f"Error closing feedback connection: {e}")
+        self._local = threading.local()
@@ -0,0 +1,470 @@
+import heapq
+import logging
+import math
+import os
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Protocol, Tuple
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale row vectors to unit length, leaving zero vectors alone."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SimilaritySearch(Protocol):
+    """Lookups FeedbackManager runs against its feedback embeddings.
+
+    Implemented by every ``VectorIndex`` and by the append-only
+    ``FeedbackMatrix``, which the brute-force backend searches directly.
+    """
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        ...
+
+    def search_many(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        ...
+
+    def ids(self) -> List[int]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+
+class VectorIndex:
+    """Base class for cosine-similarity indexes keyed by integer feedback ids."""
+
+    backend = "base"
+
+    def __init__(self, dim: Optional[int] = None):
+        """Initialize an empty index.
+
+        Args:
+            dim: Vector dimension; inferred from the first insert if omitted.
+        """
+        self.logger = logging.getLogger("feedback")
+        self.dim = dim
+        # Identity of the feedback database the vectors came from, saved with the index
+        self.source: Optional[str] = None
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        """Insert vectors under the given ids, replacing existing ids."""
+        raise NotImplementedError
+
+    def remove(self, ids: Iterable[int]):
+        """Delete ids from the index; unknown ids are ignored."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every vector; ``source`` is kept."""
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        """Return up to k (id, cosine similarity) pairs, best first."""
+        raise NotImplementedError
+
+    def search_many(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        """Run ``search`` for each row of a query matrix."""
+        return [self.search(query, k) for query in np.atleast_2d(queries)]
+
+    def ids(self) -> List[int]:
+        """Ids currently stored."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.ids())
+
+    def save(self, path: str):
+        """Persist the index to ``path`` (an .npz file)."""
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        """Load an index previously written with ``save``."""
+        raise NotImplementedError
+
+    @staticmethod
+    def create(backend: str, dim: Optional[int] = None) -> "VectorIndex":
+        """Instantiate an index by backend name ("brute" or "hnsw")."""
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown vector index backend: {backend}")
+        return INDEX_BACKENDS[backend](dim=dim)
+
+    @staticmethod
+    def open(path: str, backend: str) -> "VectorIndex":
+        """Load the index at ``path`` if it exists and matches ``backend``, else create an empty one."""
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown vector index backend: {backend}")
+        if os.path.exists(path):
+            try:
+                return INDEX_BACKENDS[backend].load(path)
+            except Exception as e:
+                logging.getLogger("feedback").warning(f"Ignoring unreadable vector index {path}: {e}")
+        return INDEX_BACKENDS[backend]()
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact index: one contiguous normalized matrix scored with a matrix-vector product."""
+
+    backend = "brute"
+
+    def __init__(self, dim: Optional[int] = None):
+        super().__init__(dim)
+        self.matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.count = 0
+        self.rows: Dict[int, int] = {}
+
+    def _reserve(self, rows: int):
+        if rows <= self.matrix.shape[0]:
+            return
+        capacity = max(rows, 2 * self.matrix.shape[0], 64)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.count] = self.matrix[:self.count]
+        row_ids = np.zeros(capacity, dtype=np.int64)
+        row_ids[:self.count] = self.row_ids[:self.count]
+        self.matrix, self.row_ids = matrix, row_ids
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        vectors = _normalize(vectors)
+        if self.dim is None or self.count == 0:
+            self.dim = vectors.shape[1]
+            if self.matrix.shape[1] != self.dim:
+                self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._reserve(self.count + len(ids))
+        for id_, vector in zip(ids, vectors):
+            row = self.rows.get(id_)
+            if row is None:
+                row = self.count
+                self.count += 1
+                self.rows[id_] = row
+                self.row_ids[row] = id_
+            self.matrix[row] = vector
+
+    def remove(self, ids: Iterable[int]):
+        for id_ in ids:
+            row = self.rows.pop(int(id_), None)
+            if row is None:
+                continue
+            last = self.count - 1
+            if row != last:
+                moved = int(self.row_ids[last])
+                self.matrix[row] = self.matrix[last]
+                self.row_ids[row] = moved
+                self.rows[moved] = row
+            self.count = last
+
+    def clear(self):
+        source = self.source
+        self.__init__(self.dim)
+        self.source = source
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every stored row."""
+        return self.matrix[:self.count] @ _normalize(query)[0]
+
+    def _best_rows(self, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        k = min(k, self.count)
+        if k == 1:
+            best = np.array([int(np.argmax(scores))])
+        else:
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.row_ids[i]), float(scores[i])) for i in best]
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        if self.count == 0:
+            return []
+        return self._best_rows(self.scores(query), k)
+
+    def search_many(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[int, float]]]:
+        queries = _normalize(queries)
+        if self.count == 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.matrix[:self.count].T
+        return [self._best_rows(row, k) for row in scores]
+
+    def ids(self) -> List[int]:
+        return self.row_ids[:self.count].tolist()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def save(self, path: str):
+        np.savez(path, backend=np.array(self.backend), matrix=self.matrix[:self.count],
+                 ids=self.row_ids[:self.count], source=np.array(self.source or ""))
+
+    @classmethod
+    def load(cls, path: str) -> "BruteForceIndex":
+        with np.load(path) as data:
+            if str(data["backend"]) != cls.backend:
+                raise ValueError(f"{path} holds a {data['backend']} index")
+            matrix = data["matrix"]
+            index = cls(dim=matrix.shape[1] if matrix.size else None)
+            index.add(data["ids"].tolist(), matrix)
+            index.source = _saved_source(data)
+        return index
+
+
+class HNSWIndex(VectorIndex):
+    """Approximate index based on a hierarchical navigable small-world graph.
+
+    Deleted ids are tombstoned: they stay in the graph for navigation but are
+    never returned, and the graph is rebuilt once tombstones exceed
+    ``rebuild_ratio`` of the nodes.
+    """
+
+    backend = "hnsw"
+
+    def __init__(self, dim: Optional[int] = None, m: int = 16, ef_construction: int = 100,
+                 ef_search: int = 64, rebuild_ratio: float = 0.3, seed: int = 42):
+        """Initialize an empty graph.
+
+        Args:
+            dim: Vector dimension; inferred from the first insert if omitted.
+            m: Maximum neighbours per node on upper layers (2*m on layer 0).
+            ef_construction: Candidate list size while inserting.
+            ef_search: Candidate list size while searching.
+            rebuild_ratio: Fraction of tombstoned nodes that triggers a rebuild.
+            seed: Seed for level assignment.
+        """
+        super().__init__(dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.rebuild_ratio = rebuild_ratio
+        self.seed = seed
+        self.level_mult = 1.0 / math.log(max(m, 2))
+        self.rng = np.random.default_rng(seed)
+        self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.node_ids: List[int] = []
+        self.levels: List[int] = []
+        self.layers: List[Dict[int, List[int]]] = []
+        self.nodes: Dict[int, int] = {}
+        self.deleted = set()
+        self.entry = None
+        self.max_level = -1
+
+    def _max_neighbors(self, level: int) -> int:
+        return 2 * self.m if level == 0 else self.m
+
+    def _reserve(self, rows: int):
+        if rows <= self.vectors.shape[0]:
+            return
+        capacity = max(rows, 2 * self.vectors.shape[0], 64)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:len(self.node_ids)] = self.vectors[:len(self.node_ids)]
+        self.vectors = vectors
+
+    def _search_layer(self, query: np.ndarray, entries: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        """Greedy best-first search on one layer; returns (similarity, node) pairs, best first."""
+        layer = self.layers[level]
+        visited = set(entries)
+        entry_scores = self.vectors[entries] @ query
+        candidates = [(-float(s), n) for s, n in zip(entry_scores, entries)]
+        heapq.heapify(candidates)
+        results = [(float(s), n) for s, n in zip(entry_scores, entries)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if -neg_score < results[0][0] and len(results) >= ef:
+                break
+            neighbors = [n for n in layer.get(node, ()) if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            scores = self.vectors[neighbors] @ query
+            for score, neighbor in zip(scores.tolist(), neighbors):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbor))
+                    heapq.heappush(results, (score, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select_neighbors(self, base: np.ndarray, candidates: List[int], limit: int) -> List[int]:
+        """Pick up to ``limit`` diverse neighbours using the HNSW selection heuristic.
+
+        A candidate is kept only if it is closer to ``base`` than to every
+        neighbour already kept, which preserves links between clusters.
+        Remaining slots are filled with the closest pruned candidates.
+        """
+        if len(candidates) <= limit:
+            return list(candidates)
+        vectors = self.vectors[candidates]
+        scores = vectors @ base
+        order = np.argsort(-scores, kind="stable")
+        ordered = vectors[order]
+        pairwise = ordered @ ordered.T
+        order_scores = scores[order].tolist()
+        closest_selected = np.full(len(candidates), -np.inf, dtype=np.float32)
+        selected, pruned = [], []
+        for i, score in enumerate(order_scores):
+            if len(selected) >= limit:
+                break
+            if closest_selected[i] > score:
+                pruned.append(i)
+            else:
+                selected.append(i)
+                np.maximum(closest_selected, pairwise[i], out=closest_selected)
+        selected.extend(pruned[:limit - len(selected)])
+        return [candidates[order[i]] for i in selected]
+
+    def _shrink(self, node: int, level: int):
+        neighbors = self.layers[level][node]
+        limit = self._max_neighbors(level)
+        # Let lists overflow by a quarter before pruning so that the selection
+        # heuristic runs once per several inserts instead of on every link.
+        if len(neighbors) > limit + max(1, limit // 4):
+            self.layers[level][node] = self._select_neighbors(self.vectors[node], neighbors, limit)
+
+    def _insert(self, id_: int, vector: np.ndarray):
+        node = len(self.node_ids)
+        self._reserve(node + 1)
+        self.vectors[node] = vector
+        self.node_ids.append(id_)
+        self.nodes[id_] = node
+        level = int(-math.log(max(self.rng.random(), 1e-12)) * self.level_mult)
+        self.levels.append(level)
+        while len(self.layers) <= level:
+            self.layers.append({})
+        for lc in range(level + 1):
+            self.layers[lc][node] = []
+
+        if self.entry is None:
+            self.entry, self.max_level = node, level
+            return
+
+        entries = [self.entry]
+        for lc in range(self.max_level, level, -1):
+            entries = [self._search_layer(vector, entries, 1, lc)[0][1]]
+        for lc in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vector, entries, self.ef_construction, lc)
+            neighbors = self._select_neighbors(vector, [n for _, n in found], self._max_neighbors(lc))
+            self.layers[lc][node] = list(neighbors)
+            for neighbor in neighbors:
+                self.layers[lc][neighbor].append(node)
+                self._shrink(neighbor, lc)
+            entries = [n for _, n in found]
+        if level > self.max_level:
+            self.entry, self.max_level = node, level
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        vectors = _normalize(vectors)
+        if self.dim is None or not self.node_ids:
+            self.dim = vectors.shape[1]
+            if self.vectors.shape[1] != self.dim:
+                self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        replaced = [id_ for id_ in ids if id_ in self.nodes]
+        if replaced:
+            self.remove(replaced)
+        for id_, vector in zip(ids, vectors):
+            self._insert(id_, vector)
+
+    def remove(self, ids: Iterable[int]):
+        for id_ in ids:
+            node = self.nodes.pop(int(id_), None)
+            if node is not None:
+                self.deleted.add(node)
+        if self.node_ids and len(self.deleted) > self.rebuild_ratio * len(self.node_ids):
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the graph from live nodes, dropping tombstones."""
+        live = [(id_, self.vectors[node].copy()) for id_, node in self.nodes.items()]
+        self.logger.debug(f"Rebuilding HNSW index with {len(live)} live nodes")
+        self.clear()
+        if live:
+            self.add([id_ for id_, _ in live], np.stack([vector for _, vector in live]))
+
+    def clear(self):
+        source = self.source
+        self.__init__(self.dim, self.m, self.ef_construction, self.ef_search, self.rebuild_ratio, self.seed)
+        self.source = source
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        if not self.nodes:
+            return []
+        query = _normalize(query)[0]
+        entries = [self.entry]
+        for lc in range(self.max_level, 0, -1):
+            entries = [self._search_layer(query, entries, 1, lc)[0][1]]
+        ef = max(self.ef_search, k) + min(len(self.deleted), self.ef_search)
+        found = self._search_layer(query, entries, ef, 0)
+        results = [(self.node_ids[n], score) for score, n in found if n not in self.deleted]
+        return results[:k]
+
+    def ids(self) -> List[int]:
+        return list(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def save(self, path: str):
+        arrays = {
+            "backend": np.array(self.backend),
+            "params": np.array([self.m, self.ef_construction, self.ef_search, self.seed,
+                                -1 if self.entry is None else self.entry, self.max_level], dtype=np.int64),
+            "rebuild_ratio": np.array(self.rebuild_ratio),
+            "vectors": self.vectors[:len(self.node_ids)],
+            "ids": np.asarray(self.node_ids, dtype=np.int64),
+            "levels": np.asarray(self.levels, dtype=np.int64),
+            "deleted": np.asarray(sorted(self.deleted), dtype=np.int64),
+            "source": np.array(self.source or ""),
+        }
+        for lc, layer in enumerate(self.layers):
+            nodes = np.fromiter(layer.keys(), dtype=np.int64, count=len(layer))
+            lengths = np.fromiter((len(n) for n in layer.values()), dtype=np.int64, count=len(layer))
+            arrays[f"layer{lc}_nodes"] = nodes
+            arrays[f"layer{lc}_offsets"] = np.concatenate(([0], np.cumsum(lengths)))
+            arrays[f"layer{lc}_flat"] = np.fromiter(
+                (n for neighbors in layer.values() for n in neighbors), dtype=np.int64, count=int(lengths.sum())
+            )
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        with np.load(path) as data:
+            if str(data["backend"]) != cls.backend:
+                raise ValueError(f"{path} holds a {data['backend']} index")
+            m, ef_construction, ef_search, seed, entry, max_level = data["params"].tolist()
+            vectors = data["vectors"]
+            index = cls(dim=vectors.shape[1] if vectors.size else None, m=m, ef_construction=ef_construction,
+                        ef_search=ef_search, rebuild_ratio=float(data["rebuild_ratio"]), seed=seed)
+            index.vectors = np.array(vectors, dtype=np.float32)
+            index.node_ids = data["ids"].tolist()
+            index.levels = data["levels"].tolist()
+            index.deleted = set(data["deleted"].tolist())
+            index.nodes = {id_: node for node, id_ in enumerate(index.node_ids) if node not in index.deleted}
+            index.entry = None if entry < 0 else entry
+            index.max_level = max_level
+            index.source = _saved_source(data)
+            lc = 0
+            while f"layer{lc}_nodes" in data:
+                nodes = data[f"layer{lc}_nodes"].tolist()
+                offsets = data[f"layer{lc}_offsets"].tolist()
+                flat = data[f"layer{lc}_flat"].tolist()
+                index.layers.append({node: flat[offsets[i]:offsets[i + 1]] for i, node in enumerate(nodes)})
+                lc += 1
+        return index
+
+
+def _saved_source(data) -> Optional[str]:
+    """Source identity stored by ``save``; None for files written before it was recorded."""
+    return (str(data["source"]) or None) if "source" in data else None
+
+
+INDEX_BACKENDS = {
+    BruteForceIndex.backend: BruteForceIndex,
+    HNSWIndex.backend: HNSWIndex,
+}
@@ -1,9 +1,11 @@
+import argparse
 import logging
 import logging.config
 import os
 import json
-from typing import Dict, List, Tuple
-import spacy
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from nlp import spacy_registry
 from sentence_transformers import SentenceTransformer
 from database.connection import DatabaseConnection
 from config.config_manager import DBConfigManager
@@ -12,9 +14,15 @@ from schema.schema_manager import SchemaManager
 from feedback.feedback_manager import FeedbackManager
 from analysis.table_identifier import TableIdentifier
 from analysis.name_match_manager import NameMatchManager
+from analysis.schema_index import SchemaIndex
 from analysis.processor import NLPPipeline
 from nlp.query_processor import QueryProcessor
+from nlp.embedding_cache import CachedEmbedder
+from nlp.query_context import QueryContext
+from nlp.parsed_query import get_parser
+from analysis import tracing
 from cli.interface import DatabaseAnalyzerCLI
+from service import http_service, prefork
 
 class DatabaseAnalyzer:
     """Orchestrates database schema analysis and natural language query processing.
@@ -31,6 +39,7 @@ class DatabaseAnalyzer:
         os.makedirs("schema_cache", exist_ok=True)
         os.makedirs("feedback_cache", exist_ok=True)
         os.makedirs("models", exist_ok=True)
+        os.makedirs("embedding_cache", exist_ok=True)
 
         # Set up logging
         logging_config_path = "app-config/logging_config.ini"
@@ -70,14 +79,11 @@ class DatabaseAnalyzer:
         self.query_processor = None
         self.current_config = None
         self.schema_dict = {}
+        self.schema_index = None
         self.query_history = []
+        self.nlp = spacy_registry.lazy("en_core_web_sm")
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except Exception as e:
-            self.logger.error(f"Failed to load spacy model: {e}")
-            self.nlp = None
-        try:
-            self.embedder = SentenceTransformer("all-distilroberta-v1")
+            self.embedder = CachedEmbedder(SentenceTransformer("all-distilroberta-v1"), "all-distilroberta-v1")
         except Exception as e:
             self.logger.error(f"Failed to load SentenceTransformer: {e}")
             self.embedder = None
@@ -92,12 +98,66 @@ class DatabaseAnalyzer:
             self.logger.error(f"Application error: {e}")
             print(f"Application error: {e}")
         finally:
-            if self.table_identifier and self.current_config:
-                self.table_identifier.save_name_matches()
-                self.table_identifier.save_model(f"models/{self.current_config['database']}_model.json")
-            if self.connection_manager:
-                self.connection_manager.close()
-            self.logger.info("Application shutdown")
+            self._shutdown()
+
+    def serve(self, config_path: str, database: str = None, host: str = "127.0.0.1", port: int = 8080,
+              window_ms: float = 5.0, max_batch: int = 64, workers: int = 1):
+        """Connect without the CLI and run the HTTP service.
+
+        Args:
+            config_path (str): Path to the configuration file.
+            database (str): Configuration name or database name; the first valid configuration if omitted.
+            host (str): Interface to bind.
+            port (int): Port to listen on.
+            window_ms (float): Micro-batching window in milliseconds.
+            max_batch (int): Maximum queries per batch.
+            workers (int): Worker processes; more than one forks them from this process after loading.
+        """
+        try:
+            if not os.path.exists(config_path):
+                self.logger.error(f"Config file not found at {config_path}")
+                print(f"Config file not found at {config_path}")
+                return
+            configs = self.load_configs(config_path)
+            config = None
+            if database:
+                config = configs.get(database) or next(
+                    (c for c in configs.values() if c.get('database') == database), None
+                )
+            elif configs:
+                config = next(iter(configs.values()))
+            if config is None:
+                self.logger.error(f"No valid configuration for {database or 'service'}")
+                print(f"No valid configuration for {database or 'service'}")
+                return
+
+            self.set_current_config(config)
+            if not self.connect_to_database():
+                return
+            if workers > 1:
+                prefork.serve(self, host, port, workers, window_ms, max_batch)
+            else:
+                http_service.serve(self, host, port, window_ms, max_batch)
+        except Exception as e:
+            self.logger.error(f"Service error: {e}")
+            print(f"Service error: {e}")
+        finally:
+            self._shutdown()
+
+    def _shutdown(self):
+        """Persist models and indexes and close the connection."""
+        if self.table_identifier and self.current_config:
+            self.table_identifier.save_name_matches()
+            self.table_identifier.save_model(f"models/{self.current_config['database']}_model.json")
+        if self.feedback_manager:
+            self.feedback_manager.close()
+        for embedder in {id(e): e for e in (self.embedder, FeedbackManager._embedder) if e}.values():
+            cache = getattr(embedder, "cache", None)
+            if cache is not None:
+                cache.flush()
+        if self.connection_manager:
+            self.connection_manager.close()
+        self.logger.info("Application shutdown")
 
     def load_configs(self, config_path: str = "app-config/database_configurations.json") -> Dict:
         """Load and validate database configurations.
@@ -187,28 +247,28 @@ class DatabaseAnalyzer:
         # Initialize schema manager
         self.schema_manager = SchemaManager(db_name)
         try:
-            if self.schema_manager.needs_refresh(self.connection_manager.connection):
-                self.logger.debug("Building fresh schema")
-                self.schema_dict = self.schema_manager.build_data_dict(
-                    self.connection_manager.connection
+            with self.connection_manager.connection() as connection:
+                self.schema_dict = self.schema_manager.load_schema(
+                    connection, self.connection_manager.new_connection,
+                    self.connection_manager.available_connections()
                 )
-            else:
-                self.logger.debug("Loading schema from cache")
-                self.schema_dict = self.schema_manager.load_from_cache()
         except Exception as e:
             self.logger.error(f"Schema initialization failed: {e}")
             raise
 
         # Initialize other managers
+        self._build_schema_index()
         self.pattern_manager = PatternManager(self.schema_dict)
-        self.feedback_manager = FeedbackManager(db_name)
+        if self.feedback_manager:
+            self.feedback_manager.close()
+        self.feedback_manager = FeedbackManager(db_name, self._index_backend(), self._quantization())
         try:
             self.nlp_pipeline = NLPPipeline(self.pattern_manager, db_name)
         except Exception as e:
             self.logger.warning(f"NLPPipeline initialization failed: {e}")
             self.nlp_pipeline = None
         try:
-            self.name_matcher = NameMatchManager(db_name, self.embedder)
+            self.name_matcher = NameMatchManager(db_name, self.embedder, self.schema_index)
         except Exception as e:
             self.logger.warning(f"NameMatchManager initialization failed: {e}")
             self.name_matcher = None
@@ -221,7 +281,8 @@ class DatabaseAnalyzer:
                 self.pattern_manager,
                 self.name_matcher,
                 db_name,
-                self.embedder
+                self.embedder,
+                self.schema_index
             )
         except Exception as e:
             self.logger.warning(f"TableIdentifier initialization failed: {e}")
@@ -236,8 +297,29 @@ class DatabaseAnalyzer:
 
         self.logger.debug("Managers initialized successfully")
 
+    def _quantization(self) -> Optional[str]:
+        """Feedback embedding quantization ("int8" or "float16") set by the ``embedding_quantization`` config key."""
+        return (self.current_config or {}).get("embedding_quantization")
+
+    def _index_backend(self) -> str:
+        """Feedback vector index ("brute" or "hnsw") set by the ``feedback_index_backend`` config key."""
+        return (self.current_config or {}).get("feedback_index_backend", "brute")
+
+    def _build_schema_index(self):
+        """Build the shared schema embedding index, reusing it if the schema is unchanged."""
+        if not self.embedder:
+            self.schema_index = None
+            return
+        try:
+            self.schema_index = SchemaIndex.for_schema(self.schema_dict, self.embedder, self.schema_index)
+        except Exception as e:
+            self.logger.warning(f"Schema index initialization failed: {e}")
+            self.schema_index = None
+
     def _reset_managers(self):
         """Reset managers to null states."""
+        if self.feedback_manager:
+            self.feedback_manager.close()
         self.schema_manager = None
         self.pattern_manager = None
         self.feedback_manager = None
@@ -246,6 +328,7 @@ class DatabaseAnalyzer:
         self.table_identifier = None
         self.query_processor = None
         self.schema_dict = {}
+        self.schema_index = None
         self.logger.debug("Managers reset due to initialization failure")
 
     def reload_all_configurations(self) -> bool:
@@ -262,18 +345,23 @@ class DatabaseAnalyzer:
         try:
             db_name = self.current_config['database']
             self.logger.debug(f"Reloading configurations for {db_name}")
-            self.schema_dict = self.schema_manager.build_data_dict(
-                self.connection_manager.connection
-            )
+            with self.connection_manager.connection() as connection:
+                self.schema_dict = self.schema_manager.build_data_dict(
+                    connection, self.connection_manager.new_connection,
+                    self.connection_manager.available_connections()
+                )
+            self._build_schema_index()
             self.pattern_manager = PatternManager(self.schema_dict)
-            self.feedback_manager = FeedbackManager(db_name)
+            if self.feedback_manager:
+                self.feedback_manager.close()
+            self.feedback_manager = FeedbackManager(db_name, self._index_backend(), self._quantization())
             try:
                 self.nlp_pipeline = NLPPipeline(self.pattern_manager, db_name)
             except Exception as e:
                 self.logger.warning(f"NLPPipeline initialization failed: {e}")
                 self.nlp_pipeline = None
             try:
-                self.name_matcher = NameMatchManager(db_name, self.embedder)
+                self.name_matcher = NameMatchManager(db_name, self.embedder, self.schema_index)
             except Exception as e:
                 self.logger.warning(f"NameMatchManager initialization failed: {e}")
                 self.name_matcher = None
@@ -283,7 +371,8 @@ class DatabaseAnalyzer:
                 self.pattern_manager,
                 self.name_matcher,
                 db_name,
-                self.embedder
+                self.embedder,
+                self.schema_index
             )
             self.query_processor = QueryProcessor(self.table_identifier)
             self.logger.info("Configurations reloaded successfully")
@@ -294,11 +383,45 @@ class DatabaseAnalyzer:
             self._reset_managers()
             return False
 
-    def process_query(self, query: str) -> Tuple[List[str], float]:
+    def refresh_schema(self) -> Optional[List[str]]:
+        """Re-extract only the tables changed in the database and patch the live components.
+
+        Returns:
+            Optional[List[str]]: Affected tables (schema.table), or None if
+            per-table refresh was unavailable and a full reload ran instead, or
+            the refresh failed.
+        """
+        if not self.connection_manager or not self.connection_manager.is_connected() or not self.schema_manager:
+            self.logger.error("Not connected to database")
+            return None
+        try:
+            with self.connection_manager.connection() as connection:
+                changed = self.schema_manager.refresh_changed_tables(connection, self.schema_dict)
+        except Exception as e:
+            self.logger.error(f"Schema refresh failed: {e}")
+            return None
+        if changed is None:
+            self.logger.info("Per-table refresh unavailable, reloading all configurations")
+            self.reload_all_configurations()
+            return None
+        if changed:
+            if self.embedder and self.schema_index is not None:
+                self.schema_index = SchemaIndex.for_schema(self.schema_dict, self.embedder, self.schema_index, changed)
+            if self.pattern_manager:
+                self.pattern_manager.refresh_tables(changed)
+            if self.name_matcher:
+                self.name_matcher.schema_index = self.schema_index
+            if self.table_identifier:
+                self.table_identifier.refresh_tables(changed, self.schema_index)
+            self.logger.info(f"Refreshed schema for {len(changed)} tables")
+        return changed
+
+    def process_query(self, query: str, context: QueryContext = None) -> Tuple[List[str], float]:
         """Process a natural language query to identify tables.
 
         Args:
             query (str): The query text.
+            context (QueryContext): Per-request context; created here if omitted.
 
         Returns:
             Tuple[List[str], float]: Identified tables and confidence score.
@@ -313,14 +436,17 @@ class DatabaseAnalyzer:
             print("Query processor not initialized. Please connect to the database.")
             return [], 0.0
 
+        if context is None or context.query != query:
+            context = QueryContext(query)
+
         # Validate query relevance
-        if not self._is_relevant_query(query):
+        if not self._is_relevant_query(query, context):
             self.logger.warning(f"Query not relevant to schema: {query}")
             print("Please enter a meaningful query in English.")
             return [], 0.0
 
         try:
-            tables, confidence = self.query_processor.process_query(query)
+            tables, confidence = self.query_processor.process_query(query, context)
             self.query_history.append(query)
             if len(self.query_history) > 10:
                 self.query_history.pop(0)
@@ -331,11 +457,95 @@ class DatabaseAnalyzer:
             print(f"Query processing error: {e}")
             return [], 0.0
 
-    def _is_relevant_query(self, query: str) -> bool:
+    def process_queries(self, queries: List[str], batch_size: int = 64) -> List[Tuple[List[str], float]]:
+        """Process a list of queries with the same cascade as ``process_query``.
+
+        Queries are parsed with one ``nlp.pipe`` pass and every raw and
+        preprocessed text is encoded in a single batched call; the relevance
+        gate, feedback lookup and schema scoring then run as matrix products
+        over the whole batch. A query that fails gets ``([], 0.0)`` without
+        affecting the others, and processed queries are added to the history
+        as in ``process_query``.
+
+        Args:
+            queries (List[str]): Query texts.
+            batch_size (int): Batch size for spacy and the embedder.
+
+        Returns:
+            List[Tuple[List[str], float]]: Identified tables and confidence per query.
+        """
+        results = [([], 0.0)] * len(queries)
+        if not self.connection_manager or not self.connection_manager.is_connected():
+            self.logger.error("Not connected to database")
+            return results
+
+        if self.query_processor is None:
+            self.logger.error("Query processor not initialized")
+            return results
+
+        if not queries:
+            return results
+
+        contexts = [QueryContext(query) for query in queries]
+        if self.nlp:
+            try:
+                get_parser().parse_many(queries, batch_size=batch_size)
+            except Exception as e:
+                self.logger.error(f"Batch parse error, parsing queries individually: {e}")
+        for context in contexts:
+            try:
+                context.preprocessed = self.query_processor.preprocess_query(context.query, context)
+            except Exception as e:
+                self.logger.error(f"Error preprocessing query {context.query!r}: {e}")
+                context.preprocessed = ""
+
+        similarities = [None] * len(queries)
+        try:
+            if self.embedder:
+                texts = list(dict.fromkeys(
+                    [context.query for context in contexts] +
+                    [context.preprocessed for context in contexts if context.preprocessed]
+                ))
+                vectors = np.asarray(self.embedder.encode(texts, batch_size=batch_size), dtype=np.float32)
+                rows = {text: i for i, text in enumerate(texts)}
+                for context in contexts:
+                    context.prime(self.embedder, context.query, vectors[rows[context.query]])
+                    if context.preprocessed:
+                        context.prime(self.embedder, context.preprocessed, vectors[rows[context.preprocessed]])
+                if self.schema_index is not None and len(self.schema_index):
+                    query_rows = [rows[context.query] for context in contexts]
+                    similarities = self.schema_index.max_similarity_many(vectors[query_rows]).tolist()
+        except Exception as e:
+            # Contexts encode on demand, so each query is then scored on its own
+            self.logger.error(f"Batch encoding error, scoring queries individually: {e}")
+            similarities = [None] * len(queries)
+
+        relevant = []
+        for i, (query, context) in enumerate(zip(queries, contexts)):
+            try:
+                if self._is_relevant_query(query, context, similarities[i]):
+                    relevant.append(i)
+            except Exception as e:
+                self.logger.error(f"Error checking relevance of query {query!r}: {e}")
+        processed = self.query_processor.process_queries(
+            [queries[i] for i in relevant],
+            [contexts[i] for i in relevant]
+        )
+        for i, result in zip(relevant, processed):
+            results[i] = result
+            self.query_history.append(queries[i])
+        del self.query_history[:-10]
+        self.logger.debug(f"Processed batch of {len(queries)} queries, {len(relevant)} relevant")
+        return results
+
+    @tracing.traced("is_relevant_query")
+    def _is_relevant_query(self, query: str, context: QueryContext = None, max_similarity: float = None) -> bool:
         """Check if the query is relevant to the database schema.
 
         Args:
             query (str): The query text.
+            context (QueryContext): Per-request context holding memoized embeddings.
+            max_similarity (float): Precomputed schema similarity of the query, if already scored.
 
         Returns:
             bool: True if relevant, False otherwise.
@@ -345,12 +555,15 @@ class DatabaseAnalyzer:
             self.logger.warning(f"Invalid query: {query}")
             return False
 
+        if context is None or context.query != query:
+            context = QueryContext(query)
+
         # Use spacy for intent analysis
-        if not self.nlp:
+        parsed = context.parse(query) if self.nlp else None
+        if parsed is None:
             self.logger.warning("Spacy model not loaded, skipping intent analysis")
             return True
-        doc = self.nlp(query)
-        query_tokens = [token.text.lower() for token in doc if not token.is_stop and token.is_alpha]
+        query_tokens = parsed.content_tokens
 
         # Check for non-English or irrelevant queries
         if not query_tokens:
@@ -361,20 +574,12 @@ class DatabaseAnalyzer:
         if not self.embedder:
             self.logger.warning("SentenceTransformer not loaded, skipping semantic similarity")
             return True
-        metadata_texts = []
-        for schema in self.schema_dict['tables']:
-            for table in self.schema_dict['tables'][schema]:
-                metadata_texts.append(f"{schema}.{table}")
-                for col_name in self.schema_dict['columns'][schema][table]:
-                    metadata_texts.append(col_name)
-
-        if not metadata_texts:
+        if self.schema_index is None or not len(self.schema_index):
             return True  # No metadata to compare, proceed cautiously
 
-        query_embedding = self.embedder.encode(query, convert_to_tensor=True)
-        metadata_embeddings = self.embedder.encode(metadata_texts, convert_to_tensor=True)
-        similarities = (query_embedding @ metadata_embeddings.T).cpu().numpy()
-        max_similarity = similarities.max()
+        if max_similarity is None:
+            query_embedding = context.encode(self.embedder, query)
+            max_similarity = self.schema_index.max_similarity(query_embedding)
 
         if max_similarity < 0.3:  # Threshold for relevance
             self.logger.warning(f"Query not relevant to schema (max similarity: {max_similarity}): {query}")
@@ -511,6 +716,19 @@ class DatabaseAnalyzer:
             else:
                 self.logger.warning(f"No valid tables for feedback: {tables}")
 
+    def apply_feedback_update(self, query: str, tables: List[str]):
+        """Apply feedback stored by another process to this process's caches and weights.
+
+        Args:
+            query (str): The query.
+            tables (List[str]): Confirmed tables.
+        """
+        if self.feedback_manager:
+            added = self.feedback_manager.load_new_feedback()
+            self.logger.debug(f"Loaded {added} new feedback entries")
+        if self.table_identifier:
+            self.table_identifier.update_weights_from_feedback(query, tables)
+
     def update_feedback(self, query: str, tables: List[str]):
         """Update feedback with corrected tables.
 
@@ -530,6 +748,37 @@ class DatabaseAnalyzer:
             else:
                 self.logger.warning(f"No valid tables for feedback update: {tables}")
 
+    def get_stats(self) -> Dict:
+        """Collect pipeline statistics.
+
+        Returns:
+            Dict: Per-span latency histograms, hit/miss counts and confidence
+            distributions, plus embedding cache, query parser, spacy model and
+            connection pool stats.
+        """
+        stats = {"spans": tracing.get_tracer().stats()}
+        if self.embedder is not None and hasattr(self.embedder, "hits"):
+            stats["embedding_cache"] = {"hits": self.embedder.hits, "misses": self.embedder.misses}
+        parser = get_parser()
+        stats["query_parser"] = {"hits": parser.hits, "misses": parser.misses}
+        stats["spacy_models"] = spacy_registry.model_stats()
+        if self.connection_manager is not None:
+            stats["connection_pool"] = self.connection_manager.metrics()
+        return stats
+
+    def dump_trace(self, path: str) -> int:
+        """Write recorded spans as a Chrome trace JSON file.
+
+        Args:
+            path (str): Output file.
+
+        Returns:
+            int: Number of events written.
+        """
+        count = tracing.get_tracer().dump_chrome_trace(path)
+        self.logger.info(f"Wrote {count} trace events to {path}")
+        return count
+
     def clear_feedback(self):
         """Clear all feedback data."""
         if self.feedback_manager:
@@ -541,9 +790,24 @@ class DatabaseAnalyzer:
             print("Feedback manager not initialized. Please connect to a database.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database schema analyzer")
+    parser.add_argument("--serve", action="store_true", help="Run the HTTP service instead of the CLI")
+    parser.add_argument("--host", default="127.0.0.1", help="Service bind address")
+    parser.add_argument("--port", type=int, default=8080, help="Service port")
+    parser.add_argument("--config", default="app-config/database_configurations.json",
+                        help="Database configuration file")
+    parser.add_argument("--database", help="Configuration name (e.g. BIKES_DB) or database name to serve")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0, help="Micro-batching window")
+    parser.add_argument("--max-batch", type=int, default=64, help="Maximum queries per batch")
+    parser.add_argument("--workers", type=int, default=1, help="Pre-forked worker processes sharing the loaded models")
+    args = parser.parse_args()
     try:
         analyzer = DatabaseAnalyzer()
-        analyzer.run()
+        if args.serve:
+            analyzer.serve(args.config, args.database, args.host, args.port, args.batch_window_ms, args.max_batch,
+                           args.workers)
+        else:
+            analyzer.run()
     except Exception as e:
         logging.getLogger("main").error(f"Application failed: {e}")
         print(f"Application failed: {e}")
\ No newline at end of file
@@ -0,0 +1,327 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+class EmbeddingCache:
+    """Persistent content-addressed store of text embeddings for one model.
+
+    Vectors live in a memory-mapped float32 file and are addressed by a SHA-1
+    digest of (model name, text). A compact key index records the digest and
+    last-access tick of every slot so that the least recently used entries are
+    evicted once ``max_entries`` is reached.
+
+    Writes go to the mapped file and the in-memory index; both are persisted
+    every ``flush_every`` new entries or ``flush_interval`` seconds, and on
+    ``flush``/``freeze``/exit, so encoding a query does not wait for disk.
+    The index and metadata files are replaced atomically. Before a slot of
+    an evicted entry is overwritten the metadata is marked unclean, so a
+    cache left behind by a crash, whose index may still name the old entry
+    of that slot, is discarded on load instead of returning wrong vectors.
+    """
+
+    _instances: Dict[tuple, "EmbeddingCache"] = {}
+    _instances_lock = threading.Lock()
+
+    INDEX_DTYPE = np.dtype([("key", "S20"), ("tick", "<u8")])
+
+    def __init__(self, model_name: str, cache_root: str = "embedding_cache", max_entries: int = 100000,
+                 flush_every: int = 256, flush_interval: float = 30.0):
+        """Initialize the cache directory for a model.
+
+        Args:
+            model_name: Name of the embedding model; part of every key.
+            cache_root: Root directory holding one sub-directory per model.
+            max_entries: Maximum number of vectors kept before LRU eviction.
+            flush_every: New entries after which ``put_many`` persists the cache.
+            flush_interval: Seconds after which ``put_many`` persists the cache.
+        """
+        self.logger = logging.getLogger("embedding_cache")
+        self.model_name = model_name
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = os.path.join(cache_root, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.index_path = os.path.join(self.cache_dir, "index.npy")
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self.dim = None
+        self.capacity = 0
+        self.count = 0
+        self.tick = 0
+        self.index = np.zeros(0, dtype=self.INDEX_DTYPE)
+        self.slots: Dict[bytes, int] = {}
+        self.vectors = None
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+        self._clean_on_disk = True
+        self.frozen = False
+        self._load()
+        self.logger.debug(f"Initialized EmbeddingCache for {model_name} with {self.count} entries")
+
+    @classmethod
+    def shared(cls, model_name: str, cache_root: str = "embedding_cache", max_entries: int = 100000) -> "EmbeddingCache":
+        """Return the process-wide cache for a model, creating it on first use."""
+        key = (model_name, os.path.abspath(cache_root))
+        with cls._instances_lock:
+            cache = cls._instances.get(key)
+            if cache is None:
+                cache = cls(model_name, cache_root, max_entries)
+                cls._instances[key] = cache
+                atexit.register(cache.flush)
+            return cache
+
+    def _load(self):
+        """Load the key index and map the vector file, discarding it if inconsistent."""
+        try:
+            if not (os.path.exists(self.meta_path) and os.path.exists(self.index_path)
+                    and os.path.exists(self.vectors_path)):
+                return
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get("model") != self.model_name:
+                raise ValueError(f"cache belongs to model {meta.get('model')}")
+            if not meta.get("clean", True):
+                raise ValueError("evicted slots were rewritten and not flushed")
+            index = np.load(self.index_path)
+            dim = int(meta["dim"])
+            capacity = os.path.getsize(self.vectors_path) // (4 * dim)
+            count = int(meta["count"])
+            if index.dtype != self.INDEX_DTYPE or len(index) < count or capacity < count:
+                raise ValueError("index and vector file disagree")
+            self.dim = dim
+            self.capacity = capacity
+            self.count = count
+            self.tick = int(meta.get("tick", 0))
+            self.index = np.zeros(capacity, dtype=self.INDEX_DTYPE)
+            self.index[:count] = index[:count]
+            self.slots = {bytes(k): i for i, k in enumerate(self.index["key"][:count])}
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable embedding cache at {self.cache_dir}: {e}")
+            self._reset()
+
+    def _reset(self):
+        """Drop all entries and on-disk files."""
+        self.vectors = None
+        self.dim = None
+        self.capacity = 0
+        self.count = 0
+        self.index = np.zeros(0, dtype=self.INDEX_DTYPE)
+        self.slots = {}
+        self._clean_on_disk = True
+        for path in (self.vectors_path, self.index_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _grow(self, needed: int):
+        """Extend the vector file so that it can hold at least ``needed`` rows."""
+        capacity = min(self.max_entries, max(needed, self.capacity * 2, 1024))
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        index = np.zeros(capacity, dtype=self.INDEX_DTYPE)
+        index[:self.count] = self.index[:self.count]
+        self.index = index
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for texts.
+
+        Args:
+            texts: Texts to look up.
+
+        Returns:
+            List aligned with ``texts`` holding a vector copy or None for a miss.
+        """
+        with self._lock:
+            results = []
+            for text in texts:
+                slot = self.slots.get(self._key(text))
+                if slot is None:
+                    results.append(None)
+                    continue
+                self.tick += 1
+                self.index["tick"][slot] = self.tick
+                results.append(np.array(self.vectors[slot]))
+                self._dirty = True
+            return results
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray):
+        """Store vectors for texts, evicting least recently used entries if full.
+
+        Args:
+            texts: Texts that were encoded.
+            vectors: Matrix of embeddings aligned with ``texts``.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.frozen or vectors.ndim != 2 or len(texts) != vectors.shape[0] or not len(texts):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                self.logger.warning(f"Embedding dimension changed from {self.dim} to {vectors.shape[1]}, resetting cache")
+                self._reset()
+                self.dim = int(vectors.shape[1])
+
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                pending[self._key(text)] = vector
+            new_keys = [key for key in pending if key not in self.slots]
+            for key in pending:
+                if key in self.slots:
+                    self.tick += 1
+                    self.index["tick"][self.slots[key]] = self.tick
+            if len(new_keys) > self.max_entries:
+                new_keys = new_keys[-self.max_entries:]
+                pending = {key: pending[key] for key in new_keys}
+            fresh = min(len(new_keys), self.max_entries - self.count)
+            if self.count + fresh > self.capacity:
+                self._grow(self.count + fresh)
+
+            victims = []
+            evict = len(new_keys) - fresh
+            if evict:
+                ticks = self.index["tick"][:self.count]
+                victims = np.argpartition(ticks, evict - 1)[:evict].tolist()
+                for slot in victims:
+                    self.slots.pop(bytes(self.index["key"][slot]), None)
+                if self._clean_on_disk:
+                    self._write_meta(clean=False)
+
+            for key, vector in pending.items():
+                slot = self.slots.get(key)
+                if slot is None:
+                    if victims:
+                        slot = victims.pop()
+                    else:
+                        slot = self.count
+                        self.count += 1
+                    self.slots[key] = slot
+                    self.index["key"][slot] = key
+                self.tick += 1
+                self.index["tick"][slot] = self.tick
+                self.vectors[slot] = vector
+            self._dirty = True
+            self._unflushed += len(new_keys)
+            if self._unflushed >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """Persist the key index and vector file."""
+        with self._lock:
+            if self.frozen or not self._dirty or self.vectors is None:
+                return
+            try:
+                self.vectors.flush()
+                # np.save appends .npy to names without it
+                temporary = f"{self.index_path}.{os.getpid()}.tmp.npy"
+                np.save(temporary, self.index[:self.count])
+                os.replace(temporary, self.index_path)
+                self._write_meta(clean=True)
+                self._dirty = False
+                self._unflushed = 0
+                self._flushed_at = time.monotonic()
+            except Exception as e:
+                self.logger.error(f"Error flushing embedding cache: {e}")
+
+    def _write_meta(self, clean: bool):
+        """Atomically rewrite meta.json."""
+        temporary = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "count": self.count,
+                       "tick": self.tick, "clean": clean}, f)
+        os.replace(temporary, self.meta_path)
+        self._clean_on_disk = clean
+
+    def freeze(self):
+        """Stop writing to disk; lookups keep working.
+
+        Used before forking workers that share the mapped vector file, so no
+        process can reuse a slot another process still reads.
+        """
+        with self._lock:
+            self.flush()
+            self.frozen = True
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class CachedEmbedder:
+    """Wraps a SentenceTransformer so that only cache misses are encoded."""
+
+    def __init__(self, model, model_name: str, cache: Optional[EmbeddingCache] = None):
+        """Initialize with an encoder and its model name.
+
+        Args:
+            model: Object exposing ``encode(texts, ...)`` (normally a SentenceTransformer).
+            model_name: Name of the model, used to key cached vectors.
+            cache: Cache to use; defaults to the shared cache for ``model_name``.
+        """
+        self.logger = logging.getLogger("embedding_cache")
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache.shared(model_name)
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_tensor: bool = False, **kwargs):
+        """Encode texts, computing only those not already cached.
+
+        Args:
+            sentences: A text or list of texts.
+            batch_size: Batch size used for the texts that must be computed.
+            convert_to_tensor: Return a torch tensor instead of a numpy array.
+            **kwargs: Passed through to the wrapped encoder for cache misses.
+
+        Returns:
+            Embedding vector for a single text, or a matrix for a list of texts.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        kwargs.pop("convert_to_numpy", None)
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        self.hits += len(texts) - sum(1 for vector in vectors if vector is None)
+        if missing:
+            self.misses += len(missing)
+            computed = np.asarray(
+                self.model.encode(missing, batch_size=batch_size, convert_to_numpy=True, **kwargs),
+                dtype=np.float32
+            )
+            self.cache.put_many(missing, computed)
+            by_text = dict(zip(missing, computed))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+            self.logger.debug(f"Encoded {len(missing)} uncached texts out of {len(texts)}")
+
+        if vectors:
+            result = np.stack(vectors).astype(np.float32, copy=False)
+        else:
+            dim = self.cache.dim or self.model.get_sentence_embedding_dimension()
+            result = np.zeros((0, dim), dtype=np.float32)
+        if single:
+            result = result[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
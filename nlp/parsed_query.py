@@ -0,0 +1,167 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from nlp import spacy_registry
+
+def normalize_query(text: str) -> str:
+    """Lowercase a query, strip it and collapse internal whitespace."""
+    return re.sub(r'\s+', ' ', text.strip().lower())
+
+
+class ParsedQuery:
+    """Linguistic features of one query, extracted from a single spaCy parse.
+
+    Holds the per-token attributes every stage needs (text, lemma, stopword
+    and alphabetic masks, POS, entity type, language) together with noun
+    chunks and entities, so stages read these instead of re-parsing.
+    """
+
+    def __init__(self, text: str, doc):
+        """Extract features from a parsed Doc.
+
+        Args:
+            text: Normalized query text that was parsed.
+            doc: spaCy Doc for ``text``.
+        """
+        self.text = text
+        self.doc = doc
+        self.tokens: List[str] = [token.text for token in doc]
+        self.lemmas: List[str] = [token.lemma_ for token in doc]
+        self.is_stop: List[bool] = [token.is_stop for token in doc]
+        self.is_alpha: List[bool] = [token.is_alpha for token in doc]
+        self.pos: List[str] = [token.pos_ for token in doc]
+        self.ent_types: List[str] = [token.ent_type_ for token in doc]
+        self.langs: List[str] = [token.lang_ for token in doc]
+        try:
+            self.noun_chunks: List[str] = [chunk.text for chunk in doc.noun_chunks]
+        except (ValueError, NotImplementedError):
+            # Pipelines without a dependency parser cannot produce noun chunks
+            self.noun_chunks = []
+        self.entities: List[Tuple[str, str]] = [(ent.text, ent.label_) for ent in doc.ents]
+
+    @property
+    def content_tokens(self) -> List[str]:
+        """Tokens that are alphabetic and not stopwords."""
+        return [text for text, stop, alpha in zip(self.tokens, self.is_stop, self.is_alpha) if alpha and not stop]
+
+    @property
+    def has_noun_chunk(self) -> bool:
+        return bool(self.noun_chunks)
+
+    @property
+    def has_verb(self) -> bool:
+        return "VERB" in self.pos
+
+    def is_meaningful(self) -> bool:
+        """True if the query has a noun chunk or a verb."""
+        return self.has_noun_chunk or self.has_verb
+
+    def is_likely_english(self) -> bool:
+        """True if at least half of the alphabetic tokens are tagged as English."""
+        alpha = [lang for lang, is_alpha in zip(self.langs, self.is_alpha) if is_alpha]
+        return sum(1 for lang in alpha if lang == "en") >= len(alpha) * 0.5
+
+    def entity_types(self) -> List[str]:
+        """Distinct non-empty token entity types, in order of first appearance."""
+        return list(dict.fromkeys(ent for ent in self.ent_types if ent))
+
+
+class QueryParser:
+    """Parses queries with a shared spaCy pipeline, memoized in a small LRU.
+
+    Entries are keyed by normalized text, so the CLI validator, the relevance
+    gate, preprocessing and pattern matching all reuse one parse per query.
+    """
+
+    def __init__(self, model_name: str = "en_core_web_sm", max_size: int = 256):
+        """Initialize with the model to parse with and the LRU size.
+
+        Args:
+            model_name: spaCy model name resolved through the registry.
+            max_size: Maximum number of parsed queries kept.
+        """
+        self.nlp = spacy_registry.lazy(model_name)
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, ParsedQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, parsed: ParsedQuery):
+        with self._lock:
+            self._cache[key] = parsed
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[ParsedQuery]:
+        with self._lock:
+            parsed = self._cache.get(key)
+            if parsed is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return parsed
+
+    def parse(self, text: str) -> Optional[ParsedQuery]:
+        """Return the parse of a query, running spaCy only on an LRU miss.
+
+        Args:
+            text: Query text; it is normalized before parsing.
+
+        Returns:
+            ParsedQuery, or None if no spaCy model is available.
+        """
+        key = normalize_query(text)
+        parsed = self._lookup(key)
+        if parsed is not None:
+            return parsed
+        if not self.nlp:
+            return None
+        parsed = ParsedQuery(key, self.nlp(key))
+        self.misses += 1
+        self._remember(key, parsed)
+        return parsed
+
+    def parse_many(self, texts: Iterable[str], batch_size: int = 64) -> List[Optional[ParsedQuery]]:
+        """Parse several queries, sending all LRU misses through ``nlp.pipe`` at once.
+
+        Args:
+            texts: Query texts.
+            batch_size: Batch size passed to ``nlp.pipe``.
+
+        Returns:
+            List of ParsedQuery (or None if no model is available), aligned with ``texts``.
+        """
+        keys = [normalize_query(text) for text in texts]
+        found: Dict[str, ParsedQuery] = {}
+        for key in dict.fromkeys(keys):
+            parsed = self._lookup(key)
+            if parsed is not None:
+                found[key] = parsed
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.nlp:
+            for key, doc in zip(missing, self.nlp.pipe(missing, batch_size=batch_size)):
+                parsed = ParsedQuery(key, doc)
+                self.misses += 1
+                self._remember(key, parsed)
+                found[key] = parsed
+        return [found.get(key) for key in keys]
+
+    def clear(self):
+        """Drop all memoized parses."""
+        with self._lock:
+            self._cache.clear()
+
+
+_parsers: Dict[str, QueryParser] = {}
+_parsers_lock = threading.Lock()
+
+def get_parser(model_name: str = "en_core_web_sm") -> QueryParser:
+    """Return the process-wide QueryParser for a spaCy model."""
+    with _parsers_lock:
+        parser = _parsers.get(model_name)
+        if parser is None:
+            parser = QueryParser(model_name)
+            _parsers[model_name] = parser
+        return parser
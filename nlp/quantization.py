@@ -0,0 +1,125 @@
+import numpy as np
+from typing import Tuple
+
+# Compact codes for normalized embedding rows.
+#
+#   int8     one scale per row; the row is rounded to scale * codes with
+#            codes in [-127, 127], the scale picked per row from a few
+#            clipping ratios of the row's largest magnitude to minimize
+#            the reconstruction error
+#   float16  half-precision copy of the row (scale 1)
+#
+# Every row also records the norm of its reconstruction error. Scoring a
+# unit query against the codes is then off by at most that norm
+# (Cauchy-Schwarz), so a search can rank by the approximate scores, keep
+# every row whose bound overlaps the best ones, and rescore just those
+# against the float32 rows: the result is the same as an exact search.
+
+QUANTIZATIONS = {"int8": np.int8, "float16": np.float16}
+
+_INT8_CLIPS = (1.0, 0.9, 0.8, 0.7)
+_BLOCK_ROWS = 256
+# Covers float32 rounding in the approximate and the exact products
+_SLACK = 1e-4
+
+
+def code_dtype(mode: str) -> np.dtype:
+    """Storage dtype of a quantization mode.
+
+    Raises:
+        ValueError: If ``mode`` is not "int8" or "float16".
+    """
+    if mode not in QUANTIZATIONS:
+        raise ValueError(f"Unknown embedding quantization: {mode}")
+    return np.dtype(QUANTIZATIONS[mode])
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize row vectors.
+
+    Args:
+        vectors: Float32 rows, normally unit length.
+        mode: "int8" or "float16".
+
+    Returns:
+        Tuple: Codes with the dtype of ``mode``, and a float32 (rows, 2)
+        array of each row's scale and reconstruction error norm.
+    """
+    dtype = code_dtype(mode)
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.ones((len(vectors), 2), dtype=np.float32)
+    if dtype == np.float16:
+        codes = vectors.astype(np.float16)
+        scales[:, 1] = np.linalg.norm(vectors - codes.astype(np.float32), axis=1)
+        return codes, scales
+
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = vectors[start:start + _BLOCK_ROWS]
+        peaks = np.abs(block).max(axis=1) if block.size else np.zeros(len(block), dtype=np.float32)
+        peaks[peaks == 0] = 1.0
+        candidates = np.outer(_INT8_CLIPS, peaks / 127.0).astype(np.float32)
+        errors = np.stack([_int8_error(block, scale) for scale in candidates])
+        best = errors.argmin(axis=0)
+        scale = candidates[best, np.arange(len(block))]
+        codes[start:start + len(block)] = _int8_codes(block, scale)
+        scales[start:start + len(block), 0] = scale
+        scales[start:start + len(block), 1] = np.sqrt(errors[best, np.arange(len(block))])
+    return codes, scales
+
+
+def _int8_codes(block: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    codes = block / scale[:, None]
+    np.rint(codes, out=codes)
+    return np.clip(codes, -127, 127, out=codes)
+
+
+def _int8_error(block: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """Squared reconstruction error of each row at the given scales."""
+    residual = _int8_codes(block, scale)
+    residual *= scale[:, None]
+    residual -= block
+    return np.einsum("ij,ij->i", residual, residual)
+
+
+def approximate_scores(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Score unit queries against quantized rows.
+
+    Codes are widened to float32 a block of rows at a time, so only the
+    compact codes are streamed from memory. Products of int8 codes summed
+    in float32 are exact integer dot products at embedding sizes.
+
+    Args:
+        queries: (queries, dim) float32 matrix of unit (or zero) vectors.
+        codes: Row codes from ``quantize``.
+        scales: Row scales and error norms from ``quantize``.
+
+    Returns:
+        Tuple: (queries, rows) approximate scores, and the per-row bound
+        on their distance from the exact scores.
+    """
+    scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), _BLOCK_ROWS):
+        end = start + _BLOCK_ROWS
+        scores[:, start:end] = queries @ codes[start:end].astype(np.float32).T
+        scores[:, start:end] *= scales[start:end, 0]
+    return scores, scales[:, 1] + np.float32(_SLACK)
+
+
+def candidate_rows(scores: np.ndarray, bounds: np.ndarray, k: int) -> np.ndarray:
+    """Rows whose exact score may be among the ``k`` best.
+
+    Args:
+        scores: Approximate scores of one query.
+        bounds: Error bounds aligned with ``scores``.
+        k: Number of results wanted.
+
+    Returns:
+        np.ndarray: Row positions, a superset of the exact top ``k``.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    lower = scores - bounds
+    kth = np.partition(lower, len(lower) - k)[len(lower) - k]
+    return np.flatnonzero(scores + bounds >= kth)
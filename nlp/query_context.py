@@ -0,0 +1,70 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+from nlp.parsed_query import ParsedQuery, get_parser
+
+class QueryContext:
+    """Per-request state shared by the stages that handle one query.
+
+    Text variants and their embeddings are computed on first use and memoized,
+    so each distinct text goes through the encoder at most once per request even
+    when several stages (relevance gate, feedback lookup, table scoring, name
+    matching) ask for it. spaCy parses come from the shared QueryParser LRU.
+    """
+
+    def __init__(self, query: str):
+        """Initialize with the raw query text.
+
+        Args:
+            query: The query as entered by the user.
+        """
+        self.query = query
+        self.preprocessed: Optional[str] = None
+        self._lower: Optional[str] = None
+        self._embeddings: Dict[Tuple[str, str], np.ndarray] = {}
+
+    @property
+    def lower(self) -> str:
+        """Lowercased, stripped query text."""
+        if self._lower is None:
+            self._lower = self.query.strip().lower()
+        return self._lower
+
+    @staticmethod
+    def _model_key(embedder) -> str:
+        return getattr(embedder, "model_name", None) or f"embedder-{id(embedder)}"
+
+    def encode(self, embedder, text: Optional[str] = None) -> np.ndarray:
+        """Return the embedding of a text variant, encoding it only once.
+
+        Embedders wrapping the same model share memoized vectors.
+
+        Args:
+            embedder: Encoder exposing ``encode(texts)``.
+            text: Text variant to encode; defaults to the raw query.
+
+        Returns:
+            np.ndarray: Embedding vector.
+        """
+        text = self.query if text is None else text
+        key = (self._model_key(embedder), text)
+        embedding = self._embeddings.get(key)
+        if embedding is None:
+            embedding = np.asarray(embedder.encode([text])[0], dtype=np.float32)
+            self._embeddings[key] = embedding
+        return embedding
+
+    def prime(self, embedder, text: str, embedding: np.ndarray):
+        """Record an embedding computed elsewhere, e.g. by a batched encode."""
+        self._embeddings[(self._model_key(embedder), text)] = np.asarray(embedding, dtype=np.float32)
+
+    def parse(self, text: Optional[str] = None) -> Optional[ParsedQuery]:
+        """Return the shared spaCy parse of a text variant (defaults to the raw query).
+
+        Returns:
+            ParsedQuery, or None if no spaCy model is available.
+        """
+        return get_parser().parse(self.query if text is None else text)
+
+    def encode_count(self) -> int:
+        """Number of distinct texts encoded for this request."""
+        return len(self._embeddings)
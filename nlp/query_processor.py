@@ -1,6 +1,8 @@
 import logging
-import spacy
+from nlp import spacy_registry
 from typing import List, Tuple
+from nlp.query_context import QueryContext
+from analysis import tracing
 
 class QueryProcessor:
     """Processes natural language queries for database table identification."""
@@ -13,20 +15,18 @@ class QueryProcessor:
         """
         self.logger = logging.getLogger("query_processor")
         self.table_identifier = table_identifier
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except Exception as e:
-            self.logger.error(f"Failed to load spacy model: {e}")
-            self.nlp = None
+        self.nlp = spacy_registry.lazy("en_core_web_sm")
         self.logger.debug("Initialized QueryProcessor")
 
-    def preprocess_query(self, query: str) -> str:
+    @tracing.traced("preprocess_query")
+    def preprocess_query(self, query: str, context: QueryContext = None) -> str:
         """Preprocess the query for analysis.
 
         Validates query relevance and language using spacy.
 
         Args:
             query: The query string.
+            context: Per-request context providing the shared parse.
 
         Returns:
             str: Preprocessed query or empty string if invalid.
@@ -41,27 +41,26 @@ class QueryProcessor:
             query = query.strip().lower()
 
             # Semantic validation with spacy
-            if not self.nlp:
+            if context is None:
+                context = QueryContext(query)
+            parsed = context.parse(query) if self.nlp else None
+            if parsed is None:
                 self.logger.warning("Spacy model not loaded, skipping semantic validation")
                 return query
 
-            doc = self.nlp(query)
             # Check for meaningful structure
-            has_noun_chunk = any(chunk for chunk in doc.noun_chunks)
-            has_verb = any(token.pos_ == "VERB" for token in doc)
-            if not (has_noun_chunk or has_verb):
+            if not parsed.is_meaningful():
                 self.logger.warning(f"Query lacks meaningful structure: {query}")
                 return ""
 
             # Check if query is likely English
             # Count English-like tokens (basic heuristic)
-            english_tokens = sum(1 for token in doc if token.is_alpha and token.lang_ == "en")
-            if english_tokens < len([token for token in doc if token.is_alpha]) * 0.5:
+            if not parsed.is_likely_english():
                 self.logger.warning(f"Query may not be in English: {query}")
                 return ""
 
             # Remove stop words and non-alphabetic tokens
-            query_tokens = [token.text for token in doc if not token.is_stop and token.is_alpha]
+            query_tokens = parsed.content_tokens
             preprocessed = " ".join(query_tokens)
             self.logger.debug(f"Preprocessed query: {preprocessed}")
             return preprocessed
@@ -69,25 +68,80 @@ class QueryProcessor:
             self.logger.error(f"Error preprocessing query: {e}")
             return ""
 
-    def process_query(self, query: str) -> Tuple[List[str], float]:
+    def process_query(self, query: str, context: QueryContext = None) -> Tuple[List[str], float]:
         """Process a natural language query to identify relevant tables.
 
         Args:
             query: The query string.
+            context: Per-request context shared with downstream stages.
 
         Returns:
             Tuple: List of table names and confidence score.
         """
         self.logger.debug(f"Processing query: {query}")
         try:
-            preprocessed = self.preprocess_query(query)
+            if context is None:
+                context = QueryContext(query)
+            preprocessed = self.preprocess_query(query, context)
             if not preprocessed:
                 self.logger.warning(f"Invalid query after preprocessing: {query}")
                 return [], 0.0
 
-            tables, confidence = self.table_identifier.identify_tables(preprocessed)
+            context.preprocessed = preprocessed
+            tables, confidence = self.table_identifier.identify_tables(preprocessed, context)
             self.logger.debug(f"Identified tables: {tables}, confidence: {confidence}")
             return tables, confidence
         except Exception as e:
             self.logger.error(f"Error processing query: {e}")
+            return [], 0.0
+
+    def process_queries(self, queries: List[str], contexts: List[QueryContext] = None) -> List[Tuple[List[str], float]]:
+        """Process several queries, identifying tables for all of them in one batch.
+
+        A query that fails yields ``([], 0.0)`` without affecting the others.
+
+        Args:
+            queries: Query strings.
+            contexts: Per-request contexts aligned with ``queries``.
+
+        Returns:
+            List of (tables, confidence) tuples aligned with ``queries``.
+        """
+        self.logger.debug(f"Processing batch of {len(queries)} queries")
+        if contexts is None:
+            contexts = [QueryContext(query) for query in queries]
+        results = [([], 0.0)] * len(queries)
+        pending = []
+        for i, (query, context) in enumerate(zip(queries, contexts)):
+            try:
+                preprocessed = context.preprocessed
+                if preprocessed is None:
+                    preprocessed = self.preprocess_query(query, context)
+            except Exception as e:
+                self.logger.error(f"Error preprocessing query {query!r}: {e}")
+                continue
+            if not preprocessed:
+                self.logger.warning(f"Invalid query after preprocessing: {query}")
+                continue
+            context.preprocessed = preprocessed
+            pending.append(i)
+
+        try:
+            identified = self.table_identifier.identify_tables_many(
+                [contexts[i].preprocessed for i in pending],
+                [contexts[i] for i in pending]
+            )
+        except Exception as e:
+            self.logger.error(f"Error processing query batch, identifying queries individually: {e}")
+            identified = [self._identify(contexts[i]) for i in pending]
+        for i, result in zip(pending, identified):
+            results[i] = result
+        return results
+
+    def _identify(self, context: QueryContext) -> Tuple[List[str], float]:
+        """``identify_tables`` for one preprocessed query, ``([], 0.0)`` if it fails."""
+        try:
+            return self.table_identifier.identify_tables(context.preprocessed, context)
+        except Exception as e:
+            self.logger.error(f"Error processing query {context.query!r}: {e}")
             return [], 0.0
\ No newline at end of file
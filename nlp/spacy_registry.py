@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+import spacy
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger("spacy_registry")
+
+_models: Dict[Tuple, Optional[spacy.language.Language]] = {}
+_stats: Dict[Tuple, Dict] = {}
+_locks: Dict[Tuple, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+def _key(name: str, disable: Iterable[str] = (), exclude: Iterable[str] = ()) -> Tuple:
+    return (name, tuple(sorted(disable)), tuple(sorted(exclude)))
+
+def _describe(key: Tuple) -> str:
+    name, disable, exclude = key
+    parts = [name]
+    if disable:
+        parts.append(f"disable={','.join(disable)}")
+    if exclude:
+        parts.append(f"exclude={','.join(exclude)}")
+    return " ".join(parts)
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, if it can be determined."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def get_nlp(name: str = "en_core_web_sm", disable: Iterable[str] = (),
+            exclude: Iterable[str] = ()) -> Optional[spacy.language.Language]:
+    """Return the shared spaCy pipeline for a model and pipe configuration.
+
+    The model is loaded on first request and reused by every later caller.
+    Concurrent first requests for the same configuration wait for a single
+    load. A failed load is remembered and returns None without retrying.
+
+    Args:
+        name: spaCy model package name.
+        disable: Pipes to disable.
+        exclude: Pipes to exclude.
+
+    Returns:
+        Language: The loaded pipeline, or None if it could not be loaded.
+    """
+    key = _key(name, disable, exclude)
+    if key in _models:
+        return _models[key]
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _models:
+            return _models[key]
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            model = spacy.load(name, disable=list(key[1]), exclude=list(key[2]))
+        except Exception as e:
+            logger.error(f"Failed to load spacy model {_describe(key)}: {e}")
+            model = None
+        elapsed = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        _stats[key] = {
+            "model": _describe(key),
+            "loaded": model is not None,
+            "load_seconds": elapsed,
+            "rss_delta_bytes": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+        }
+        _models[key] = model
+        if model is not None:
+            logger.info(f"Loaded spacy model {_describe(key)} in {elapsed:.2f}s")
+        return model
+
+def register_model(name: str, model, disable: Iterable[str] = (), exclude: Iterable[str] = ()):
+    """Install a ready-made pipeline under a model name, e.g. a blank pipeline for offline use.
+
+    Args:
+        name: Model name callers request.
+        model: Pipeline to return for that name and configuration.
+        disable: Pipe configuration the pipeline is registered for.
+        exclude: Pipe configuration the pipeline is registered for.
+    """
+    key = _key(name, disable, exclude)
+    with _registry_lock:
+        _models[key] = model
+        _stats[key] = {"model": _describe(key), "loaded": model is not None,
+                       "load_seconds": 0.0, "rss_delta_bytes": None}
+
+def model_stats() -> Dict[str, Dict]:
+    """Load time and memory growth recorded for each requested model configuration."""
+    with _registry_lock:
+        return {stats["model"]: dict(stats) for stats in _stats.values()}
+
+def clear():
+    """Forget all loaded pipelines."""
+    with _registry_lock:
+        _models.clear()
+        _stats.clear()
+        _locks.clear()
+
+
+class LazyNLP:
+    """Stand-in for a spaCy pipeline that resolves it from the registry on first use.
+
+    Truth-testing reports whether the model is available, so existing
+    ``if not self.nlp`` checks keep working; calls and attribute access are
+    forwarded to the shared pipeline.
+    """
+
+    def __init__(self, name: str = "en_core_web_sm", disable: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.name = name
+        self.disable = tuple(disable)
+        self.exclude = tuple(exclude)
+
+    def resolve(self) -> Optional[spacy.language.Language]:
+        """Return the shared pipeline, loading it if needed."""
+        return get_nlp(self.name, self.disable, self.exclude)
+
+    def __bool__(self) -> bool:
+        return self.resolve() is not None
+
+    def __call__(self, text: str, *args, **kwargs):
+        model = self.resolve()
+        if model is None:
+            raise RuntimeError(f"spacy model {self.name} is not available")
+        return model(text, *args, **kwargs)
+
+    def __getattr__(self, attr):
+        model = self.resolve()
+        if model is None:
+            raise AttributeError(attr)
+        return getattr(model, attr)
+
+def lazy(name: str = "en_core_web_sm", disable: Iterable[str] = (), exclude: Iterable[str] = ()) -> LazyNLP:
+    """Return a LazyNLP handle for a model configuration."""
+    return LazyNLP(name, disable, exclude)
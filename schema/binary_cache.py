@@ -0,0 +1,407 @@
+import hashlib
+import logging
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Binary schema cache layout (all integers little-endian):
+#
+#   header    magic, format version, flags, sha256 of everything after the
+#             header, offsets of the string table and the section index
+#   sections  one u32 stream per schema (tables, views, columns, indexes,
+#             foreign keys), strings referenced by id
+#   strings   u32 count, u32 byte offsets (count + 1), UTF-8 blob
+#   index     per schema: name id, section offset, length, kind mask
+#
+# Readers decode the header and index only; a schema's section is decoded
+# the first time any of its entries is accessed.
+
+MAGIC = b"TISC"
+FORMAT_VERSION = 1
+FLAG_VALIDATED = 1
+NONE_ID = 0xFFFFFFFF
+KINDS = ("tables", "views", "columns", "indexes", "foreign_keys")
+KIND_BITS = {kind: 1 << i for i, kind in enumerate(KINDS)}
+
+_HEADER = struct.Struct("<4sHH32sQQI")
+_INDEX_ENTRY = struct.Struct("<IQQI")
+_COLUMN_FLAGS = (("nullable", 1), ("is_primary_key", 2), ("is_foreign_key", 4))
+_FLAG_VALUES = tuple(tuple(bool(flags & bit) for _, bit in _COLUMN_FLAGS) for flags in range(8))
+
+
+class CacheFormatError(ValueError):
+    """Raised when a file is not a readable binary schema cache."""
+
+
+def _u32_bytes(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array("I", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _u32_array(data) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class _StringTable:
+    """Assigns ids to distinct strings while sections are encoded."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def id(self, value) -> int:
+        if value is None:
+            return NONE_ID
+        value = str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def encode(self) -> bytes:
+        blobs = [value.encode("utf-8") for value in self.strings]
+        offsets = array("I", [0])
+        total = 0
+        for blob in blobs:
+            total += len(blob)
+            offsets.append(total)
+        return _u32_bytes(array("I", [len(blobs)])) + _u32_bytes(offsets) + b"".join(blobs)
+
+
+def _encode_section(schema_dict: Mapping, schema: str, strings: _StringTable) -> Tuple[bytes, int]:
+    """Encode every kind of entry for one schema; returns the bytes and kind mask."""
+    out = array("I")
+    mask = 0
+
+    for kind in ("tables", "views"):
+        names = schema_dict.get(kind, {}).get(schema) or []
+        if names:
+            mask |= KIND_BITS[kind]
+        out.append(len(names))
+        out.extend(strings.id(name) for name in names)
+
+    columns = schema_dict.get("columns", {}).get(schema) or {}
+    if columns:
+        mask |= KIND_BITS["columns"]
+    out.append(len(columns))
+    for table, table_columns in columns.items():
+        out.append(strings.id(table))
+        out.append(len(table_columns))
+        for column, info in table_columns.items():
+            flags = 0
+            for key, bit in _COLUMN_FLAGS:
+                if info.get(key):
+                    flags |= bit
+            out.extend((strings.id(column), strings.id(info.get("type")), strings.id(info.get("default")), flags))
+
+    indexes = schema_dict.get("indexes", {}).get(schema) or {}
+    if indexes:
+        mask |= KIND_BITS["indexes"]
+    out.append(len(indexes))
+    for table, entries in indexes.items():
+        out.append(strings.id(table))
+        out.append(len(entries))
+        for entry in entries:
+            out.extend((strings.id(entry.get("index_name")), strings.id(entry.get("column"))))
+
+    foreign_keys = schema_dict.get("foreign_keys", {}).get(schema) or {}
+    if foreign_keys:
+        mask |= KIND_BITS["foreign_keys"]
+    out.append(len(foreign_keys))
+    for table, entries in foreign_keys.items():
+        out.append(strings.id(table))
+        out.append(len(entries))
+        for entry in entries:
+            out.extend((strings.id(entry.get("column")), strings.id(entry.get("referenced_table")),
+                        strings.id(entry.get("referenced_column"))))
+
+    return _u32_bytes(out), mask
+
+
+def read_header(path: str) -> Optional[Tuple[int, int, bytes]]:
+    """Format version, flags and content hash of a cache file, or None if unreadable."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(_HEADER.size)
+        magic, version, flags, digest, _, _, _ = _HEADER.unpack(raw)
+        return (version, flags, digest) if magic == MAGIC else None
+    except (OSError, struct.error):
+        return None
+
+
+def write_binary_schema(schema_dict: Mapping, path: str, validated: bool = False) -> bytes:
+    """Write a schema dictionary as a binary cache, atomically.
+
+    Sections are encoded and hashed one schema at a time. If the file
+    already holds identical content only its mtime is updated.
+
+    Args:
+        schema_dict: Schema dictionary (plain or lazily loaded).
+        path: Cache file to write.
+        validated: Record that the content passed schema validation.
+
+    Returns:
+        bytes: SHA-256 content hash.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    schemas = list(dict.fromkeys(
+        schema for kind in KINDS for schema in schema_dict.get(kind, {})
+    ))
+    flags = FLAG_VALIDATED if validated else 0
+    strings = _StringTable()
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schema-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            offset = _HEADER.size
+            index = []
+            for schema in schemas:
+                name_id = strings.id(schema)
+                data, mask = _encode_section(schema_dict, schema, strings)
+                f.write(data)
+                digest.update(data)
+                index.append((name_id, offset, len(data), mask))
+                offset += len(data)
+
+            string_offset = offset
+            data = strings.encode()
+            f.write(data)
+            digest.update(data)
+            index_offset = string_offset + len(data)
+            data = b"".join(_INDEX_ENTRY.pack(*entry) for entry in index)
+            f.write(data)
+            digest.update(data)
+
+            content_hash = digest.digest()
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, flags, content_hash, string_offset, index_offset, len(index)))
+
+        existing = read_header(path)
+        if existing == (FORMAT_VERSION, flags, content_hash):
+            os.unlink(tmp_path)
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+        return content_hash
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class BinarySchemaCache:
+    """An opened binary schema cache.
+
+    Only the header, section index and string offsets are read up front.
+    Strings are decoded (and interned) on first reference, and each schema's
+    section on first access through the mappings returned by ``schema_dict``.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        """Open a cache file.
+
+        Args:
+            path: Cache file.
+            verify: Check the content hash against the header.
+
+        Raises:
+            CacheFormatError: If the file is not a cache of this format version or is corrupt.
+        """
+        self.logger = logging.getLogger("schema")
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = memoryview(f.read())
+        if len(self._data) < _HEADER.size:
+            raise CacheFormatError(f"{path} is too short to be a schema cache")
+        magic, version, self.flags, self.content_hash, string_offset, index_offset, count = \
+            _HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise CacheFormatError(f"{path} is not a binary schema cache")
+        if version != FORMAT_VERSION:
+            raise CacheFormatError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        if verify and hashlib.sha256(self._data[_HEADER.size:]).digest() != self.content_hash:
+            raise CacheFormatError(f"{path} failed its content hash check")
+
+        (string_count,) = struct.unpack_from("<I", self._data, string_offset)
+        self._string_offsets = _u32_array(self._data[string_offset + 4:string_offset + 8 + 4 * string_count])
+        self._blob_offset = string_offset + 8 + 4 * string_count
+        self._strings: List[Optional[str]] = [None] * string_count
+        self._all_strings: Optional[Dict[int, Optional[str]]] = None
+
+        self.index: Dict[str, Tuple[int, int, int]] = {}
+        for name_id, offset, length, mask in _INDEX_ENTRY.iter_unpack(
+                self._data[index_offset:index_offset + count * _INDEX_ENTRY.size]):
+            self.index[self.string(name_id)] = (offset, length, mask)
+        self._sections: Dict[str, Dict] = {}
+
+    @property
+    def validated(self) -> bool:
+        """True if the content passed schema validation before it was written."""
+        return bool(self.flags & FLAG_VALIDATED)
+
+    def string(self, string_id: int) -> Optional[str]:
+        """Decode one string from the string table."""
+        if string_id == NONE_ID:
+            return None
+        value = self._strings[string_id]
+        if value is None:
+            start = self._blob_offset + self._string_offsets[string_id]
+            end = self._blob_offset + self._string_offsets[string_id + 1]
+            value = self._strings[string_id] = sys.intern(bytes(self._data[start:end]).decode("utf-8"))
+        return value
+
+    def _lookup(self) -> Dict[int, Optional[str]]:
+        """String id -> string for the whole table, decoded on first section access."""
+        if self._all_strings is None:
+            lookup = {NONE_ID: None}
+            for string_id in range(len(self._strings)):
+                lookup[string_id] = self.string(string_id)
+            self._all_strings = lookup
+        return self._all_strings
+
+    def section(self, schema: str) -> Dict:
+        """Decode (once) every kind of entry for one schema."""
+        section = self._sections.get(schema)
+        if section is not None:
+            return section
+        offset, length, _ = self.index[schema]
+        values = _u32_array(self._data[offset:offset + length]).tolist()
+        string = self._lookup()
+        section = {}
+        pos = 0
+        for kind in ("tables", "views"):
+            count = values[pos]
+            section[kind] = [string[i] for i in values[pos + 1:pos + 1 + count]]
+            pos += 1 + count
+
+        columns = {}
+        pos += 1
+        for _ in range(values[pos - 1]):
+            table, count = string[values[pos]], values[pos + 1]
+            pos += 2
+            table_columns = columns[table] = {}
+            for _ in range(count):
+                nullable, primary, foreign = _FLAG_VALUES[values[pos + 3]]
+                table_columns[string[values[pos]]] = {
+                    "type": string[values[pos + 1]],
+                    "nullable": nullable,
+                    "default": string[values[pos + 2]],
+                    "is_primary_key": primary,
+                    "is_foreign_key": foreign
+                }
+                pos += 4
+        section["columns"] = columns
+
+        indexes = {}
+        pos += 1
+        for _ in range(values[pos - 1]):
+            table, count = string[values[pos]], values[pos + 1]
+            pos += 2
+            indexes[table] = [
+                {"index_name": string[values[i]], "column": string[values[i + 1]]}
+                for i in range(pos, pos + 2 * count, 2)
+            ]
+            pos += 2 * count
+        section["indexes"] = indexes
+
+        foreign_keys = {}
+        pos += 1
+        for _ in range(values[pos - 1]):
+            table, count = string[values[pos]], values[pos + 1]
+            pos += 2
+            foreign_keys[table] = [
+                {"column": string[values[i]], "referenced_table": string[values[i + 1]],
+                 "referenced_column": string[values[i + 2]]}
+                for i in range(pos, pos + 3 * count, 3)
+            ]
+            pos += 3 * count
+        section["foreign_keys"] = foreign_keys
+
+        self._sections[schema] = section
+        return section
+
+    def schema_dict(self) -> Dict:
+        """Schema dictionary whose per-kind mappings decode schemas on demand."""
+        schema_dict = {kind: LazySchemaMapping(self, kind) for kind in ("tables", "columns", "indexes", "foreign_keys", "views")}
+        schema_dict["version"] = "1.0"
+        return schema_dict
+
+
+class LazySchemaMapping(MutableMapping):
+    """Schema name -> entries of one kind, decoded from the cache on first access.
+
+    Supports the same in-place updates as the plain dictionaries it stands
+    in for; assigned values simply replace the cached section's.
+    """
+
+    def __init__(self, cache: BinarySchemaCache, kind: str):
+        self._cache = cache
+        self._kind = kind
+        bit = KIND_BITS[kind]
+        self._keys = dict.fromkeys(schema for schema, (_, _, mask) in cache.index.items() if mask & bit)
+        self._values: Dict[str, object] = {}
+
+    def __getitem__(self, schema: str):
+        value = self._values.get(schema)
+        if value is None:
+            if schema not in self._keys:
+                raise KeyError(schema)
+            value = self._values[schema] = self._cache.section(schema)[self._kind]
+        return value
+
+    def __setitem__(self, schema: str, value):
+        self._keys[schema] = None
+        self._values[schema] = value
+
+    def __delitem__(self, schema: str):
+        del self._keys[schema]
+        self._values.pop(schema, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, schema) -> bool:
+        return schema in self._keys
+
+    def __repr__(self) -> str:
+        return f"LazySchemaMapping({self._kind}, {len(self._keys)} schemas, {len(self._values)} loaded)"
+
+
+def to_plain(value):
+    """Convert lazily loaded mappings (recursively) to plain dicts, e.g. for JSON export."""
+    if isinstance(value, Mapping):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+
+if __name__ == "__main__":
+    # Export a binary cache as JSON for inspection:
+    #   python -m schema.binary_cache schema_cache/<db>/schema.bin [out.json]
+    import json
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m schema.binary_cache <schema.bin> [output.json]")
+        sys.exit(2)
+    exported = to_plain(BinarySchemaCache(sys.argv[1]).schema_dict())
+    if len(sys.argv) == 3:
+        with open(sys.argv[2], "w") as f:
+            json.dump(exported, f, indent=2)
+    else:
+        json.dump(exported, sys.stdout, indent=2)
@@ -0,0 +1,559 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SECTIONS = ("tables", "columns", "indexes", "foreign_keys", "views")
+
+# Portable queries, also the fallback when a dialect query is refused
+INFORMATION_SCHEMA_QUERIES = {
+    "tables": """
+        SELECT table_schema, table_name
+        FROM information_schema.tables
+        WHERE table_type = 'BASE TABLE'
+        AND table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
+    """,
+    "columns": """
+        SELECT c.table_schema, c.table_name, c.column_name, c.data_type,
+               c.is_nullable, c.column_default,
+               CASE
+                   WHEN pk.constraint_type = 'PRIMARY KEY' THEN 'PRIMARY KEY'
+                   WHEN fk.constraint_type = 'FOREIGN KEY' THEN 'FOREIGN KEY'
+                   ELSE NULL
+               END as constraint_type
+        FROM information_schema.columns c
+        LEFT JOIN (
+            SELECT kcu.table_schema, kcu.table_name, kcu.column_name, tc.constraint_type
+            FROM information_schema.key_column_usage kcu
+            JOIN information_schema.table_constraints tc
+            ON kcu.constraint_name = tc.constraint_name
+            WHERE tc.constraint_type = 'PRIMARY KEY'
+        ) pk ON c.table_schema = pk.table_schema
+        AND c.table_name = pk.table_name
+        AND c.column_name = pk.column_name
+        LEFT JOIN (
+            SELECT kcu.table_schema, kcu.table_name, kcu.column_name, tc.constraint_type
+            FROM information_schema.key_column_usage kcu
+            JOIN information_schema.table_constraints tc
+            ON kcu.constraint_name = tc.constraint_name
+            WHERE tc.constraint_type = 'FOREIGN KEY'
+        ) fk ON c.table_schema = fk.table_schema
+        AND c.table_name = fk.table_name
+        AND c.column_name = fk.column_name
+        WHERE c.table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
+    """,
+    "indexes": """
+        SELECT table_schema, table_name, index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
+    """,
+    "foreign_keys": """
+        SELECT tc.table_schema, tc.table_name, kcu.column_name,
+               ccu.table_schema AS ref_schema, ccu.table_name AS ref_table,
+               ccu.column_name AS ref_column
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+        ON tc.constraint_name = kcu.constraint_name
+        JOIN information_schema.constraint_column_usage ccu
+        ON tc.constraint_name = ccu.constraint_name
+        WHERE tc.constraint_type = 'FOREIGN KEY'
+        AND tc.table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
+    """,
+    "views": """
+        SELECT table_schema, table_name
+        FROM information_schema.views
+        WHERE table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
+    """
+}
+
+# Single-pass catalog queries; key flags come from correlated lookups on the
+# catalog's own key structures instead of joins over information_schema views.
+# Column types are reported as their base system type (TYPE_NAME of
+# system_type_id), as information_schema.columns.DATA_TYPE does: alias types
+# such as AdventureWorks' Name, Flag or Phone must not reach the cache, or the
+# temporal/numeric/monetary column classes stop matching
+SQLSERVER_QUERIES = {
+    "tables": """
+        SELECT s.name, t.name
+        FROM sys.tables t
+        JOIN sys.schemas s ON s.schema_id = t.schema_id
+        WHERE t.is_ms_shipped = 0 AND s.name NOT IN ('information_schema', 'sys') /*tables*/
+    """,
+    "columns": """
+        SELECT s.name, o.name, c.name, TYPE_NAME(c.system_type_id), c.is_nullable, dc.definition,
+               CASE
+                   WHEN EXISTS (
+                       SELECT 1 FROM sys.indexes i
+                       JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+                       WHERE i.object_id = c.object_id AND i.is_primary_key = 1 AND ic.column_id = c.column_id
+                   ) THEN 'PRIMARY KEY'
+                   WHEN EXISTS (
+                       SELECT 1 FROM sys.foreign_key_columns fkc
+                       WHERE fkc.parent_object_id = c.object_id AND fkc.parent_column_id = c.column_id
+                   ) THEN 'FOREIGN KEY'
+                   ELSE NULL
+               END
+        FROM sys.columns c
+        JOIN sys.objects o ON o.object_id = c.object_id AND o.type IN ('U', 'V')
+        JOIN sys.schemas s ON s.schema_id = o.schema_id
+        LEFT JOIN sys.default_constraints dc ON dc.object_id = c.default_object_id
+        WHERE o.is_ms_shipped = 0 AND s.name NOT IN ('information_schema', 'sys') /*tables*/
+        ORDER BY s.name, o.name, c.column_id
+    """,
+    "indexes": """
+        SELECT schema_name(t.schema_id) AS table_schema,
+               t.name AS table_name,
+               i.name AS index_name,
+               c.name AS column_name
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+        JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+        JOIN sys.tables t ON i.object_id = t.object_id
+        WHERE schema_name(t.schema_id) NOT IN ('information_schema', 'sys') /*tables*/
+    """,
+    "foreign_keys": """
+        SELECT ps.name, pt.name, pc.name, rs.name, rt.name, rc.name
+        FROM sys.foreign_key_columns fkc
+        JOIN sys.tables pt ON pt.object_id = fkc.parent_object_id
+        JOIN sys.schemas ps ON ps.schema_id = pt.schema_id
+        JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id
+        JOIN sys.tables rt ON rt.object_id = fkc.referenced_object_id
+        JOIN sys.schemas rs ON rs.schema_id = rt.schema_id
+        JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+        WHERE ps.name NOT IN ('information_schema', 'sys') /*tables*/
+    """,
+    "views": """
+        SELECT s.name, v.name
+        FROM sys.views v
+        JOIN sys.schemas s ON s.schema_id = v.schema_id
+        WHERE v.is_ms_shipped = 0 AND s.name NOT IN ('information_schema', 'sys')
+    """
+}
+
+POSTGRESQL_QUERIES = {
+    "tables": """
+        SELECT n.nspname, c.relname
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog') AND n.nspname NOT LIKE 'pg_toast%' /*tables*/
+    """,
+    "columns": """
+        SELECT n.nspname, c.relname, a.attname, pg_catalog.format_type(a.atttypid, NULL),
+               NOT a.attnotnull, pg_catalog.pg_get_expr(d.adbin, d.adrelid),
+               CASE
+                   WHEN EXISTS (
+                       SELECT 1 FROM pg_catalog.pg_constraint k
+                       WHERE k.conrelid = c.oid AND k.contype = 'p' AND a.attnum = ANY(k.conkey)
+                   ) THEN 'PRIMARY KEY'
+                   WHEN EXISTS (
+                       SELECT 1 FROM pg_catalog.pg_constraint k
+                       WHERE k.conrelid = c.oid AND k.contype = 'f' AND a.attnum = ANY(k.conkey)
+                   ) THEN 'FOREIGN KEY'
+                   ELSE NULL
+               END
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attnum > 0 AND NOT a.attisdropped AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog') AND n.nspname NOT LIKE 'pg_toast%' /*tables*/
+        ORDER BY n.nspname, c.relname, a.attnum
+    """,
+    "indexes": """
+        SELECT n.nspname AS table_schema,
+               t.relname AS table_name,
+               i.relname AS index_name,
+               a.attname AS column_name
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(ix.indkey)
+        WHERE n.nspname NOT IN ('information_schema', 'pg_catalog') /*tables*/
+    """,
+    "foreign_keys": """
+        SELECT n.nspname, c.relname, a.attname, rn.nspname, rc.relname, ra.attname
+        FROM pg_catalog.pg_constraint k
+        CROSS JOIN LATERAL unnest(k.conkey, k.confkey) AS key(attnum, ref_attnum)
+        JOIN pg_catalog.pg_class c ON c.oid = k.conrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = k.conrelid AND a.attnum = key.attnum
+        JOIN pg_catalog.pg_class rc ON rc.oid = k.confrelid
+        JOIN pg_catalog.pg_namespace rn ON rn.oid = rc.relnamespace
+        JOIN pg_catalog.pg_attribute ra ON ra.attrelid = k.confrelid AND ra.attnum = key.ref_attnum
+        WHERE k.contype = 'f' AND n.nspname NOT IN ('information_schema', 'pg_catalog') /*tables*/
+    """,
+    "views": """
+        SELECT n.nspname, c.relname
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('v', 'm') AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+    """
+}
+
+DIALECT_QUERIES = {
+    "sqlserver": SQLSERVER_QUERIES,
+    "postgresql": POSTGRESQL_QUERIES,
+    "generic": INFORMATION_SCHEMA_QUERIES
+}
+
+# Per-table version tokens: any DDL on a table changes its token
+TABLE_VERSION_QUERIES = {
+    "sqlserver": """
+        SELECT s.name, o.name, CONVERT(varchar(33), o.modify_date, 126)
+        FROM sys.objects o
+        JOIN sys.schemas s ON s.schema_id = o.schema_id
+        WHERE o.type = 'U' AND o.is_ms_shipped = 0 AND s.name NOT IN ('information_schema', 'sys')
+    """,
+    # PostgreSQL keeps no DDL timestamps; hash the column and constraint definitions instead
+    "postgresql": """
+        SELECT n.nspname, c.relname, md5(
+            coalesce((SELECT string_agg(a.attname || ':' || a.atttypid || ':' || a.attnotnull, ',' ORDER BY a.attnum)
+                      FROM pg_catalog.pg_attribute a
+                      WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped), '') || '|' ||
+            coalesce((SELECT string_agg(k.conname || ':' || k.contype || ':' || k.conkey::text || ':' || k.confrelid,
+                                        ',' ORDER BY k.conname)
+                      FROM pg_catalog.pg_constraint k WHERE k.conrelid = c.oid), '') || '|' ||
+            coalesce((SELECT string_agg(i.indexrelid::text || ':' || i.indkey::text, ',' ORDER BY i.indexrelid)
+                      FROM pg_catalog.pg_index i WHERE i.indrelid = c.oid), '')
+        )
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition
+        AND n.nspname NOT IN ('information_schema', 'pg_catalog') AND n.nspname NOT LIKE 'pg_toast%'
+    """
+}
+
+# Views are not refreshed one by one; a change to any view definition makes
+# the next refresh a full build
+VIEW_VERSION_QUERIES = {
+    "sqlserver": """
+        SELECT s.name, v.name, CONVERT(varchar(33), v.modify_date, 126)
+        FROM sys.views v
+        JOIN sys.schemas s ON s.schema_id = v.schema_id
+        WHERE v.is_ms_shipped = 0 AND s.name NOT IN ('information_schema', 'sys')
+    """,
+    "postgresql": """
+        SELECT n.nspname, c.relname, md5(pg_catalog.pg_get_viewdef(c.oid))
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('v', 'm') AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+    """
+}
+
+# SQL expression giving the ``schema.table`` of each row, substituted for the
+# /*tables*/ marker to restrict a section query to some tables
+TABLE_KEYS = {
+    "sqlserver": {
+        "tables": "s.name + '.' + t.name",
+        "columns": "s.name + '.' + o.name",
+        "indexes": "schema_name(t.schema_id) + '.' + t.name",
+        "foreign_keys": "ps.name + '.' + pt.name"
+    },
+    "postgresql": {
+        "tables": "n.nspname || '.' || c.relname",
+        "columns": "n.nspname || '.' || c.relname",
+        "indexes": "n.nspname || '.' || t.relname",
+        "foreign_keys": "n.nspname || '.' || c.relname"
+    }
+}
+
+TABLE_SECTIONS = ("tables", "columns", "indexes", "foreign_keys")
+TABLE_MARKER = "/*tables*/"
+
+
+def empty_schema() -> Dict:
+    """Empty schema dictionary in the layout SchemaManager caches."""
+    return {
+        "tables": defaultdict(list),
+        "columns": defaultdict(lambda: defaultdict(dict)),
+        "indexes": defaultdict(lambda: defaultdict(list)),
+        "foreign_keys": defaultdict(lambda: defaultdict(list)),
+        "views": defaultdict(list),
+        "version": "1.0"
+    }
+
+
+def _is_true(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().upper() in ("YES", "Y", "TRUE", "1")
+    return bool(value)
+
+
+class CatalogExtractor:
+    """Reads database catalog metadata into a schema dictionary.
+
+    Each section (tables, columns, indexes, foreign keys, views) is an
+    independent query. With a ``connect`` factory the sections run
+    concurrently, each on its own connection; otherwise they run one after
+    another on the given connection. Rows are streamed with ``fetchmany``
+    straight into the schema structures, so no result set is held in full.
+
+    Queries are looked up per dialect and can be overridden, which lets any
+    DB-API connection (e.g. sqlite3) stand in for SQL Server in tests. Each
+    section's query must return rows shaped as follows:
+        tables:       (schema, table)
+        columns:      (schema, table, column, type, nullable, default, constraint_type)
+        indexes:      (schema, table, index_name, column)
+        foreign_keys: (schema, table, column, ref_schema, ref_table, ref_column)
+        views:        (schema, view)
+    ``nullable`` may be "YES"/"NO" or a boolean; ``constraint_type`` is
+    "PRIMARY KEY", "FOREIGN KEY" or NULL.
+
+    Where the dialect has a per-table version query (``sys.objects.modify_date``
+    on SQL Server, a definition hash on PostgreSQL), single tables can be
+    re-extracted: the table sections' queries carry a ``/*tables*/`` marker
+    that is replaced by a filter on ``TABLE_KEYS``.
+    """
+
+    def __init__(self, db_type: str, connection=None, connect: Optional[Callable[[], object]] = None,
+                 queries: Optional[Dict[str, str]] = None, max_workers: int = len(SECTIONS),
+                 fetch_size: int = 5000, version_query: Optional[str] = None,
+                 table_keys: Optional[Dict[str, str]] = None, view_version_query: Optional[str] = None):
+        """Initialize the extractor.
+
+        Args:
+            db_type: "sqlserver", "postgresql" or "generic".
+            connection: Open DB-API connection used when no factory is given or it fails.
+            connect: Factory returning a new DB-API connection per section.
+            queries: Per-section SQL overriding the dialect queries.
+            max_workers: Sections extracted at once.
+            fetch_size: Rows per ``fetchmany`` call.
+            version_query: SQL returning (schema, table, version) rows, overriding the dialect's.
+            table_keys: Per-section SQL expressions for ``schema.table``, overriding the dialect's.
+            view_version_query: SQL returning (schema, view, version) rows, overriding the dialect's.
+        """
+        self.logger = logging.getLogger("schema")
+        self.db_type = db_type if db_type in DIALECT_QUERIES else "generic"
+        self.connection = connection
+        self.connect = connect
+        self.queries = dict(DIALECT_QUERIES[self.db_type])
+        if queries:
+            self.queries.update(queries)
+        self.fallback_queries = {} if queries else INFORMATION_SCHEMA_QUERIES
+        self.version_query = version_query or TABLE_VERSION_QUERIES.get(self.db_type)
+        self.view_version_query = view_version_query or VIEW_VERSION_QUERIES.get(self.db_type)
+        self.table_keys = dict(TABLE_KEYS.get(self.db_type, {}))
+        if table_keys:
+            self.table_keys.update(table_keys)
+        self.max_workers = max(1, max_workers)
+        self.fetch_size = max(1, fetch_size)
+        self.timings: Dict[str, float] = {}
+
+    def _stream(self, cursor, sql: str, params: Optional[Sequence] = None) -> Iterator[Tuple]:
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(self.fetch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def _load_tables(self, rows: Iterator[Tuple], tables: Optional[Dict] = None) -> Dict:
+        tables = tables if tables is not None else defaultdict(list)
+        for schema, table in rows:
+            tables[schema].append(table)
+        return tables
+
+    def _load_columns(self, rows: Iterator[Tuple], columns: Optional[Dict] = None) -> Dict:
+        columns = columns if columns is not None else defaultdict(lambda: defaultdict(dict))
+        for schema, table, column, dtype, nullable, default, cons_type in rows:
+            columns[schema][table][column] = {
+                "type": dtype,
+                "nullable": _is_true(nullable),
+                "default": default,
+                "is_primary_key": cons_type == "PRIMARY KEY",
+                "is_foreign_key": cons_type == "FOREIGN KEY"
+            }
+        return columns
+
+    def _load_indexes(self, rows: Iterator[Tuple], indexes: Optional[Dict] = None) -> Dict:
+        indexes = indexes if indexes is not None else defaultdict(lambda: defaultdict(list))
+        for schema, table, index_name, column in rows:
+            indexes[schema][table].append({
+                "index_name": index_name,
+                "column": column
+            })
+        return indexes
+
+    def _load_foreign_keys(self, rows: Iterator[Tuple], foreign_keys: Optional[Dict] = None) -> Dict:
+        foreign_keys = foreign_keys if foreign_keys is not None else defaultdict(lambda: defaultdict(list))
+        for schema, table, column, ref_schema, ref_table, ref_column in rows:
+            foreign_keys[schema][table].append({
+                "column": column,
+                "referenced_table": f"{ref_schema}.{ref_table}",
+                "referenced_column": ref_column
+            })
+        return foreign_keys
+
+    def _load_views(self, rows: Iterator[Tuple], views: Optional[Dict] = None) -> Dict:
+        views = views if views is not None else defaultdict(list)
+        for schema, view in rows:
+            views[schema].append(view)
+        return views
+
+    def _run_query(self, connection, section: str, sql: str, params: Optional[Sequence] = None,
+                   into: Optional[Dict] = None) -> Dict:
+        loader = getattr(self, f"_load_{section}")
+        cursor = connection.cursor()
+        try:
+            return loader(self._stream(cursor, sql, params), into)
+        finally:
+            cursor.close()
+
+    def _extract_section(self, section: str, connection) -> Dict:
+        """Run one section's query, falling back to information_schema if it is refused."""
+        start = time.perf_counter()
+        sql = self.queries[section]
+        try:
+            result = self._run_query(connection, section, sql)
+        except Exception as e:
+            fallback = self.fallback_queries.get(section)
+            if not fallback or fallback == sql:
+                raise
+            self.logger.warning(f"Catalog query for {section} failed ({e}); using information_schema")
+            result = self._run_query(connection, section, fallback)
+        self.timings[section] = time.perf_counter() - start
+        self.logger.debug(f"Extracted {section} in {self.timings[section]:.3f}s")
+        return result
+
+    def _extract_on_own_connection(self, section: str) -> Dict:
+        connection = self.connect()
+        try:
+            return self._extract_section(section, connection)
+        finally:
+            connection.close()
+
+    def extract(self) -> Dict:
+        """Extract every section into a schema dictionary.
+
+        Returns:
+            Dict: Schema dictionary with tables, columns, indexes, foreign keys and views.
+        """
+        schema_dict = empty_schema()
+        pending = list(SECTIONS)
+        if self.connect is not None and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="catalog") as executor:
+                futures = {section: executor.submit(self._extract_on_own_connection, section)
+                           for section in SECTIONS}
+                pending = []
+                for section, future in futures.items():
+                    try:
+                        schema_dict[section] = future.result()
+                    except Exception as e:
+                        if self.connection is None:
+                            raise
+                        self.logger.warning(f"Concurrent extraction of {section} failed ({e}); retrying sequentially")
+                        pending.append(section)
+        if pending and self.connection is None:
+            raise ValueError("CatalogExtractor needs a connection or a connect factory")
+        # Only sections that failed (or all, without a factory) run on the caller's connection
+        for section in pending:
+            schema_dict[section] = self._extract_section(section, self.connection)
+        return schema_dict
+
+
+    @property
+    def supports_table_refresh(self) -> bool:
+        """True if single tables can be versioned and re-extracted."""
+        return bool(self.version_query) and all(
+            section in self.table_keys and TABLE_MARKER in self.queries[section] for section in TABLE_SECTIONS
+        )
+
+    def table_versions(self) -> Dict[str, str]:
+        """Current version token of every table.
+
+        Returns:
+            Dict[str, str]: Version per ``schema.table``.
+        """
+        versions = {}
+        cursor = self.connection.cursor()
+        try:
+            for schema, table, version in self._stream(cursor, self.version_query):
+                versions[f"{schema}.{table}"] = str(version)
+        finally:
+            cursor.close()
+        return versions
+
+    def view_version(self) -> Optional[str]:
+        """One version token covering every view definition.
+
+        Returns:
+            Optional[str]: Digest of the views' version rows, or None if the
+            dialect has no view version query.
+        """
+        if not self.view_version_query:
+            return None
+        cursor = self.connection.cursor()
+        try:
+            rows = sorted(tuple(str(value) for value in row)
+                          for row in self._stream(cursor, self.view_version_query))
+        finally:
+            cursor.close()
+        return hashlib.sha1(json.dumps(rows).encode("utf-8")).hexdigest()
+
+    def extract_tables(self, tables: List[str], chunk_size: int = 500) -> Dict:
+        """Extract the table sections for some tables only.
+
+        Args:
+            tables: ``schema.table`` names.
+            chunk_size: Tables per query, keeping parameter lists within driver limits.
+
+        Returns:
+            Dict: Schema dictionary holding just those tables (views are left empty).
+        """
+        if not self.supports_table_refresh:
+            raise ValueError(f"Per-table extraction is not supported for {self.db_type}")
+        schema_dict = empty_schema()
+        for section in TABLE_SECTIONS:
+            for start in range(0, len(tables), chunk_size):
+                chunk = list(tables[start:start + chunk_size])
+                sql = self.queries[section].replace(
+                    TABLE_MARKER, f"AND {self.table_keys[section]} IN ({', '.join('?' * len(chunk))})"
+                )
+                self._run_query(self.connection, section, sql, chunk, schema_dict[section])
+        return schema_dict
+
+
+def _mapping_as_dict(value):
+    # Lazily loaded sections from the binary cache are Mappings, not dicts
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_schema_cache(schema_dict: Dict, path: str, indent: Optional[int] = 2):
+    """Stream a schema dictionary to JSON and atomically replace ``path``.
+
+    The document is encoded chunk by chunk into a temporary file in the same
+    directory, so a large schema is never held as one string and readers
+    never see a partially written cache.
+
+    Args:
+        schema_dict: Schema dictionary.
+        path: Cache file to write.
+        indent: JSON indentation, as for ``json.dump``.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schema-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", buffering=1 << 16) as f:
+            for chunk in json.JSONEncoder(indent=indent, default=_mapping_as_dict).iterencode(schema_dict):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
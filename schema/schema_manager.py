@@ -1,9 +1,13 @@
 import logging
 import os
 import json
-from collections import defaultdict
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
+from schema.binary_cache import BinarySchemaCache, CacheFormatError, to_plain, write_binary_schema
+from schema.catalog_extractor import SECTIONS, CatalogExtractor, empty_schema, write_schema_cache
+
+# Key of the view version token in table_versions.json; never a schema.table name
+VIEWS_KEY = "#views"
 
 class SchemaManager:
     """Manages database schema metadata extraction and caching for multiple database types."""
@@ -17,7 +21,9 @@ class SchemaManager:
         self.logger = logging.getLogger("schema")
         self.db_name = db_name
         self.cache_dir = os.path.join("schema_cache", db_name)
-        self.cache_file = os.path.join(self.cache_dir, "schema.json")
+        self.cache_file = os.path.join(self.cache_dir, "schema.bin")
+        self.json_file = os.path.join(self.cache_dir, "schema.json")
+        self.versions_file = os.path.join(self.cache_dir, "table_versions.json")
         os.makedirs(self.cache_dir, exist_ok=True)
         self.db_type = None
         self.logger.debug(f"Initialized SchemaManager for {db_name}")
@@ -60,7 +66,8 @@ class SchemaManager:
             if not self.db_type:
                 self.set_db_type(connection)
             schema_mtime = self._get_schema_mtime(connection)
-            cache_mtime = os.path.getmtime(self.cache_file) if os.path.exists(self.cache_file) else 0
+            cache_file = self._existing_cache_file()
+            cache_mtime = os.path.getmtime(cache_file) if cache_file else 0
             self.logger.debug(f"Latest schema change: {schema_mtime}, Cache mtime: {cache_mtime}")
             return schema_mtime > cache_mtime
         except Exception as e:
@@ -125,156 +132,176 @@ class SchemaManager:
         finally:
             cursor.close()
 
-    def build_data_dict(self, connection) -> Dict:
+    def build_data_dict(self, connection, connect: Optional[Callable[[], object]] = None,
+                        max_workers: Optional[int] = None) -> Dict:
         """Build a comprehensive schema dictionary from the database.
 
         Args:
             connection: Database connection object.
+            connect: Optional factory for extra connections; when given, the
+                catalog sections are extracted concurrently.
+            max_workers: Connections ``connect`` can hand out without waiting;
+                caps the sections extracted at once.
 
         Returns:
             Dict: Schema dictionary with tables, columns, indexes, foreign keys, and views.
         """
         self.set_db_type(connection)
-        cursor = connection.cursor()
-        schema_dict = {
-            "tables": defaultdict(list),
-            "columns": defaultdict(lambda: defaultdict(dict)),
-            "indexes": defaultdict(lambda: defaultdict(list)),
-            "foreign_keys": defaultdict(lambda: defaultdict(list)),
-            "views": defaultdict(list),
-            "version": "1.0"
-        }
-        
+        previous = self.load_from_cache() if self._existing_cache_file() else None
         try:
-            # Fetch tables
-            cursor.execute("""
-                SELECT table_schema, table_name
-                FROM information_schema.tables
-                WHERE table_type = 'BASE TABLE' 
-                AND table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
-            """)
-            for schema, table in cursor.fetchall():
-                schema_dict["tables"][schema].append(table)
-            
-            # Fetch columns with constraint information
-            cursor.execute("""
-                SELECT c.table_schema, c.table_name, c.column_name, c.data_type, 
-                       c.is_nullable, c.column_default,
-                       CASE 
-                           WHEN pk.constraint_type = 'PRIMARY KEY' THEN 'PRIMARY KEY'
-                           WHEN fk.constraint_type = 'FOREIGN KEY' THEN 'FOREIGN KEY'
-                           ELSE NULL
-                       END as constraint_type
-                FROM information_schema.columns c
-                LEFT JOIN (
-                    SELECT kcu.table_schema, kcu.table_name, kcu.column_name, tc.constraint_type
-                    FROM information_schema.key_column_usage kcu
-                    JOIN information_schema.table_constraints tc
-                    ON kcu.constraint_name = tc.constraint_name
-                    WHERE tc.constraint_type = 'PRIMARY KEY'
-                ) pk ON c.table_schema = pk.table_schema 
-                AND c.table_name = pk.table_name 
-                AND c.column_name = pk.column_name
-                LEFT JOIN (
-                    SELECT kcu.table_schema, kcu.table_name, kcu.column_name, tc.constraint_type
-                    FROM information_schema.key_column_usage kcu
-                    JOIN information_schema.table_constraints tc
-                    ON kcu.constraint_name = tc.constraint_name
-                    WHERE tc.constraint_type = 'FOREIGN KEY'
-                ) fk ON c.table_schema = fk.table_schema 
-                AND c.table_name = fk.table_name 
-                AND c.column_name = fk.column_name
-                WHERE c.table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
-            """)
-            for schema, table, column, dtype, nullable, default, cons_type in cursor.fetchall():
-                schema_dict["columns"][schema][table][column] = {
-                    "type": dtype,
-                    "nullable": nullable == "YES",
-                    "default": default,
-                    "is_primary_key": cons_type == "PRIMARY KEY",
-                    "is_foreign_key": cons_type == "FOREIGN KEY"
-                }
-            
-            # Fetch indexes
-            if self.db_type == "sqlserver":
-                cursor.execute("""
-                    SELECT schema_name(t.schema_id) AS table_schema, 
-                           t.name AS table_name, 
-                           i.name AS index_name, 
-                           c.name AS column_name
-                    FROM sys.indexes i
-                    JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-                    JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
-                    JOIN sys.tables t ON i.object_id = t.object_id
-                    WHERE schema_name(t.schema_id) NOT IN ('information_schema', 'sys')
-                """)
-            elif self.db_type == "postgresql":
-                cursor.execute("""
-                    SELECT n.nspname AS table_schema, 
-                           t.relname AS table_name, 
-                           i.relname AS index_name, 
-                           a.attname AS column_name
-                    FROM pg_index ix
-                    JOIN pg_class i ON i.oid = ix.indexrelid
-                    JOIN pg_class t ON t.oid = ix.indrelid
-                    JOIN pg_namespace n ON n.oid = t.relnamespace
-                    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(ix.indkey)
-                    WHERE n.nspname NOT IN ('information_schema', 'pg_catalog')
-                """)
-            else:
-                cursor.execute("""
-                    SELECT table_schema, table_name, index_name, column_name
-                    FROM information_schema.statistics
-                    WHERE table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
-                """)
-            for schema, table, index_name, column in cursor.fetchall():
-                schema_dict["indexes"][schema][table].append({
-                    "index_name": index_name,
-                    "column": column
-                })
-            
-            # Fetch foreign keys
-            cursor.execute("""
-                SELECT tc.table_schema, tc.table_name, kcu.column_name, 
-                       ccu.table_schema AS ref_schema, ccu.table_name AS ref_table, 
-                       ccu.column_name AS ref_column
-                FROM information_schema.table_constraints tc
-                JOIN information_schema.key_column_usage kcu 
-                ON tc.constraint_name = kcu.constraint_name
-                JOIN information_schema.constraint_column_usage ccu 
-                ON tc.constraint_name = ccu.constraint_name
-                WHERE tc.constraint_type = 'FOREIGN KEY'
-                AND tc.table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
-            """)
-            for schema, table, column, ref_schema, ref_table, ref_column in cursor.fetchall():
-                schema_dict["foreign_keys"][schema][table].append({
-                    "column": column,
-                    "referenced_table": f"{ref_schema}.{ref_table}",
-                    "referenced_column": ref_column
-                })
-            
-            # Fetch views
-            cursor.execute("""
-                SELECT table_schema, table_name
-                FROM information_schema.views
-                WHERE table_schema NOT IN ('information_schema', 'sys', 'pg_catalog')
-            """)
-            for schema, view in cursor.fetchall():
-                schema_dict["views"][schema].append(view)
-            
+            extractor = CatalogExtractor(self.db_type, connection, connect, max_workers=self._workers(max_workers))
+            # Read versions first so DDL racing the extraction is picked up next time
+            versions = self._read_table_versions(extractor)
+            schema_dict = extractor.extract()
+            self.logger.debug(
+                "Catalog extraction timings: " +
+                ", ".join(f"{section}={seconds:.3f}s" for section, seconds in extractor.timings.items())
+            )
+
             self._validate_schema(schema_dict)
-            
-            os.makedirs(self.cache_dir, exist_ok=True)
-            with open(self.cache_file, 'w') as f:
-                json.dump(schema_dict, f, indent=2)
-            self.logger.debug(f"Saved schema to {self.cache_file}")
-            
+            if previous:
+                self._check_column_types(previous, schema_dict)
+
+            self._write_cache(schema_dict)
+            self._save_table_versions(versions)
+
             return schema_dict
         except Exception as e:
             self.logger.error(f"Error building schema: {e}")
             raise
-        finally:
-            cursor.close()
+
+    @staticmethod
+    def _workers(max_workers: Optional[int]) -> int:
+        return len(SECTIONS) if max_workers is None else max(1, min(max_workers, len(SECTIONS)))
+
+    def _read_table_versions(self, extractor: CatalogExtractor) -> Optional[Dict[str, str]]:
+        if not extractor.supports_table_refresh:
+            return None
+        try:
+            versions = extractor.table_versions()
+            versions[VIEWS_KEY] = extractor.view_version()
+            return versions
+        except Exception as e:
+            self.logger.warning(f"Could not read table versions: {e}")
+            return None
+
+    def _load_table_versions(self) -> Optional[Dict[str, str]]:
+        try:
+            if os.path.exists(self.versions_file):
+                with open(self.versions_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Error loading table versions: {e}")
+        return None
+
+    def _save_table_versions(self, versions: Optional[Dict[str, str]]):
+        if versions is None:
+            if os.path.exists(self.versions_file):
+                os.remove(self.versions_file)
+            return
+        write_schema_cache(versions, self.versions_file, indent=None)
+
+    def refresh_changed_tables(self, connection, schema_dict: Dict) -> Optional[List[str]]:
+        """Patch ``schema_dict`` in place with tables changed since the cached versions.
+
+        Compares each table's version token (``sys.objects.modify_date`` on
+        SQL Server) with the one stored at the last extraction and re-extracts
+        only added or modified tables; dropped tables are removed. The cache
+        and stored versions are rewritten. Views are not tracked per table:
+        when any view changed, None is returned so that a full build runs.
+        With nothing changed, the cache file is touched so the schema
+        modification check stops asking for a refresh.
+
+        Args:
+            connection: Database connection object.
+            schema_dict: Schema dictionary matching the cache, modified in place.
+
+        Returns:
+            Optional[List[str]]: Affected ``schema.table`` names (possibly empty),
+            or None if per-table refresh is unavailable and a full build is needed.
+        """
+        if not self.db_type:
+            self.set_db_type(connection)
+        extractor = CatalogExtractor(self.db_type, connection)
+        cached_versions = self._load_table_versions()
+        if cached_versions is None or not extractor.supports_table_refresh:
+            return None
+        try:
+            versions = extractor.table_versions()
+            view_version = extractor.view_version()
+            if view_version != cached_versions.pop(VIEWS_KEY, None):
+                self.logger.info("Views changed since the cached schema; rebuilding it")
+                return None
+            dropped = [table for table in cached_versions if table not in versions]
+            changed = [table for table, version in versions.items() if cached_versions.get(table) != version]
+            if not dropped and not changed:
+                cache_file = self._existing_cache_file()
+                if cache_file:
+                    os.utime(cache_file)
+                return []
+            partial = extractor.extract_tables(changed) if changed else empty_schema()
+        except Exception as e:
+            self.logger.error(f"Error refreshing changed tables: {e}")
+            return None
+
+        for full_table in dropped + changed:
+            schema, table = full_table.split('.', 1)
+            self._remove_table(schema_dict, schema, table)
+        for full_table in changed:
+            schema, table = full_table.split('.', 1)
+            if table not in partial["tables"].get(schema, []):
+                continue  # Dropped after the version query
+            schema_dict["tables"].setdefault(schema, []).append(table)
+            for section in ("columns", "indexes", "foreign_keys"):
+                if table in partial[section].get(schema, {}):
+                    schema_dict[section].setdefault(schema, {})[table] = partial[section][schema][table]
+
+        self._validate_schema(schema_dict)
+        self._write_cache(schema_dict)
+        versions[VIEWS_KEY] = view_version
+        self._save_table_versions(versions)
+        affected = dropped + changed
+        self.logger.info(f"Refreshed {len(changed)} changed and {len(dropped)} dropped tables")
+        return affected
+
+    @staticmethod
+    def _remove_table(schema_dict: Dict, schema: str, table: str):
+        tables = schema_dict["tables"].get(schema)
+        if tables and table in tables:
+            tables.remove(table)
+            if not tables:
+                del schema_dict["tables"][schema]
+        for section in ("columns", "indexes", "foreign_keys"):
+            tables_in_section = schema_dict[section].get(schema)
+            if tables_in_section is not None and table in tables_in_section:
+                del tables_in_section[table]
+                if not tables_in_section:
+                    del schema_dict[section][schema]
+
+    def load_schema(self, connection, connect: Optional[Callable[[], object]] = None,
+                    max_workers: Optional[int] = None) -> Dict:
+        """Return the current schema, doing as little catalog work as possible.
+
+        Loads the cache when nothing changed, patches only changed tables when
+        per-table versions are available, and builds from scratch otherwise.
+
+        Args:
+            connection: Database connection object.
+            connect: Optional factory for extra connections used by a full build.
+            max_workers: Connections ``connect`` can hand out without waiting.
+
+        Returns:
+            Dict: Schema dictionary.
+        """
+        if not self.needs_refresh(connection):
+            self.logger.debug("Loading schema from cache")
+            return self.load_from_cache()
+        if self._existing_cache_file():
+            schema_dict = self.load_from_cache()
+            if schema_dict.get("tables") and self.refresh_changed_tables(connection, schema_dict) is not None:
+                return schema_dict
+        self.logger.debug("Building fresh schema")
+        return self.build_data_dict(connection, connect, max_workers)
 
     def _validate_schema(self, schema_dict: Dict):
         """Validate schema consistency.
@@ -284,35 +311,97 @@ class SchemaManager:
         """
         for schema, tables in schema_dict["tables"].items():
             for table in tables:
-                if table not in schema_dict["columns"][schema]:
+                if table not in schema_dict["columns"].get(schema, {}):
                     self.logger.warning(f"Table {schema}.{table} has no columns defined")
-                for fk in schema_dict["foreign_keys"][schema][table]:
+                for fk in schema_dict["foreign_keys"].get(schema, {}).get(table, []):
                     ref_table = fk["referenced_table"]
-                    ref_schema, ref_table_name = ref_table.split('.')
-                    if ref_table_name not in schema_dict["tables"][ref_schema]:
+                    ref_schema, ref_table_name = ref_table.split('.', 1)
+                    if ref_table_name not in schema_dict["tables"].get(ref_schema, []):
                         self.logger.warning(f"Foreign key references non-existent table {ref_table}")
         self.logger.debug("Schema validation completed")
 
+    def _check_column_types(self, previous: Dict, schema_dict: Dict):
+        """Warn about columns whose type differs from the cached schema.
+
+        A rebuild should reproduce the cached types of unchanged columns; a
+        broad difference usually means the extraction query reports types
+        differently (e.g. alias instead of base types) rather than DDL.
+        """
+        changed = []
+        for schema, tables in schema_dict["columns"].items():
+            cached_tables = previous["columns"].get(schema, {})
+            for table, columns in tables.items():
+                cached_columns = cached_tables.get(table, {})
+                for column, info in columns.items():
+                    cached = cached_columns.get(column)
+                    if cached is not None and cached.get("type") != info.get("type"):
+                        changed.append(f"{schema}.{table}.{column}: {cached.get('type')} -> {info.get('type')}")
+        if changed:
+            self.logger.warning(
+                f"{len(changed)} column types differ from the cached schema: " + ", ".join(changed[:10]) +
+                (", ..." if len(changed) > 10 else "")
+            )
+
+    def _existing_cache_file(self) -> Optional[str]:
+        """The binary cache, else a legacy JSON cache, else None."""
+        for path in (self.cache_file, self.json_file):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _write_cache(self, schema_dict: Dict):
+        """Write the validated schema to the binary cache."""
+        write_binary_schema(schema_dict, self.cache_file, validated=True)
+        self.logger.debug(f"Saved schema to {self.cache_file}")
+
+    def export_json(self, path: Optional[str] = None) -> str:
+        """Write the cached schema as indented JSON for inspection.
+
+        Args:
+            path: Output file; ``schema.json`` in the cache directory by default.
+
+        Returns:
+            str: Path written.
+        """
+        path = path or self.json_file
+        write_schema_cache(to_plain(self.load_from_cache()), path)
+        self.logger.info(f"Exported schema to {path}")
+        return path
+
     def load_from_cache(self) -> Dict:
         """Load schema from cache file.
 
+        The binary cache is opened without decoding any schema section;
+        sections are decoded when first accessed. Validation is skipped when
+        the content hash checks out and the content was validated before it
+        was written. A legacy ``schema.json`` cache is loaded, validated and
+        converted to the binary format.
+
         Returns:
             Dict: Cached schema dictionary or empty schema if cache is invalid.
         """
         try:
             if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r') as f:
-                    schema_dict = json.load(f)
-                    self._validate_schema(schema_dict)
-                    self.logger.debug(f"Loaded schema from {self.cache_file}")
+                try:
+                    cache = BinarySchemaCache(self.cache_file)
+                except CacheFormatError as e:
+                    self.logger.warning(f"Ignoring schema cache: {e}")
+                else:
+                    schema_dict = cache.schema_dict()
+                    if not cache.validated:
+                        self._validate_schema(schema_dict)
+                    self.logger.debug(f"Loaded schema from {self.cache_file} ({len(cache.index)} schemas)")
                     return schema_dict
+            if os.path.exists(self.json_file):
+                with open(self.json_file, 'r') as f:
+                    schema_dict = json.load(f)
+                self._validate_schema(schema_dict)
+                self._write_cache(schema_dict)
+                # Keep the legacy cache's age so needs_refresh still sees later DDL
+                json_mtime = os.path.getmtime(self.json_file)
+                os.utime(self.cache_file, (json_mtime, json_mtime))
+                self.logger.debug(f"Loaded schema from {self.json_file}")
+                return schema_dict
         except Exception as e:
             self.logger.error(f"Error loading schema from cache: {e}")
-        return {
-            "tables": defaultdict(list),
-            "columns": defaultdict(lambda: defaultdict(dict)),
-            "indexes": defaultdict(lambda: defaultdict(list)),
-            "foreign_keys": defaultdict(lambda: defaultdict(list)),
-            "views": defaultdict(list),
-            "version": "1.0"
-        }
\ No newline at end of file
+        return empty_schema()
@@ -0,0 +1,64 @@
+# scripts/benchmark_feedback_index.py: Compares recall and latency of feedback vector index backends
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feedback.vector_index import BruteForceIndex, HNSWIndex
+
+def make_dataset(size: int, queries: int, dim: int, clusters: int, seed: int):
+    """Generate clustered vectors resembling paraphrased feedback queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    data = centers[rng.integers(0, clusters, size)] + 0.5 * rng.normal(size=(size, dim))
+    probes = centers[rng.integers(0, clusters, queries)] + 0.5 * rng.normal(size=(queries, dim))
+    return data.astype(np.float32), probes.astype(np.float32)
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def run(size: int, queries: int, dim: int, clusters: int, k: int, ef_search: int, seed: int):
+    """Build both backends on the same data and report build time, latency and recall@k."""
+    data, probes = make_dataset(size, queries, dim, clusters, seed)
+    ids = list(range(1, size + 1))
+    backends = [BruteForceIndex(), HNSWIndex(ef_search=ef_search)]
+
+    truth = None
+    for index in backends:
+        start = time.perf_counter()
+        index.add(ids, data)
+        build = time.perf_counter() - start
+
+        latencies = []
+        results = []
+        for probe in probes:
+            start = time.perf_counter()
+            hits = index.search(probe, k=k)
+            latencies.append(time.perf_counter() - start)
+            results.append({id_ for id_, _ in hits})
+        if truth is None:
+            truth = results
+        recall = np.mean([len(found & exact) / max(len(exact), 1) for found, exact in zip(results, truth)])
+        print(f"{index.backend:>6}: build {build:8.2f}s  "
+              f"p50 {percentile_ms(latencies, 50):7.3f}ms  p99 {percentile_ms(latencies, 99):7.3f}ms  "
+              f"recall@{k} {recall:.3f}")
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark feedback vector index backends")
+    parser.add_argument("--size", type=int, default=20000, help="Number of stored feedback vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of lookups")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--clusters", type=int, default=200, help="Number of query topics")
+    parser.add_argument("--k", type=int, default=1, help="Neighbours per lookup")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search candidate list size")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    print(f"Feedback index benchmark: {args.size} vectors, {args.queries} queries, dim {args.dim}")
+    run(args.size, args.queries, args.dim, args.clusters, args.k, args.ef_search, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# scripts/check_quantization_recall.py: Checks that quantized embeddings leave feedback and table answers unchanged
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fixtures import REPO_ROOT, SCHEMAS, paraphrase, prepare_workdir, synthetic_queries
+from analysis.schema_index import SchemaIndex
+from analysis.table_identifier import TableIdentifier
+from config.patterns import PatternManager
+from feedback.feedback_manager import FeedbackManager
+from nlp.quantization import QUANTIZATIONS
+from schema.schema_manager import SchemaManager
+
+def load_embedder(offline: bool, dim: int):
+    """The production encoder, or the offline stand-in used by the benchmarks."""
+    if offline:
+        from benchmarks.fixtures import HashEmbedder, install_offline_models
+        embedder = HashEmbedder(dim)
+        install_offline_models(embedder)
+        return embedder
+    from sentence_transformers import SentenceTransformer
+    from nlp.embedding_cache import CachedEmbedder
+    embedder = CachedEmbedder(SentenceTransformer("all-distilroberta-v1"), "all-distilroberta-v1")
+    FeedbackManager._embedder = embedder
+    return embedder
+
+def copy_data(db_name: str, workdir: str):
+    """Copy a database's schema cache, feedback.db and training data into the work directory."""
+    prepare_workdir(workdir)
+    shutil.copytree(os.path.join(REPO_ROOT, "schema_cache", db_name), os.path.join(workdir, "schema_cache", db_name))
+    os.makedirs(os.path.join(workdir, "feedback_cache", db_name), exist_ok=True)
+    source = os.path.join(REPO_ROOT, "feedback_cache", db_name, "feedback.db")
+    if os.path.exists(source):
+        shutil.copy(source, os.path.join(workdir, "feedback_cache", db_name, "feedback.db"))
+    training = os.path.join(REPO_ROOT, "app-config", "training_data.csv")
+    if os.path.exists(training):
+        shutil.copy(training, os.path.join(workdir, "app-config", "training_data.csv"))
+
+def workload(schema_dict: Dict, feedback: FeedbackManager, seeds: int, seed: int) -> List[str]:
+    """Stored feedback queries, near-duplicates of them and unseen synthetic queries."""
+    rng = random.Random(seed)
+    stored = list(dict.fromkeys(feedback.feedback_queries))
+    queries = stored + [paraphrase(query, rng) for query in stored]
+    queries += [query for query, _ in synthetic_queries(schema_dict, seeds, seed)]
+    return queries
+
+def build(db_name: str, schema_dict: Dict, embedder, quantization) -> Tuple[FeedbackManager, TableIdentifier]:
+    """Feedback manager and table identifier wired as DatabaseAnalyzer does."""
+    feedback = FeedbackManager(db_name, quantization=quantization)
+    schema_index = SchemaIndex(schema_dict, embedder)
+    identifier = TableIdentifier(
+        schema_dict, feedback, PatternManager(schema_dict), None, db_name, embedder, schema_index
+    )
+    return feedback, identifier
+
+def check(db_name: str, args, embedder) -> int:
+    """Compare every quantization mode with float32 scoring for one database.
+
+    Returns:
+        int: Number of differing answers.
+    """
+    schema_dict = SchemaManager(db_name).load_from_cache()
+    feedback, identifier = build(db_name, schema_dict, embedder, None)
+    if args.seeds:
+        seeded = synthetic_queries(schema_dict, args.seeds, args.seed + 1)
+        feedback.store_feedback_many(seeded, schema_dict)
+    queries = workload(schema_dict, feedback, args.queries, args.seed)
+    expected_feedback = [feedback.get_similar_feedback(query) for query in queries]
+    expected_tables = [identifier.identify_tables(query) for query in queries]
+    feedback.close()
+
+    mismatches = 0
+    print(f"\n{db_name}: {len(feedback.feedback_ids)} feedback rows, "
+          f"{len(identifier.schema_index)} schema rows, {len(queries)} queries")
+    for mode in QUANTIZATIONS:
+        feedback, identifier = build(db_name, schema_dict, embedder, mode)
+        start = time.perf_counter()
+        answers = [feedback.get_similar_feedback(query) for query in queries]
+        tables = [identifier.identify_tables(query) for query in queries]
+        elapsed = time.perf_counter() - start
+        differing = 0
+        for query, want, got in zip(queries, expected_feedback, answers):
+            if want != got:
+                differing += 1
+                print(f"  [{mode}] get_similar_feedback({query!r}): {want} != {got}")
+        for query, want, got in zip(queries, expected_tables, tables):
+            if want[0] != got[0] or abs(want[1] - got[1]) > args.tolerance:
+                differing += 1
+                print(f"  [{mode}] identify_tables({query!r}): {want} != {got}")
+        matrix = feedback.matrix
+        scanned = matrix.count * (matrix.codes[0].nbytes + matrix.scales[0].nbytes) if matrix.count else 0
+        exact = matrix.count * matrix.vectors[0].nbytes if matrix.count else 0
+        print(f"  {mode:<8} differing answers {differing}, feedback scan reads {scanned} bytes of codes "
+              f"instead of {exact} float32 bytes, {elapsed:.2f}s")
+        mismatches += differing
+        feedback.close()
+    return mismatches
+
+def main() -> int:
+    """Run the check on each database.
+
+    Returns:
+        int: Process exit code, 1 if any answer changed.
+    """
+    parser = argparse.ArgumentParser(description="Check that quantized embeddings leave answers unchanged")
+    parser.add_argument("--schemas", nargs="+", default=list(SCHEMAS), help="Cached schemas to check")
+    parser.add_argument("--queries", type=int, default=500, help="Unseen synthetic queries per schema")
+    parser.add_argument("--seeds", type=int, default=0, help="Synthetic labeled queries added to the copied feedback")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--tolerance", type=float, default=1e-5, help="Allowed confidence difference")
+    parser.add_argument("--offline", action="store_true", help="Use the hashed stand-in encoder instead of the model")
+    parser.add_argument("--dim", type=int, default=768, help="Stand-in embedding dimension with --offline")
+    parser.add_argument("--verbose", action="store_true", help="Keep application logging enabled")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+    embedder = load_embedder(args.offline, args.dim)
+
+    cwd = os.getcwd()
+    mismatches = 0
+    for db_name in args.schemas:
+        workdir = tempfile.mkdtemp(prefix="table-identifier-recall-")
+        try:
+            copy_data(db_name, workdir)
+            os.chdir(workdir)
+            mismatches += check(db_name, args, embedder)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    print("\nAll answers unchanged" if not mismatches else f"\n{mismatches} answers changed")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAX_BODY_BYTES = 1 << 20
+
+class QueryBatcher:
+    """Coalesces concurrent identify requests into batched pipeline calls.
+
+    Requests arriving within ``window`` seconds of each other are processed
+    together by one ``process_batch`` call, so they share one batched encode
+    and one matrix scoring pass. Identical queries already queued or running
+    share a single result (singleflight). Batches run one at a time on
+    ``executor``; requests arriving meanwhile form the next, larger batch.
+    """
+
+    def __init__(self, process_batch: Callable[[List[str]], List], executor: ThreadPoolExecutor,
+                 window: float = 0.005, max_batch: int = 64):
+        """Initialize the batcher.
+
+        Args:
+            process_batch: Blocking function mapping a list of queries to results.
+            executor: Executor the blocking batch calls run on.
+            window: Seconds to wait for more requests after the first arrives.
+            max_batch: Maximum queries per batch.
+        """
+        self.logger = logging.getLogger("service")
+        self.process_batch = process_batch
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._has_pending: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.largest_batch = 0
+
+    def start(self):
+        """Start the batching loop on the running event loop."""
+        if self._worker is None:
+            self._has_pending = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, query: str):
+        """Queue a query and wait for its result.
+
+        Args:
+            query: Query text.
+
+        Returns:
+            The result ``process_batch`` produced for the query.
+        """
+        self.start()
+        self.requests += 1
+        key = query.strip()
+        future = self._inflight.get(key)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._pending.append((key, future))
+            self._has_pending.set()
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.window)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if not self._pending:
+                self._has_pending.clear()
+            if not batch:
+                continue
+
+            queries = [key for key, _ in batch]
+            self.batches += 1
+            self.batched_queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, queries)
+                for (key, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                self.logger.error(f"Batch of {len(batch)} queries failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for key, _ in batch:
+                    self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Request, deduplication and batch size counters."""
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "mean_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending)
+        }
+
+
+class AnalyzerService:
+    """Minimal asyncio HTTP/1.1 JSON service around a connected DatabaseAnalyzer.
+
+    Endpoints:
+        POST /identify  {"query": str} -> {"query", "tables", "confidence"}
+        POST /confirm   {"query": str, "tables": [str]} -> {"status"}
+        POST /refresh   -> {"changed": [str] | null}, re-extracting changed tables only
+        GET  /stats     -> pipeline and batching statistics
+        GET  /health    -> {"status", "connected"}
+
+    All analyzer calls run on a single worker thread, so identification
+    batches and feedback updates never overlap.
+    """
+
+    def __init__(self, analyzer, window_ms: float = 5.0, max_batch: int = 64,
+                 notifier: Optional[Callable[[str, List[str]], None]] = None):
+        """Initialize the service.
+
+        Args:
+            analyzer: Connected DatabaseAnalyzer.
+            window_ms: Micro-batching window in milliseconds.
+            max_batch: Maximum queries per batch.
+            notifier: If given, confirmations are handed to it (e.g. a pre-fork
+                master) instead of being applied by this process.
+        """
+        self.logger = logging.getLogger("service")
+        self.analyzer = analyzer
+        self.notifier = notifier
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analyzer")
+        self.batcher = QueryBatcher(analyzer.process_queries, self.executor, window_ms / 1000.0, max_batch)
+        self.server = None
+
+    async def _call(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def identify(self, payload: Dict) -> Tuple[int, Dict]:
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            return 400, {"error": "'query' must be a non-empty string"}
+        tables, confidence = await self.batcher.submit(query)
+        return 200, {"query": query, "tables": tables, "confidence": confidence}
+
+    async def confirm(self, payload: Dict) -> Tuple[int, Dict]:
+        query = payload.get("query")
+        tables = payload.get("tables")
+        if not isinstance(query, str) or not query.strip():
+            return 400, {"error": "'query' must be a non-empty string"}
+        if not isinstance(tables, list) or not all(isinstance(table, str) for table in tables):
+            return 400, {"error": "'tables' must be a list of strings"}
+        valid, invalid = await self._call(self.analyzer.validate_tables_exist, tables)
+        if not valid:
+            return 200, {"status": "ignored", "confirmed": valid, "invalid": invalid}
+        if self.notifier is not None:
+            self.notifier(query, valid)
+            return 200, {"status": "queued", "confirmed": valid, "invalid": invalid}
+        await self._call(self.analyzer.confirm_tables, query, valid)
+        return 200, {"status": "ok", "confirmed": valid, "invalid": invalid}
+
+    async def refresh(self) -> Tuple[int, Dict]:
+        if self.notifier is not None:
+            return 409, {"error": "Schema refresh is not available in pre-fork mode; restart the server"}
+        changed = await self._call(self.analyzer.refresh_schema)
+        return 200, {"changed": changed}
+
+    async def apply_feedback_update(self, query: str, tables: List[str]):
+        """Apply feedback confirmed elsewhere, between batches."""
+        await self._call(self.analyzer.apply_feedback_update, query, tables)
+
+    async def stats(self) -> Tuple[int, Dict]:
+        stats = await self._call(self.analyzer.get_stats)
+        stats["batching"] = self.batcher.stats()
+        stats["pid"] = os.getpid()
+        return 200, stats
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """Route a request to its handler."""
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if method == "GET" and path == "/stats":
+            return await self.stats()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "connected": bool(self.analyzer.is_connected())}
+        if method == "POST" and path == "/refresh":
+            return await self.refresh()
+        if method == "POST" and path in ("/identify", "/confirm"):
+            try:
+                payload = json.loads(body.decode("utf-8") or "{}")
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                return 400, {"error": "Body must be JSON"}
+            if not isinstance(payload, dict):
+                return 400, {"error": "Body must be a JSON object"}
+            if path == "/identify":
+                return await self.identify(payload)
+            return await self.confirm(payload)
+        if path in ("/identify", "/confirm", "/refresh", "/stats", "/health"):
+            return 405, {"error": f"{method} not allowed on {path}"}
+        return 404, {"error": f"Unknown path {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection, honouring HTTP/1.1 keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.dispatch(method.upper(), path, body)
+                    except Exception as e:
+                        self.logger.error(f"Error handling {method} {path}: {e}")
+                        status, payload = 500, {"error": str(e)}
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                data = json.dumps(payload).encode("utf-8")
+                reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                          409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}.get(status, "")
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            self.logger.debug(f"Connection closed: {e}")
+        finally:
+            writer.close()
+
+    async def start(self, host: str = None, port: int = None, sock: Optional[socket.socket] = None):
+        """Start listening on ``host``/``port`` or an already bound socket; returns once listening."""
+        self.batcher.start()
+        if sock is not None:
+            self.server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        sockets = ", ".join(str(sock.getsockname()) for sock in self.server.sockets)
+        self.logger.info(f"Serving on {sockets}")
+
+    async def close(self):
+        """Stop accepting connections and the batching loop."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+        self.executor.shutdown(wait=True)
+
+    async def serve_forever(self, host: str, port: int):
+        """Start the service and run until cancelled."""
+        await self.start(host, port)
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.close()
+
+
+def serve(analyzer, host: str = "127.0.0.1", port: int = 8080, window_ms: float = 5.0, max_batch: int = 64):
+    """Run the HTTP service for a connected analyzer until interrupted."""
+    service = AnalyzerService(analyzer, window_ms, max_batch)
+    print(f"Serving table identification on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(service.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
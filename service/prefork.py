@@ -0,0 +1,223 @@
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection, wait
+from typing import Dict, List, Optional
+
+from service.http_service import AnalyzerService
+
+class PreforkServer:
+    """Pre-fork HTTP service: one master loads everything, N forked workers serve.
+
+    The master loads the sentence model, spaCy, the schema index and the
+    feedback cache once, moves the schema matrix into shared memory, freezes
+    the embedding caches and the garbage collector, and only then forks. The
+    workers therefore share the model weights and matrices copy-on-write, and
+    nothing in them touches those pages again, so resident memory stays
+    roughly flat as workers are added.
+
+    Workers share one listening socket. Confirmations are sent to the master
+    over a pipe; the master is the only writer of feedback and model weights
+    and broadcasts each update to every worker, which reloads the new
+    feedback rows and adjusts its table weights between batches.
+    """
+
+    def __init__(self, analyzer, host: str = "127.0.0.1", port: int = 8080, workers: int = 2,
+                 window_ms: float = 5.0, max_batch: int = 64):
+        """Initialize the server.
+
+        Args:
+            analyzer: Connected DatabaseAnalyzer.
+            host: Interface to bind.
+            port: Port to listen on.
+            workers: Number of worker processes.
+            window_ms: Micro-batching window per worker in milliseconds.
+            max_batch: Maximum queries per batch.
+        """
+        self.logger = logging.getLogger("service")
+        self.analyzer = analyzer
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.sock: Optional[socket.socket] = None
+        self.children: Dict[int, Connection] = {}
+        self._stopping = False
+
+    def _prepare(self):
+        """Load and share everything workers read, then freeze the heap."""
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        from feedback.feedback_manager import FeedbackManager
+        from nlp.parsed_query import get_parser
+
+        if self.analyzer.schema_index is not None:
+            self.analyzer.schema_index.share_memory()
+        for embedder in {id(e): e for e in (self.analyzer.embedder, FeedbackManager._embedder) if e}.values():
+            cache = getattr(embedder, "cache", None)
+            if cache is not None:
+                cache.freeze()
+        # Force lazy loads so workers inherit them instead of loading their own copies
+        bool(self.analyzer.nlp)
+        get_parser()
+        if self.analyzer.table_identifier is not None:
+            self.analyzer.table_identifier.training_index
+
+        gc.collect()
+        gc.freeze()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(128)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+
+    def _spawn(self):
+        """Fork one worker connected to the master by a duplex pipe."""
+        master_end, worker_end = Pipe()
+        pid = os.fork()
+        if pid == 0:
+            master_end.close()
+            code = 0
+            try:
+                self._worker_main(worker_end)
+            except BaseException as e:
+                logging.getLogger("service").error(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                # Skip interpreter teardown: finalizers would close the
+                # master's database connection and shared memory
+                sys.stdout.flush()
+                os._exit(code)
+        worker_end.close()
+        self.children[pid] = master_end
+        self.logger.info(f"Started worker {pid}")
+
+    def _worker_main(self, conn: Connection):
+        """Serve requests on the inherited socket until SIGTERM."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(1)
+
+        def notify(query: str, tables: List[str]):
+            conn.send(("confirm", query, tables))
+
+        service = AnalyzerService(self.analyzer, self.window_ms, self.max_batch, notifier=notify)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            stopped = loop.create_future()
+
+            def stop():
+                if not stopped.done():
+                    stopped.set_result(None)
+
+            def on_message():
+                try:
+                    while conn.poll():
+                        kind, query, tables = conn.recv()
+                        if kind == "feedback":
+                            loop.create_task(service.apply_feedback_update(query, tables))
+                except (EOFError, OSError):
+                    stop()
+
+            loop.add_signal_handler(signal.SIGTERM, stop)
+            loop.add_reader(conn.fileno(), on_message)
+            await service.start(sock=self.sock)
+            try:
+                await stopped
+            finally:
+                loop.remove_reader(conn.fileno())
+                await service.close()
+
+        asyncio.run(run())
+
+    def _broadcast(self, message):
+        for pid, conn in list(self.children.items()):
+            try:
+                conn.send(message)
+            except (BrokenPipeError, OSError):
+                self.logger.warning(f"Could not notify worker {pid}")
+
+    def _handle(self, conn: Connection):
+        try:
+            kind, query, tables = conn.recv()
+        except (EOFError, OSError):
+            for pid, child in list(self.children.items()):
+                if child is conn:
+                    self.children.pop(pid)
+                    conn.close()
+            return
+        if kind == "confirm":
+            self.analyzer.confirm_tables(query, tables)
+            valid, _ = self.analyzer.validate_tables_exist(tables)
+            self._broadcast(("feedback", query, valid))
+
+    def _reap(self):
+        """Collect exited workers and start replacements."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self.children.pop(pid, None)
+            if conn is not None:
+                conn.close()
+            if not self._stopping:
+                self.logger.warning(f"Worker {pid} exited with status {status}; restarting")
+                self._spawn()
+
+    def serve_forever(self):
+        """Fork the workers and relay feedback until interrupted."""
+        self._prepare()
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while True:
+                for conn in wait(list(self.children.values()), timeout=1.0):
+                    self._handle(conn)
+                self._reap()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Terminate the workers and return shared memory to the master."""
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid, conn in list(self.children.items()):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            conn.close()
+        self.children.clear()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        gc.unfreeze()
+        if self.analyzer.schema_index is not None:
+            self.analyzer.schema_index.release_shared_memory()
+
+
+def serve(analyzer, host: str = "127.0.0.1", port: int = 8080, workers: int = 2,
+          window_ms: float = 5.0, max_batch: int = 64):
+    """Run the pre-fork HTTP service for a connected analyzer until interrupted."""
+    server = PreforkServer(analyzer, host, port, workers, window_ms, max_batch)
+    print(f"Serving table identification on http://{host}:{port} with {server.workers} workers (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
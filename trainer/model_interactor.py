@@ -1,5 +1,5 @@
 import json
-import spacy
+from nlp import spacy_registry
 import logging
 import logging.config
 from sentence_transformers import SentenceTransformer
@@ -7,7 +7,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import os
 
-nlp = spacy.load("en_core_web_sm")
+nlp = spacy_registry.lazy("en_core_web_sm")
 
 class TableIdentificationModel:
     """Standalone model for table identification from natural language queries.